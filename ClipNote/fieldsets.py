@@ -0,0 +1,73 @@
+"""
+稀疏字段集：?fields= / ?exclude=
+
+客户端用逗号分隔的字段名选择需要返回的字段，例如 ?fields=id,name,image_url 或 ?exclude=content。
+未请求的字段在序列化器初始化时直接移除，SerializerMethodField 不会被计算；
+sparse_queryset() 再把不再需要的模型字段 defer 掉，数据库也不必读取。
+
+序列化器通过 Meta.field_sources 声明方法字段依赖的模型字段，
+未声明的字段视为读取同名模型字段。
+"""
+
+
+def parse_field_names(value):
+    return {name.strip() for name in (value or '').split(',') if name.strip()}
+
+
+class SparseFieldsetsMixin:
+    """ModelSerializer 混入类，按请求参数裁剪输出字段；仅作用于顶层序列化器，嵌套的序列化器不受影响"""
+    fields_param = 'fields'
+    exclude_param = 'exclude'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None:
+            return
+        for name in self.unrequested_fields(request.query_params):
+            self.fields.pop(name, None)
+
+    @classmethod
+    def unrequested_fields(cls, query_params):
+        """返回本次请求不需要输出的字段名"""
+        declared = list(cls.Meta.fields)
+        wanted = parse_field_names(query_params.get(cls.fields_param))
+        excluded = parse_field_names(query_params.get(cls.exclude_param))
+
+        dropped = set()
+        if wanted:
+            dropped.update(name for name in declared if name not in wanted)
+        dropped.update(name for name in declared if name in excluded)
+        # 不允许裁剪掉全部字段，否则按未指定处理
+        if len(dropped) == len(declared):
+            return set()
+        return dropped
+
+    @classmethod
+    def deferrable_model_fields(cls, query_params):
+        """返回可以 defer 的模型字段：只被未请求的输出字段使用，且不是主键或外键"""
+        dropped = cls.unrequested_fields(query_params)
+        if not dropped:
+            return []
+
+        sources = getattr(cls.Meta, 'field_sources', {})
+        needed = set()
+        for name in cls.Meta.fields:
+            if name not in dropped:
+                needed.update(sources.get(name, (name,)))
+
+        deferrable = []
+        for field in cls.Meta.model._meta.concrete_fields:
+            if field.primary_key or field.is_relation:
+                continue
+            if field.name not in needed:
+                deferrable.append(field.name)
+        return deferrable
+
+
+def sparse_queryset(queryset, serializer_class, request):
+    """根据请求的字段集 defer 不需要的模型字段"""
+    if request is None or not issubclass(serializer_class, SparseFieldsetsMixin):
+        return queryset
+    deferred = serializer_class.deferrable_model_fields(request.query_params)
+    return queryset.defer(*deferred) if deferred else queryset
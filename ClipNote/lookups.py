@@ -0,0 +1,32 @@
+"""
+JSONField 自定义查询
+
+has_element: 判断 JSON 数组字段中是否包含某个元素，在数据库中完成匹配
+用法: Article.objects.filter(keywords__has_element='心率')
+"""
+import json
+
+from django.db import NotSupportedError
+from django.db.models import JSONField, Lookup
+
+
+@JSONField.register_lookup
+class HasElement(Lookup):
+    lookup_name = 'has_element'
+    prepare_rhs = False
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        params = tuple(lhs_params)
+
+        if connection.vendor == 'sqlite':
+            # SQLite JSON1：展开数组逐项比较
+            sql = f'EXISTS (SELECT 1 FROM JSON_EACH({lhs}) WHERE JSON_EACH.value = %s)'
+            return sql, params + (self.rhs,)
+        if connection.vendor == 'postgresql':
+            # Postgres jsonb 包含运算符，可使用 GIN 索引
+            return f'{lhs} @> %s::jsonb', params + (json.dumps([self.rhs]),)
+        if connection.vendor == 'mysql':
+            return f'JSON_CONTAINS({lhs}, %s)', params + (json.dumps(self.rhs),)
+
+        raise NotSupportedError(f'has_element 查询不支持 {connection.vendor} 数据库')
@@ -158,6 +158,25 @@ CKEDITOR_CONFIGS = {
 # 站点URL配置
 SITE_URL = 'https://heartwellness.app'  # 网站的实际URL
 
+# 站点地图由 ClipNote.views 从数据库渲染；需要静态托管时由 update_sitemap 命令写入此目录
+SITEMAP_ROOT = BASE_DIR
+# 文章变更后自动在后台重建磁盘上的站点地图文件（仅静态托管时开启）：
+# 最后一次变更后等待 DELAY 秒，持续变更时最晚 MAX_DELAY 秒后重建
+SITEMAP_AUTO_REBUILD = False
+SITEMAP_REBUILD_DELAY = 5.0
+SITEMAP_REBUILD_MAX_DELAY = 30.0
+# 单个站点地图分片的上限（协议限制为 5 万个 URL / 50MB），字节上限按每条 URL 最多 2200 字节换算为 URL 数量
+SITEMAP_SHARD_MAX_URLS = 50000
+SITEMAP_SHARD_MAX_BYTES = 50 * 1024 * 1024
+# 数据库渲染的站点地图按内容版本缓存的时间（秒）
+SITEMAP_CACHE_TIMEOUT = 60 * 60 * 24
+
+# 推荐动作候选池在缓存中的有效期（秒），写入动作时会立即失效
+RECOMMENDATION_POOL_TIMEOUT = 300
+
+# 动作统计接口的缓存时间（秒），写入动作时会立即失效
+STATS_CACHE_TIMEOUT = 600
+
 # 媒体文件配置
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
@@ -180,3 +199,6 @@ YOUTUBE_API_KEY = os.environ.get('YOUTUBE_API_KEY', '')  # 从环境变量获取
 # OpenAI ChatGPT API 配置
 OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY', '')  # 从环境变量获取API密钥
 OPENAI_MODEL = os.environ.get('OPENAI_MODEL', 'gpt-3.5-turbo')  # 默认使用GPT-3.5
+# 模型响应的本地缓存（按模型、提示词和参数的哈希保存），超过上限时淘汰最久未使用的条目
+OPENAI_COMPLETION_CACHE_PATH = os.environ.get('OPENAI_COMPLETION_CACHE_PATH', str(BASE_DIR / 'completion_cache.sqlite3'))
+OPENAI_COMPLETION_CACHE_MAX_BYTES = 200 * 1024 * 1024
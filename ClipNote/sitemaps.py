@@ -0,0 +1,569 @@
+"""
+统一的站点地图生成引擎
+
+各应用在自己的 sitemaps.py 中用 @register 注册 URL 来源（SitemapSource 子类），
+引擎按文件名把来源分组，逐条流式写入 XML，写完后通过临时文件 + 原子重命名发布，
+读取方永远不会看到写了一半的文件，内存占用也与 URL 数量无关。
+
+每组按协议上限（5 万个 URL / 50MB）拆分为编号分片，例如 sitemap-exercises-1.xml，
+并同时输出预压缩的 .xml.gz，由 sitemap.xml 索引统一列出。
+
+线上由 ClipNote.views 直接从数据库渲染同样的内容，两者共用分片逻辑；
+各来源的 version() 用聚合查询给出内容版本，供条件请求和渲染缓存使用，
+count() 给出 URL 数量，不需要读取全部数据就能算出分片数。
+磁盘文件只在需要静态托管时由 update_sitemap 命令生成。
+"""
+import atexit
+import filecmp
+import gzip
+import hashlib
+import io
+import logging
+import math
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone as dt_timezone
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.db import connection
+from django.utils.module_loading import autodiscover_modules
+
+try:
+    import fcntl
+except ImportError:  # Windows 开发环境没有 fcntl，退化为仅进程内加锁
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+URLSET_OPEN = (
+    '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9" '
+    'xmlns:news="http://www.google.com/schemas/sitemap-news/0.9" '
+    'xmlns:xhtml="http://www.w3.org/1999/xhtml" '
+    'xmlns:mobile="http://www.google.com/schemas/sitemap-mobile/1.0" '
+    'xmlns:image="http://www.google.com/schemas/sitemap-image/1.1" '
+    'xmlns:video="http://www.google.com/schemas/sitemap-video/1.1">'
+)
+SITEMAPINDEX_OPEN = '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+INDEX_FILENAME = 'sitemap.xml'
+LASTMOD_FORMAT = '%Y-%m-%dT%H:%M:%S.%fZ'
+# 单条 <url> 元素的字节数上限：协议规定 URL 不超过 2048 个字符，加上其余标签
+MAX_URL_BYTES = 2200
+
+# 文件名 -> 来源类列表，按注册顺序写入
+registry = {}
+
+
+class SitemapSource:
+    """
+    站点地图 URL 来源基类
+
+    子类需要设置 filename，并实现 items() 与 location()；
+    items() 应返回可迭代对象（查询集请使用 .iterator()），不要一次性加载到内存
+    """
+    filename = None
+    changefreq = 'daily'
+    priority = '0.7'
+
+    def items(self):
+        return []
+
+    def location(self, item):
+        raise NotImplementedError
+
+    def lastmod(self, item):
+        return None
+
+    def entries(self):
+        """逐条生成 (loc, lastmod, changefreq, priority)"""
+        for item in self.items():
+            yield self.location(item), self.lastmod(item), self.changefreq, self.priority
+
+    def version(self):
+        """
+        返回 (最后修改时间, 内容版本)，用于条件请求和渲染结果缓存
+        应当只需一次聚合查询；默认 (None, None) 表示内容固定不变
+        """
+        return None, None
+
+    def count(self):
+        """URL 数量，查询集来源应改用 count() 查询"""
+        return sum(1 for _ in self.items())
+
+
+class StaticSitemap(SitemapSource):
+    """固定页面列表，paths 为相对站点根目录的路径"""
+    paths = []
+    lastmod_value = None
+
+    def items(self):
+        return self.paths
+
+    def location(self, item):
+        return f"{settings.SITE_URL}{item}"
+
+    def lastmod(self, item):
+        return self.lastmod_value
+
+    def version(self):
+        lastmod = datetime.fromisoformat(self.lastmod_value) if self.lastmod_value else None
+        return lastmod, tuple(self.paths)
+
+    def count(self):
+        return len(self.paths)
+
+
+def register(source_class):
+    """注册 URL 来源，可作为类装饰器使用"""
+    if not source_class.filename:
+        raise ValueError(f'{source_class.__name__} 没有设置 filename')
+    sources = registry.setdefault(source_class.filename, [])
+    if source_class not in sources:
+        sources.append(source_class)
+    return source_class
+
+
+def autodiscover():
+    """导入各应用的 sitemaps 模块，完成来源注册"""
+    autodiscover_modules('sitemaps')
+
+
+def format_lastmod(value):
+    """datetime 转为站点地图使用的时间格式，字符串原样返回"""
+    if value is None or isinstance(value, str):
+        return value
+    return value.strftime(LASTMOD_FORMAT)
+
+
+def get_sitemap_root():
+    return str(getattr(settings, 'SITEMAP_ROOT', settings.BASE_DIR))
+
+
+_process_lock = threading.Lock()
+
+
+@contextmanager
+def sitemap_lock(directory=None):
+    """
+    站点地图写入锁：进程内用线程锁，多进程（多个 gunicorn worker、管理命令）之间用文件锁
+    """
+    directory = directory or get_sitemap_root()
+    os.makedirs(directory, exist_ok=True)
+    with _process_lock:
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(directory, '.sitemap.lock'), 'a') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+class AtomicFileWriter:
+    """
+    先写入同目录下的临时文件，成功关闭后再原子重命名为目标文件
+    写入过程中出错则删除临时文件，目标文件保持不变
+
+    keep_unchanged=True 时，如果新内容与现有文件完全相同则丢弃临时文件，
+    现有文件的字节和修改时间都保持不变，爬虫和缓存不会重复抓取
+    """
+
+    def __init__(self, path, mode='w', keep_unchanged=False):
+        self.path = path
+        self.mode = mode
+        self.keep_unchanged = keep_unchanged
+        self.changed = False
+        self.tmp_path = None
+        self.file = None
+
+    def __enter__(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, self.tmp_path = tempfile.mkstemp(dir=directory, prefix='.', suffix='.tmp')
+        if 'b' in self.mode:
+            self.file = os.fdopen(fd, self.mode)
+        else:
+            self.file = os.fdopen(fd, self.mode, encoding='utf-8')
+        return self.file
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if exc_type is None:
+                self.file.flush()
+                os.fsync(self.file.fileno())
+            self.file.close()
+            if exc_type is None:
+                unchanged = (
+                    self.keep_unchanged
+                    and os.path.exists(self.path)
+                    and filecmp.cmp(self.tmp_path, self.path, shallow=False)
+                )
+                if not unchanged:
+                    # mkstemp 创建的文件权限为 0600，nginx 等读取方需要可读权限
+                    os.chmod(self.tmp_path, 0o644)
+                    os.replace(self.tmp_path, self.path)
+                    self.changed = True
+        finally:
+            if os.path.exists(self.tmp_path):
+                os.unlink(self.tmp_path)
+        return False
+
+
+def format_url(loc, lastmod=None, changefreq=None, priority=None):
+    """生成单条 <url> 元素"""
+    parts = [f'<url><loc>{escape(loc)}</loc>']
+    lastmod = format_lastmod(lastmod)
+    if lastmod:
+        parts.append(f'<lastmod>{lastmod}</lastmod>')
+    if changefreq:
+        parts.append(f'<changefreq>{changefreq}</changefreq>')
+    if priority:
+        parts.append(f'<priority>{priority}</priority>')
+    parts.append('</url>\n')
+    return ''.join(parts)
+
+
+URLSET_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n' + URLSET_OPEN + '\n'
+URLSET_FOOTER = '</urlset>\n'
+
+
+def iter_entries(filename):
+    """按注册顺序依次产出某个站点地图的所有 URL"""
+    for source_class in registry.get(filename, []):
+        yield from source_class().entries()
+
+
+def shard_size():
+    """
+    每个分片的 URL 数量：不超过 SITEMAP_SHARD_MAX_URLS，
+    并按单条 URL 的字节数上限换算，保证分片不超过 SITEMAP_SHARD_MAX_BYTES
+    """
+    max_urls = getattr(settings, 'SITEMAP_SHARD_MAX_URLS', 50000) or math.inf
+    max_bytes = getattr(settings, 'SITEMAP_SHARD_MAX_BYTES', 50 * 1024 * 1024)
+    if max_bytes:
+        fixed_size = len(URLSET_HEADER.encode('utf-8')) + len(URLSET_FOOTER.encode('utf-8'))
+        max_urls = min(max_urls, (max_bytes - fixed_size) // MAX_URL_BYTES)
+    return max(int(max_urls), 1) if max_urls != math.inf else None
+
+
+def iter_shard_lines(filename):
+    """
+    按分片边界产出 (分片编号, <url> 行)，每 shard_size() 条 URL 为一个分片
+    分片边界只取决于 URL 数量，写文件和视图渲染共用这一逻辑，分片数可由 count_shards() 直接算出
+    """
+    size = shard_size()
+    for index, entry in enumerate(iter_entries(filename)):
+        yield (index // size + 1 if size else 1), format_url(*entry)
+
+
+def shard_filename(filename, number):
+    """sitemap-exercises.xml 的第 N 个分片为 sitemap-exercises-N.xml"""
+    stem = filename[:-len('.xml')] if filename.endswith('.xml') else filename
+    return f'{stem}-{number}.xml'
+
+
+def list_shards(filename, directory):
+    """返回磁盘上某个站点地图已有的分片文件名（按编号排序）"""
+    shards = []
+    number = 1
+    while os.path.exists(os.path.join(directory, shard_filename(filename, number))):
+        shards.append(shard_filename(filename, number))
+        number += 1
+    return shards
+
+
+def write_gzip(path):
+    """
+    为 XML 文件生成预压缩的 .gz 副本，供 nginx gzip_static 直接使用
+    固定 gzip 头中的时间戳与文件名，相同内容总是得到相同的字节
+    """
+    with open(path, 'rb') as source, AtomicFileWriter(path + '.gz', mode='wb', keep_unchanged=True) as target:
+        with gzip.GzipFile(filename='', mode='wb', fileobj=target, mtime=0) as compressed:
+            shutil.copyfileobj(source, compressed)
+
+
+class _ShardFile:
+    """单个分片文件的写入过程：写头 -> 逐行写入 -> 写尾并原子发布 -> 必要时生成 .gz"""
+
+    def __init__(self, directory, name):
+        self.name = name
+        self.path = os.path.join(directory, name)
+        self.atomic = AtomicFileWriter(self.path, keep_unchanged=True)
+        self.file = self.atomic.__enter__()
+        self.file.write(URLSET_HEADER)
+        self.count = 0
+
+    def write(self, line):
+        self.file.write(line)
+        self.count += 1
+
+    def finish(self):
+        self.file.write(URLSET_FOOTER)
+        self.atomic.__exit__(None, None, None)
+        if self.atomic.changed or not os.path.exists(self.path + '.gz'):
+            write_gzip(self.path)
+
+    def abort(self, exc_info):
+        self.atomic.__exit__(*exc_info)
+
+
+def _write_shards(filename, directory):
+    """
+    将一个站点地图流式写成若干分片，内容未变化的分片保留原文件
+    返回 (分片文件名列表, URL 总数)
+    """
+    shards = []
+    total = 0
+    current = None
+    try:
+        for number, line in iter_shard_lines(filename):
+            if current is None or number != len(shards):
+                if current is not None:
+                    current.finish()
+                current = _ShardFile(directory, shard_filename(filename, number))
+                shards.append(current.name)
+            current.write(line)
+            total += 1
+        if current is None:
+            # 没有任何 URL 时也输出一个空分片
+            current = _ShardFile(directory, shard_filename(filename, 1))
+            shards.append(current.name)
+        current.finish()
+    except BaseException:
+        if current is not None:
+            current.abort(sys.exc_info())
+        raise
+
+    # 删除上次生成、这次已不需要的多余分片
+    number = len(shards) + 1
+    while os.path.exists(os.path.join(directory, shard_filename(filename, number))):
+        stale = os.path.join(directory, shard_filename(filename, number))
+        os.unlink(stale)
+        if os.path.exists(stale + '.gz'):
+            os.unlink(stale + '.gz')
+        number += 1
+
+    return shards, total
+
+
+def format_index(shards):
+    """生成站点地图索引 XML，shards 为 (分片文件名, 最后修改时间) 列表"""
+    parts = ['<?xml version="1.0" encoding="UTF-8"?>\n', SITEMAPINDEX_OPEN + '\n']
+    for shard, lastmod in shards:
+        parts.append(f'<sitemap>\n<loc>{escape(settings.SITE_URL)}/{escape(shard)}</loc>\n')
+        if lastmod:
+            parts.append(f'<lastmod>{format_lastmod(lastmod)}</lastmod>\n')
+        parts.append('</sitemap>\n')
+    parts.append('</sitemapindex>\n')
+    return ''.join(parts)
+
+
+def _write_index(directory):
+    """根据磁盘上已有的分片生成站点地图索引 sitemap.xml，lastmod 取分片文件的修改时间"""
+    shards = []
+    for filename in registry:
+        for shard in list_shards(filename, directory):
+            mtime = os.path.getmtime(os.path.join(directory, shard))
+            shards.append((shard, datetime.fromtimestamp(mtime, tz=dt_timezone.utc)))
+
+    path = os.path.join(directory, INDEX_FILENAME)
+    atomic = AtomicFileWriter(path, keep_unchanged=True)
+    with atomic as file:
+        file.write(format_index(shards))
+
+    if atomic.changed or not os.path.exists(path + '.gz'):
+        write_gzip(path)
+
+
+def sitemap_version(filenames):
+    """
+    汇总若干站点地图的 (最后修改时间, 版本标识)
+    版本标识由各来源的聚合结果和分片配置计算得出，内容不变时保持不变，可直接用作强 ETag
+    """
+    latest = None
+    parts = [
+        settings.SITE_URL,
+        getattr(settings, 'SITEMAP_SHARD_MAX_URLS', 50000),
+        getattr(settings, 'SITEMAP_SHARD_MAX_BYTES', 50 * 1024 * 1024),
+    ]
+    for filename in filenames:
+        for source_class in registry.get(filename, []):
+            lastmod, version = source_class().version()
+            parts.append((filename, source_class.__name__, str(lastmod), str(version)))
+            if lastmod and (latest is None or lastmod > latest):
+                latest = lastmod
+    return latest, hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+
+def render_shard(filename, number=None):
+    """
+    直接从数据库渲染某个分片，返回 UTF-8 字节；分片不存在时返回 None
+    number 为 None 时渲染完整的未分片站点地图
+    """
+    buffer = io.StringIO()
+    buffer.write(URLSET_HEADER)
+    if number is None:
+        for shard_number, line in iter_shard_lines(filename):
+            buffer.write(line)
+        buffer.write(URLSET_FOOTER)
+        return buffer.getvalue().encode('utf-8')
+
+    found = number == 1
+    for shard_number, line in iter_shard_lines(filename):
+        if shard_number < number:
+            continue
+        if shard_number > number:
+            break
+        buffer.write(line)
+        found = True
+    if not found:
+        return None
+    buffer.write(URLSET_FOOTER)
+    return buffer.getvalue().encode('utf-8')
+
+
+def count_shards(filename):
+    """根据各来源的 URL 数量算出某个站点地图的分片数量，至少一个"""
+    total = sum(source_class().count() for source_class in registry.get(filename, []))
+    size = shard_size()
+    return max(math.ceil(total / size), 1) if size else 1
+
+
+def render_index():
+    """直接从数据库渲染站点地图索引，每个分片的 lastmod 取所属站点地图的最后修改时间"""
+    shards = []
+    for filename in registry:
+        lastmod, version = sitemap_version([filename])
+        for number in range(1, count_shards(filename) + 1):
+            shards.append((shard_filename(filename, number), lastmod))
+    return format_index(shards).encode('utf-8')
+
+
+def write_sitemap(filename, directory=None):
+    """生成单个站点地图的全部分片并更新索引，返回写入的 URL 数量"""
+    autodiscover()
+    if filename not in registry:
+        raise KeyError(f'未注册的站点地图: {filename}')
+
+    directory = directory or get_sitemap_root()
+    with sitemap_lock(directory):
+        shards, total = _write_shards(filename, directory)
+        _write_index(directory)
+    return total
+
+
+def write_index(directory=None):
+    """单独重新生成站点地图索引文件 sitemap.xml"""
+    autodiscover()
+    directory = directory or get_sitemap_root()
+    with sitemap_lock(directory):
+        _write_index(directory)
+
+
+def write_all(directory=None):
+    """生成所有已注册的站点地图以及索引文件，返回 {站点地图: URL 数量}"""
+    autodiscover()
+    directory = directory or get_sitemap_root()
+    counts = {}
+    with sitemap_lock(directory):
+        for filename in registry:
+            shards, counts[filename] = _write_shards(filename, directory)
+        _write_index(directory)
+    return counts
+
+
+class RebuildScheduler:
+    """
+    合并短时间内的多次重建请求（防抖）：每次请求都把计时重新推迟 delay 秒，
+    持续有请求时最晚在第一次请求后 max_delay 秒执行；到期后在后台线程中每个文件只重建一次，请求线程无需等待。
+
+    进程正常退出（gunicorn worker 重启或关闭）时通过 atexit 同步执行尚未完成的重建，不会丢失。
+    每个进程各自调度，多个进程的重建由文件锁串行执行，内容未变化的文件保持原样。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._timer = None
+        self._first_request = None
+        self._registered = False
+
+    def schedule(self, filename, delay, max_delay=None):
+        now = time.monotonic()
+        with self._lock:
+            self._pending.add(filename)
+            if not self._registered:
+                atexit.register(self.flush)
+                self._registered = True
+            if self._first_request is None:
+                self._first_request = now
+            if max_delay is not None:
+                delay = max(min(delay, self._first_request + max_delay - now), 0.0)
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        """立即重建所有待处理的站点地图"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            pending, self._pending = self._pending, set()
+            self._timer = None
+            self._first_request = None
+        if not pending:
+            return
+
+        try:
+            for filename in sorted(pending):
+                try:
+                    count = write_sitemap(filename)
+                    logger.info('站点地图 %s 已在后台重建，共 %d 个URL', filename, count)
+                except Exception:
+                    logger.exception('后台重建站点地图 %s 时出错', filename)
+        finally:
+            # 后台线程持有独立的数据库连接，用完即关闭
+            connection.close()
+
+
+scheduler = RebuildScheduler()
+
+
+def schedule_rebuild(filename):
+    """
+    请求在后台重建站点地图：最后一次请求后 SITEMAP_REBUILD_DELAY 秒执行，
+    最晚不超过第一次请求后 SITEMAP_REBUILD_MAX_DELAY 秒
+    SITEMAP_AUTO_REBUILD 为 False 时不做任何事（例如测试环境）
+    """
+    if not getattr(settings, 'SITEMAP_AUTO_REBUILD', True):
+        return
+    scheduler.schedule(
+        filename,
+        getattr(settings, 'SITEMAP_REBUILD_DELAY', 5.0),
+        getattr(settings, 'SITEMAP_REBUILD_MAX_DELAY', 30.0),
+    )
+
+
+@register
+class MainPagesSitemap(StaticSitemap):
+    """站点主要页面"""
+    filename = 'sitemap-main.xml'
+    paths = ['/stories', '/about', '']
+    lastmod_value = '2025-05-21T14:40:54.550Z'
+
+
+@register
+class ToolPagesSitemap(StaticSitemap):
+    """工具页面"""
+    filename = 'sitemap-tools.xml'
+    paths = ['/tools', '/tools/breathing-exercise', '/tools/heart-rate-calculator', '/tools/stress-test']
+    lastmod_value = '2025-05-21T14:40:54.550Z'
@@ -0,0 +1,144 @@
+"""
+slug 分配服务
+
+每个基础 slug 只用一次前缀查询取出所有可能冲突的 slug（base 以及 base-N），
+然后在内存中为整批名称分配数字后缀；最终由数据库唯一约束兜底，
+并发插入抢先占用时重新分配并重试。
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+# 单次前缀查询中合并的基础 slug 数量，避免 SQL 参数过多
+PREFIX_QUERY_CHUNK = 100
+
+
+class SlugAllocator:
+    """
+    为一个模型的 slug 字段分配唯一值
+
+    分配过的 slug 会记录在内存中，同一个分配器可在批量导入中反复使用而无需重复查询
+    """
+
+    def __init__(self, model, field='slug', exclude_pks=()):
+        self.model = model
+        self.field = field
+        self.exclude_pks = set(exclude_pks)
+        self.max_length = model._meta.get_field(field).max_length
+        self._taken = set()
+        self._loaded = set()
+        self._counters = {}
+
+    def prefetch(self, bases):
+        """预先查询一批基础 slug 的冲突情况，之后的分配不再访问数据库"""
+        if self.max_length:
+            bases = [base[:self.max_length] for base in bases]
+        self._load(bases)
+
+    def _load(self, bases):
+        """一次查询取出与这些基础 slug 可能冲突的所有已有 slug"""
+        pending = [base for base in dict.fromkeys(bases) if base not in self._loaded]
+        for start in range(0, len(pending), PREFIX_QUERY_CHUNK):
+            chunk = pending[start:start + PREFIX_QUERY_CHUNK]
+            query = Q()
+            for base in chunk:
+                query |= Q(**{self.field: base}) | Q(**{f'{self.field}__startswith': f'{base}-'})
+
+            rows = self.model._default_manager.filter(query).values_list('pk', self.field)
+            self._taken.update(slug for pk, slug in rows if pk not in self.exclude_pks)
+            self._loaded.update(chunk)
+
+    def _with_suffix(self, base, counter):
+        suffix = f'-{counter}'
+        if self.max_length and len(base) + len(suffix) > self.max_length:
+            base = base[:self.max_length - len(suffix)]
+        return f'{base}{suffix}'
+
+    def allocate(self, base):
+        """为单个基础 slug 分配唯一值"""
+        return self.allocate_many([base])[0]
+
+    def allocate_many(self, bases):
+        """为一批基础 slug 分配唯一值，返回与输入顺序一致的列表"""
+        if self.max_length:
+            bases = [base[:self.max_length] for base in bases]
+        self._load(bases)
+
+        slugs = []
+        for base in bases:
+            slug = base
+            counter = self._counters.get(base, 1)
+            while slug in self._taken:
+                slug = self._with_suffix(base, counter)
+                counter += 1
+            self._counters[base] = counter
+            self._taken.add(slug)
+            slugs.append(slug)
+        return slugs
+
+    def is_taken(self, slug):
+        """直接查询数据库，判断 slug 是否已被其他记录占用"""
+        queryset = self.model._default_manager.filter(**{self.field: slug})
+        if self.exclude_pks:
+            queryset = queryset.exclude(pk__in=self.exclude_pks)
+        return queryset.exists()
+
+    def reload(self, bases):
+        """并发冲突后丢弃这些基础 slug 的缓存，下次分配时重新查询"""
+        for base in bases:
+            self._loaded.discard(base)
+            self._counters.pop(base, None)
+
+
+def save_with_unique_slug(instance, base, save, field='slug', attempts=3, allocator=None):
+    """
+    为 instance 分配唯一 slug 后调用 save() 保存
+
+    如果保存时因并发插入触发了 slug 唯一约束，则重新分配并重试；
+    批量导入可传入共用的 allocator，复用已预取的冲突 slug
+    """
+    if allocator is None:
+        exclude_pks = [instance.pk] if instance.pk is not None else []
+        allocator = SlugAllocator(type(instance), field=field, exclude_pks=exclude_pks)
+    for attempt in range(attempts):
+        slug = allocator.allocate(base)
+        setattr(instance, field, slug)
+        try:
+            with transaction.atomic():
+                return save()
+        except IntegrityError:
+            if attempt == attempts - 1 or not allocator.is_taken(slug):
+                raise
+            allocator.reload([base])
+
+
+def assign_unique_slugs(instances, bases, field='slug', attempts=3, batch_size=500):
+    """
+    为一批已存在的记录分配唯一 slug 并批量写回数据库
+
+    并发写入导致唯一约束冲突时整批回滚，用新的查询结果重新分配；
+    bulk_update 不会触发 auto_now，这里一并刷新 updated_at 这类字段，
+    站点地图等依赖修改时间的缓存版本才会随 slug 变化
+    """
+    instances = list(instances)
+    if not instances:
+        return []
+
+    model = type(instances[0])
+    auto_now_fields = [field.name for field in model._meta.concrete_fields if getattr(field, 'auto_now', False)]
+    now = timezone.now()
+    for instance in instances:
+        for name in auto_now_fields:
+            setattr(instance, name, now)
+    for attempt in range(attempts):
+        allocator = SlugAllocator(model, field=field, exclude_pks=[instance.pk for instance in instances])
+        slugs = allocator.allocate_many(bases)
+        for instance, slug in zip(instances, slugs):
+            setattr(instance, field, slug)
+        try:
+            with transaction.atomic():
+                model._default_manager.bulk_update(instances, [field, *auto_now_fields], batch_size=batch_size)
+            return slugs
+        except IntegrityError:
+            if attempt == attempts - 1:
+                raise
@@ -0,0 +1,129 @@
+"""
+接口性能回归测试工具
+
+EndpointBudgetMixin 为 TestCase 提供 assertEndpoint()：
+1. 请求一次，断言状态码以及 SQL 查询数不超过预算（超出时列出全部 SQL）；
+2. 设置 PERF_TIMING=1 时，再重复请求若干次记录 p50 / p95 耗时，与基线文件比较，
+   p95 超过基线的 (1 + 阈值) 倍且超出最小容差时失败。
+
+耗时与机器负载相关，默认的 manage.py test 只检查查询数，不计时也不写任何文件。
+计时模式下基线文件默认为项目根目录下的 perf_baseline.json（不纳入版本控制），
+没有记录的接口会在测试结束时写入。可用环境变量调整：
+- PERF_TIMING=1: 开启耗时检查
+- PERF_BASELINE_PATH: 基线文件路径
+- PERF_BASELINE_UPDATE=1: 用本次结果覆盖基线，不做比较
+- PERF_REGRESSION_THRESHOLD: 允许的 p95 增幅，默认 0.5（即 50%）
+- PERF_TIMING_ROUNDS: 每个接口计时的请求次数，默认 15
+"""
+import json
+import math
+import os
+import statistics
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+BASELINE_PATH = os.environ.get('PERF_BASELINE_PATH', os.path.join(settings.BASE_DIR, 'perf_baseline.json'))
+UPDATE_BASELINE = os.environ.get('PERF_BASELINE_UPDATE') == '1'
+REGRESSION_THRESHOLD = float(os.environ.get('PERF_REGRESSION_THRESHOLD', '0.5'))
+TIMING_ROUNDS = int(os.environ.get('PERF_TIMING_ROUNDS', '15'))
+TIMING_ENABLED = os.environ.get('PERF_TIMING') == '1'
+
+# 很快的接口上几毫秒的抖动不算回归
+MIN_SLACK_MS = 5.0
+
+
+def load_baseline(path=BASELINE_PATH):
+    try:
+        with open(path, encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_baseline(entries, path=BASELINE_PATH):
+    """合并写入基线文件，保留其他测试记录的条目"""
+    baseline = load_baseline(path)
+    baseline.update(entries)
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(dict(sorted(baseline.items())), file, ensure_ascii=False, indent=2)
+        file.write('\n')
+
+
+def percentile(values, fraction):
+    """最近秩法百分位数"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class EndpointBudgetMixin:
+    """接口查询数预算与耗时基线检查，需与 django.test.TestCase 一起使用"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._baseline = load_baseline()
+        cls._new_entries = {}
+
+    @classmethod
+    def tearDownClass(cls):
+        if cls._new_entries:
+            save_baseline(cls._new_entries)
+        super().tearDownClass()
+
+    def setUp(self):
+        super().setUp()
+        # 统计、推荐候选池等缓存不能跨测试共享
+        cache.clear()
+
+    def assertEndpoint(self, name, url, max_queries, method='get', data=None, status=200, timed=True, **extra):
+        """
+        请求接口并检查状态码、查询数预算和耗时基线，返回第一次请求的响应
+        有副作用的接口（如上传）传入 timed=False 只检查一次
+        """
+        request = getattr(self.client, method)
+        with CaptureQueriesContext(connection) as queries:
+            response = request(url, data, **extra)
+
+        self.assertEqual(
+            response.status_code, status,
+            f'{name}: {method.upper()} {url} 返回 {response.status_code}',
+        )
+        executed = [query['sql'] for query in queries.captured_queries]
+        self.assertLessEqual(
+            len(executed), max_queries,
+            f'{name}: 执行了 {len(executed)} 条 SQL，预算为 {max_queries}\n' + '\n'.join(executed),
+        )
+
+        if timed and TIMING_ENABLED:
+            self._check_timing(name, lambda: request(url, data, **extra), len(executed))
+        return response
+
+    def _check_timing(self, name, send, query_count):
+        timings = []
+        for _ in range(TIMING_ROUNDS):
+            started = time.perf_counter()
+            send()
+            timings.append((time.perf_counter() - started) * 1000)
+
+        result = {
+            'p50_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(percentile(timings, 0.95), 3),
+            'queries': query_count,
+        }
+
+        recorded = self._baseline.get(name)
+        if UPDATE_BASELINE or recorded is None:
+            self._new_entries[name] = result
+            return
+
+        allowed = max(recorded['p95_ms'] * (1 + REGRESSION_THRESHOLD), recorded['p95_ms'] + MIN_SLACK_MS)
+        self.assertLessEqual(
+            result['p95_ms'], allowed,
+            f'{name}: p95 {result["p95_ms"]}ms 超过基线 {recorded["p95_ms"]}ms 的允许范围 {allowed:.3f}ms'
+            f'（p50 {result["p50_ms"]}ms，基线 {recorded["p50_ms"]}ms）；'
+            '确认为预期变化后可用 PERF_BASELINE_UPDATE=1 重新记录',
+        )
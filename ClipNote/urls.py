@@ -1,12 +1,16 @@
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from . import views
 
 urlpatterns = [
     path('api/admin/', admin.site.urls),  # 保持原来的admin路径
     path('api/', include('note.urls')),  # note应用的URL
     path('api/fitness/', include('fitness.urls')),  # fitness应用的URL
+    # 站点地图：直接从数据库渲染，支持 ETag / Last-Modified 条件请求
+    path('sitemap.xml', views.sitemap_index, name='sitemap-index'),
+    re_path(r'^(?P<name>sitemap-[a-z0-9-]+)\.xml$', views.sitemap_shard, name='sitemap-shard'),
 ]
 
 # 开发环境下提供媒体文件和静态文件服务
@@ -0,0 +1,85 @@
+"""
+从数据库直接渲染站点地图
+
+不依赖磁盘文件，多个应用节点返回完全相同的内容：
+ETag / Last-Modified 由各来源的聚合查询得出，命中条件请求时直接返回 304；
+渲染结果按内容版本缓存，内容不变时不会重复渲染。
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404, HttpResponse
+from django.views.decorators.http import condition
+
+from .sitemaps import autodiscover, registry, render_index, render_shard, sitemap_version
+
+
+def _parse_shard_name(name):
+    """
+    sitemap-exercises-2 -> ('sitemap-exercises.xml', 2)
+    兼容旧的未分片地址 sitemap-exercises -> ('sitemap-exercises.xml', None)，无法识别时返回 (None, None)
+    """
+    if f'{name}.xml' in registry:
+        return f'{name}.xml', None
+    stem, _, number = name.rpartition('-')
+    if not number.isdigit() or int(number) < 1 or f'{stem}.xml' not in registry:
+        return None, None
+    return f'{stem}.xml', int(number)
+
+
+def _index_version(request):
+    # 同一请求中 ETag 与 Last-Modified 共用一次版本查询
+    if not hasattr(request, '_sitemap_version'):
+        autodiscover()
+        request._sitemap_version = sitemap_version(list(registry))
+    return request._sitemap_version
+
+
+def _shard_version(request, name):
+    if not hasattr(request, '_sitemap_version'):
+        autodiscover()
+        filename, number = _parse_shard_name(name)
+        if filename is None:
+            request._sitemap_version = (None, None)
+        else:
+            lastmod, version = sitemap_version([filename])
+            request._sitemap_version = (lastmod, f'{version}-{name}')
+    return request._sitemap_version
+
+
+def _cached_render(key, render):
+    """按内容版本缓存渲染结果"""
+    content = cache.get(key)
+    if content is None:
+        content = render()
+        if content is not None:
+            cache.set(key, content, getattr(settings, 'SITEMAP_CACHE_TIMEOUT', 60 * 60 * 24))
+    return content
+
+
+@condition(
+    etag_func=lambda request: _index_version(request)[1],
+    last_modified_func=lambda request: _index_version(request)[0],
+)
+def sitemap_index(request):
+    """站点地图索引 sitemap.xml"""
+    lastmod, version = _index_version(request)
+    content = _cached_render(f'sitemap:index:{version}', render_index)
+    return HttpResponse(content, content_type='application/xml; charset=utf-8')
+
+
+@condition(
+    etag_func=lambda request, name: _shard_version(request, name)[1],
+    last_modified_func=lambda request, name: _shard_version(request, name)[0],
+)
+def sitemap_shard(request, name):
+    """单个站点地图分片，例如 sitemap-exercises-1.xml"""
+    autodiscover()
+    filename, number = _parse_shard_name(name)
+    if filename is None:
+        raise Http404('站点地图不存在')
+
+    lastmod, version = _shard_version(request, name)
+    content = _cached_render(f'sitemap:{version}', lambda: render_shard(filename, number))
+    if content is None:
+        raise Http404('站点地图不存在')
+    return HttpResponse(content, content_type='application/xml; charset=utf-8')
@@ -1,10 +1,11 @@
 from django.contrib import admin
+from django.db.models import Count
 from django.utils.html import format_html
 from .models import BodyPart, Exercise, ContentKeywordMapping
 
 @admin.register(BodyPart)
 class BodyPartAdmin(admin.ModelAdmin):
-    list_display = ('name', 'slug')
+    list_display = ('name', 'slug', 'exercise_count')
     search_fields = ('name',)
     prepopulated_fields = {'slug': ('name',)}
 
@@ -36,6 +37,12 @@ class ExerciseAdmin(admin.ModelAdmin):
         })
     )
     
+    def get_queryset(self, request):
+        # 部位与关键词映射数量随列表一次查出，列表查询数与每页行数无关
+        return super().get_queryset(request).select_related('body_part').annotate(
+            keyword_mapping_count=Count('keyword_mappings')
+        )
+    
     def display_image(self, obj):
         if obj.image_url:
             return format_html('<img src="{}" width="50" height="50" style="object-fit: cover;" onerror="this.src=\'data:image/svg+xml;base64,PHN2ZyB3aWR0aD0iNTAiIGhlaWdodD0iNTAiIHZpZXdCb3g9IjAgMCA1MCA1MCIgZmlsbD0ibm9uZSIgeG1sbnM9Imh0dHA6Ly93d3cudzMub3JnLzIwMDAvc3ZnIj4KPHJlY3Qgd2lkdGg9IjUwIiBoZWlnaHQ9IjUwIiBmaWxsPSIjZjNmNGY2Ii8+CjxwYXRoIGQ9Ik0yNSAyMEM0MS41IDIwIDQ1IDI1IDQ1IDMwVjM1QzQ1IDQwIDQxLjUgNDUgMjUgNDVTNSA0MCA1IDM1VjMwQzUgMjUgOC41IDIwIDI1IDIwWiIgZmlsbD0iIzlmYTZiNyIvPgo8Y2lyY2xlIGN4PSIxOCIgY3k9IjI3IiByPSIzIiBmaWxsPSIjZjNmNGY2Ii8+CjxwYXRoIGQ9Ik0xNSAzNUwyMCAzMEwyNSAzNUwzNSAyNUw0MCAzNSIgc3Ryb2tlPSIjZjNmNGY2IiBzdHJva2Utd2lkdGg9IjIiIGZpbGw9Im5vbmUiLz4KPHN2Zz4K\'" />', obj.image_url)
@@ -49,19 +56,26 @@ class ExerciseAdmin(admin.ModelAdmin):
     has_youtube.short_description = 'YouTube'
     
     def keyword_count(self, obj):
-        return obj.keyword_mappings.count()
+        return obj.keyword_mapping_count
     keyword_count.short_description = '关键词数量'
+    keyword_count.admin_order_field = 'keyword_mapping_count'
     
     def keyword_count_detail(self, obj):
-        mappings = obj.keyword_mappings.all()
+        if not obj.pk:
+            return "无关键词映射"
+        mappings = list(obj.keyword_mappings.all()[:10])  # 只显示前10个
         if not mappings:
             return "无关键词映射"
         
+        total = getattr(obj, 'keyword_mapping_count', None)
+        if total is None:
+            total = obj.keyword_mappings.count()
+        
         html = "<ul>"
-        for mapping in mappings[:10]:  # 只显示前10个
+        for mapping in mappings:
             html += f"<li><strong>{mapping.content_type}</strong>: {mapping.keyword} (评分: {mapping.relevance_score})</li>"
-        if mappings.count() > 10:
-            html += f"<li>... 还有 {mappings.count() - 10} 个关键词</li>"
+        if total > 10:
+            html += f"<li>... 还有 {total - 10} 个关键词</li>"
         html += "</ul>"
         return format_html(html)
     keyword_count_detail.short_description = '关键词映射详情'
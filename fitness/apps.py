@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class FitnessConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'fitness'
+
+    def ready(self):
+        import fitness.signals  # 导入信号模块
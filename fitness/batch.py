@@ -0,0 +1,162 @@
+"""
+离线批量生成动作描述（OpenAI Batch API）
+
+全量重新生成不需要交互式的响应速度，可以改用 Batch API：
+1. write_request_file() 把待处理的动作写成一个 JSONL 请求文件，每行的 custom_id 为 exercise-<id>；
+2. submit_batch() 上传文件并创建批处理任务；
+3. download_batch_output() 在任务完成后下载结果文件；
+4. ingest_results() 流式读取结果文件，按 custom_id 找回动作，清理格式后按批在事务中保存。
+第 1、4 步不访问网络，可以用本地文件测试。
+"""
+import json
+
+import httpx
+
+from .descriptions import API_BASE, build_request, clean_and_format_content, parse_completion
+from .generation import Job, Result, save_descriptions
+from .models import Exercise
+
+CUSTOM_ID_PREFIX = 'exercise-'
+BATCH_ENDPOINT = '/v1/chat/completions'
+
+
+def custom_id(exercise_id):
+    return f'{CUSTOM_ID_PREFIX}{exercise_id}'
+
+
+def parse_custom_id(value):
+    """exercise-<id> -> id，格式不对时返回 None"""
+    if not isinstance(value, str) or not value.startswith(CUSTOM_ID_PREFIX):
+        return None
+    number = value[len(CUSTOM_ID_PREFIX):]
+    return int(number) if number.isascii() and number.isdigit() else None
+
+
+def write_request_file(queryset, path, model, limit=None):
+    """把待处理的动作流式写入 Batch API 请求文件，返回写入的行数"""
+    rows = queryset.order_by('id').values_list('id', 'name')
+    if limit:
+        rows = rows[:limit]
+    count = 0
+    with open(path, 'w', encoding='utf-8') as file:
+        for exercise_id, name in rows.iterator(chunk_size=1000):
+            line = {
+                'custom_id': custom_id(exercise_id),
+                'method': 'POST',
+                'url': BATCH_ENDPOINT,
+                'body': build_request(name, model),
+            }
+            file.write(json.dumps(line, ensure_ascii=False) + '\n')
+            count += 1
+    return count
+
+
+def batch_client(api_key, transport=None):
+    return httpx.Client(
+        base_url=API_BASE, headers={'Authorization': f'Bearer {api_key}'}, timeout=300, transport=transport,
+    )
+
+
+def submit_batch(path, api_key, transport=None):
+    """上传请求文件并创建批处理任务，返回任务信息"""
+    with batch_client(api_key, transport) as client, open(path, 'rb') as file:
+        response = client.post('/files', data={'purpose': 'batch'}, files={'file': (path, file, 'application/jsonl')})
+        response.raise_for_status()
+        response = client.post('/batches', json={
+            'input_file_id': response.json()['id'],
+            'endpoint': BATCH_ENDPOINT,
+            'completion_window': '24h',
+        })
+        response.raise_for_status()
+        return response.json()
+
+
+def batch_status(batch_id, api_key, transport=None):
+    with batch_client(api_key, transport) as client:
+        response = client.get(f'/batches/{batch_id}')
+        response.raise_for_status()
+        return response.json()
+
+
+def download_batch_output(batch, path, api_key, transport=None):
+    """把已完成任务的结果文件流式保存到 path，没有结果文件时返回 False"""
+    file_id = batch.get('output_file_id')
+    if not file_id:
+        return False
+    with batch_client(api_key, transport) as client, client.stream('GET', f'/files/{file_id}/content') as response:
+        response.raise_for_status()
+        with open(path, 'wb') as file:
+            for chunk in response.iter_bytes():
+                file.write(chunk)
+    return True
+
+
+def parse_result_line(line):
+    """
+    解析结果文件的一行，返回 (动作ID, 内容, token 数, 错误信息)
+    成功时错误信息为空，失败时内容为 None
+    """
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None, None, 0, '无法解析的行'
+    if not isinstance(record, dict):
+        return None, None, 0, '无法解析的行'
+    exercise_id = parse_custom_id(record.get('custom_id'))
+    if exercise_id is None:
+        return None, None, 0, f'未知的 custom_id: {record.get("custom_id")}'
+    if record.get('error'):
+        return exercise_id, None, 0, str(record['error'])
+
+    response = record.get('response') or {}
+    if not isinstance(response, dict):
+        return exercise_id, None, 0, 'API响应格式错误'
+    if response.get('status_code') != 200:
+        return exercise_id, None, 0, f'API错误 {response.get("status_code")}'
+    try:
+        content, tokens = parse_completion(response.get('body') or {})
+    except (KeyError, IndexError, TypeError):
+        content, tokens = None, 0
+    if content is None:
+        return exercise_id, None, 0, 'API响应格式错误'
+    return exercise_id, content, tokens or 0, ''
+
+
+def ingest_results(path, extract_keywords=False, batch_size=200, log=print):
+    """流式读取结果文件，按批清理格式并保存，返回统计信息"""
+    stats = {'success': 0, 'failed': 0, 'missing': 0, 'keywords': 0, 'tokens': 0}
+    pending = []
+
+    def flush():
+        ids = [exercise_id for exercise_id, _, _ in pending]
+        names = dict(Exercise.objects.filter(id__in=ids).values_list('id', 'name'))
+        results = []
+        for exercise_id, content, tokens in pending:
+            if exercise_id not in names:
+                stats['missing'] += 1
+                continue
+            name = names[exercise_id]
+            results.append(Result(Job(exercise_id, name), clean_and_format_content(content, name), tokens))
+            stats['tokens'] += tokens
+        saved, keywords = save_descriptions(results, extract_keywords)
+        stats['success'] += saved
+        stats['keywords'] += keywords
+        log(f'  已保存 {stats["success"]} 个动作的描述')
+        pending.clear()
+
+    with open(path, encoding='utf-8') as file:
+        for number, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            exercise_id, content, tokens, error = parse_result_line(line)
+            if error:
+                stats['failed'] += 1
+                log(f'  第 {number} 行（{custom_id(exercise_id) if exercise_id else "-"}）: {error}')
+                continue
+            pending.append((exercise_id, content, tokens))
+            if len(pending) >= batch_size:
+                flush()
+    if pending:
+        flush()
+    return stats
+
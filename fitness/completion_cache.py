@@ -0,0 +1,106 @@
+"""
+模型响应的本地缓存
+
+以请求体（模型、系统提示词、用户提示词和采样参数）的 SHA-256 为键，保存模型返回的原始内容和 token 数，
+重复运行 generate_descriptions（--force、崩溃后重跑、修改清理规则或关键词提取后重跑）时直接复用，不再调用API。
+缓存的是清理前的原始内容，清理和关键词提取在读取后重新执行。
+
+数据保存在独立的 SQLite 文件中，不占用 Django 数据库的写锁；
+总大小超过上限时按最近使用时间淘汰旧条目。命中时的最近使用时间先记在内存中，
+累积一批或写入、关闭时再一起写回，读取不会每次都提交事务。
+"""
+import hashlib
+import json
+import sqlite3
+import time
+
+# 累积多少次命中后写回一次最近使用时间
+TOUCH_BATCH = 100
+
+
+def completion_key(payload):
+    """请求体的内容哈希，字段顺序不影响结果"""
+    canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class CompletionCache:
+    def __init__(self, path, max_bytes=200 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        # DescriptionPipeline 在专用线程中访问缓存，同一时间只有一个线程使用连接
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS completions ('
+            'key TEXT PRIMARY KEY, model TEXT NOT NULL, content TEXT NOT NULL, tokens INTEGER NOT NULL, '
+            'size INTEGER NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)'
+        )
+        self.connection.execute('CREATE INDEX IF NOT EXISTS completions_accessed ON completions (accessed_at)')
+        self.connection.commit()
+        self.size = self.connection.execute('SELECT COALESCE(SUM(size), 0) FROM completions').fetchone()[0]
+        self.stats = {'hits': 0, 'misses': 0, 'tokens_saved': 0}
+        # 键 -> 尚未写回的最近使用时间
+        self.touched = {}
+
+    def get(self, payload):
+        """返回 (内容, token 数)，未命中时返回 None"""
+        key = completion_key(payload)
+        row = self.connection.execute('SELECT content, tokens FROM completions WHERE key = ?', [key]).fetchone()
+        if row is None:
+            self.stats['misses'] += 1
+            return None
+        self.touched[key] = time.time()
+        if len(self.touched) >= TOUCH_BATCH:
+            self.flush_touches()
+            self.connection.commit()
+        self.stats['hits'] += 1
+        self.stats['tokens_saved'] += row[1]
+        return row[0], row[1]
+
+    def put(self, payload, content, tokens):
+        key = completion_key(payload)
+        size = len(content.encode('utf-8'))
+        now = time.time()
+        previous = self.connection.execute('SELECT size FROM completions WHERE key = ?', [key]).fetchone()
+        self.connection.execute(
+            'INSERT OR REPLACE INTO completions (key, model, content, tokens, size, created_at, accessed_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            [key, payload.get('model', ''), content, tokens or 0, size, now, now],
+        )
+        self.size += size - (previous[0] if previous else 0)
+        self.touched.pop(key, None)
+        self.flush_touches()
+        if self.size > self.max_bytes:
+            self.evict()
+        self.connection.commit()
+
+    def flush_touches(self):
+        """把累积的最近使用时间一次写回，由调用方提交"""
+        if self.touched:
+            self.connection.executemany(
+                'UPDATE completions SET accessed_at = ? WHERE key = ?',
+                [(accessed_at, key) for key, accessed_at in self.touched.items()],
+            )
+            self.touched.clear()
+
+    def evict(self):
+        """按最近使用时间从旧到新删除，直到总大小降到上限的 90%"""
+        target = self.max_bytes * 0.9
+        rows = self.connection.execute('SELECT key, size FROM completions ORDER BY accessed_at')
+        expired = []
+        for key, size in rows:
+            if self.size <= target:
+                break
+            expired.append((key,))
+            self.size -= size
+        self.connection.executemany('DELETE FROM completions WHERE key = ?', expired)
+
+    @property
+    def hit_rate(self):
+        lookups = self.stats['hits'] + self.stats['misses']
+        return self.stats['hits'] / lookups if lookups else 0.0
+
+    def close(self):
+        self.flush_touches()
+        self.connection.commit()
+        self.connection.close()
@@ -0,0 +1,207 @@
+"""
+AI 生成动作描述的提示词、响应解析和文本处理
+
+generate_descriptions 命令和基准测试共用，均为纯函数，不访问数据库。
+"""
+import json
+import re
+
+API_BASE = 'https://api.openai.com/v1'
+API_URL = f'{API_BASE}/chat/completions'
+
+SYSTEM_PROMPT = (
+    'You are a professional fitness trainer and expert. Generate comprehensive, accurate, and practical fitness '
+    'exercise descriptions in markdown format. Use proper markdown headers (##), lists, and emphasis. Structure the '
+    'content with clear sections: What is [exercise]?, Tutorial, Common Mistakes, Tips for Better Results, and '
+    'Muscles Worked.'
+)
+
+# 打包请求：每个动作的 JSON 字段及其在 markdown 中的标题
+PACKED_SECTIONS = [
+    ('what_is', 'What is {name}?'),
+    ('tutorial', '{name} Tutorial'),
+    ('common_mistakes', 'Common Mistakes'),
+    ('tips', 'Tips for Better Results'),
+    ('muscles_worked', 'Muscles Worked'),
+]
+PACKED_MAX_TOKENS_PER_EXERCISE = 1200
+
+PACKED_SYSTEM_PROMPT = (
+    'You are a professional fitness trainer and expert. Generate comprehensive, accurate, and practical fitness '
+    'exercise descriptions. Respond with a JSON object of the form {"exercises": [...]} containing one object per '
+    'requested exercise, in the same order, with the keys "name" (the exercise name exactly as given), "what_is", '
+    '"tutorial", "common_mistakes", "tips" and "muscles_worked". Each section value is markdown text (lists and '
+    'emphasis allowed) without a section header.'
+)
+
+# 标题关键词 -> 内容类型
+CONTENT_TYPE_KEYWORDS = {
+    'what_is': ['what is', 'definition', 'about'],
+    'tutorial': ['tutorial', 'how to', 'steps', 'technique', 'form'],
+    'mistakes': ['mistakes', 'errors', 'avoid', 'common'],
+    'tips': ['tips', 'better', 'improve', 'advice'],
+    'muscles': ['muscles', 'worked', 'target', 'primary', 'secondary'],
+}
+
+
+def build_prompt(exercise_name):
+    """单个动作的用户提示词"""
+    return f"""Generate {exercise_name} content, including:
+- What is {exercise_name}?
+- {exercise_name} Tutorial
+- Common Mistakes
+- Tips for Better Results
+- Muscles Worked
+Generate content directly, do not reply with other useless information."""
+
+
+def build_request(exercise_name, model):
+    """chat/completions 请求体"""
+    return {
+        'model': model,
+        'messages': [
+            {'role': 'system', 'content': SYSTEM_PROMPT},
+            {'role': 'user', 'content': build_prompt(exercise_name)},
+        ],
+        'max_tokens': 2000,
+        'temperature': 0.7,
+        'top_p': 1.0,
+        'frequency_penalty': 0.0,
+        'presence_penalty': 0.0,
+    }
+
+
+def build_packed_request(exercise_names, model):
+    """把多个动作打包到一次请求中，要求模型返回 JSON"""
+    listing = '\n'.join(f'{number}. {name}' for number, name in enumerate(exercise_names, 1))
+    return {
+        'model': model,
+        'messages': [
+            {'role': 'system', 'content': PACKED_SYSTEM_PROMPT},
+            {'role': 'user', 'content': f'Generate content for each of the following exercises:\n{listing}'},
+        ],
+        'response_format': {'type': 'json_object'},
+        'max_tokens': PACKED_MAX_TOKENS_PER_EXERCISE * len(exercise_names),
+        'temperature': 0.7,
+        'top_p': 1.0,
+        'frequency_penalty': 0.0,
+        'presence_penalty': 0.0,
+    }
+
+
+def render_packed_sections(exercise_name, item):
+    """把打包响应中一个动作的各部分拼成与单独请求相同结构的 markdown，缺少任一部分时返回 None"""
+    sections = []
+    for field, heading in PACKED_SECTIONS:
+        text = item.get(field)
+        if isinstance(text, list):
+            text = '\n'.join(f'- {line}' for line in text if isinstance(line, str))
+        if not isinstance(text, str) or not text.strip():
+            return None
+        sections.append(f'## {heading.format(name=exercise_name)}\n\n{text.strip()}')
+    return '\n\n'.join(sections)
+
+
+def parse_packed_completion(content, exercise_names):
+    """
+    拆分打包响应，返回与 exercise_names 一一对应的 markdown 列表
+    按名称（不区分大小写）匹配，缺失或未通过校验的动作对应 None
+    """
+    try:
+        data = json.loads(content)
+    except (TypeError, ValueError):
+        return [None] * len(exercise_names)
+    items = data.get('exercises') if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        return [None] * len(exercise_names)
+
+    by_name = {}
+    for item in items:
+        if isinstance(item, dict) and isinstance(item.get('name'), str):
+            by_name.setdefault(item['name'].strip().lower(), item)
+    parsed = []
+    for name in exercise_names:
+        item = by_name.get(name.strip().lower())
+        parsed.append(render_packed_sections(name, item) if item else None)
+    return parsed
+
+
+def estimate_tokens(payload):
+    """预估一次请求计入 TPM 的 token 数：提示词按约 4 字符 1 token 估算，加上 max_tokens"""
+    characters = sum(len(message['content']) for message in payload['messages'])
+    return characters // 4 + payload.get('max_tokens', 0)
+
+
+def parse_completion(result):
+    """从 chat/completions 响应中取出 (内容, 使用的 token 数)，格式不对时内容为 None"""
+    tokens = (result.get('usage') or {}).get('total_tokens')
+    choices = result.get('choices')
+    if not choices:
+        return None, tokens
+    return choices[0]['message']['content'].strip(), tokens
+
+
+def clean_and_format_content(content, exercise_name):
+    """
+    清理和格式化生成的内容
+    """
+    # 移除可能的多余空行
+    content = re.sub(r'\n{3,}', '\n\n', content)
+
+    # 确保标题格式正确（保持二级标题）
+    content = re.sub(r'^#{1,6}\s*(.+)$', r'## \1', content, flags=re.MULTILINE)
+
+    # 如果内容没有主标题，添加一个
+    if not content.startswith('#'):
+        content = f"# {exercise_name.title()}\n\n{content}"
+
+    # 确保列表格式正确
+    content = re.sub(r'^\s*[-•]\s*', '- ', content, flags=re.MULTILINE)
+    content = re.sub(r'^\s*\d+\.\s*', lambda m: f"{m.group().strip()} ", content, flags=re.MULTILINE)
+
+    # 移除开头和结尾的引号或其他包装符号
+    content = content.strip('"\'`')
+
+    return content.strip()
+
+
+def header_content_type(header):
+    """根据标题判断内容类型"""
+    for content_type, keywords in CONTENT_TYPE_KEYWORDS.items():
+        if any(keyword in header for keyword in keywords):
+            return content_type
+    return 'other'
+
+
+def extract_keyword_mappings(description, exercise_name, body_part_name=''):
+    """
+    从描述中提取关键词映射，返回 [(关键词, 内容类型, 相关性评分)]
+    二级标题评分 1.0，动作名称、部位和通用词评分 0.8；同一关键词和类型只保留一次
+    """
+    mappings = []
+    seen = set()
+
+    for header in re.findall(r'^##\s*(.+)$', description, re.MULTILINE):
+        clean_header = re.sub(r'[#*_`]', '', header).strip().lower()
+        if len(clean_header) <= 2:
+            continue
+        content_type = header_content_type(clean_header)
+        if (clean_header, content_type) not in seen:
+            seen.add((clean_header, content_type))
+            mappings.append((clean_header, content_type, 1.0))
+
+    keywords = {keyword for keyword, _, _ in mappings}
+    base_keywords = [
+        (exercise_name.lower(), 'other'),
+        ((body_part_name or '').lower(), 'muscles'),
+        ('exercise', 'other'),
+        ('workout', 'other'),
+        ('fitness', 'other'),
+        ('training', 'other'),
+    ]
+    for keyword, content_type in base_keywords:
+        if keyword and keyword not in keywords:
+            keywords.add(keyword)
+            mappings.append((keyword, content_type, 0.8))
+
+    return mappings
@@ -0,0 +1,360 @@
+"""
+并发生成动作描述（generate_descriptions --concurrency N）
+
+- 生产者按主键分页流式读取待处理的动作放入队列，未完成的任务数有上限，不会一次性加载整个 queryset；
+- N 个工作协程共用一个 httpx.AsyncClient 连接池调用 API，由 RateLimiter 控制速率，
+  限流、超时和 5xx 失败的任务重新入队（最多 max_retries 次），超时和 5xx 时由 RateLimiter 指数退避；
+  命中 CompletionCache 的任务不调用 API；
+- pack > 1 时每次请求打包多个动作并要求返回 JSON，拆分后逐个校验，未通过的动作改为单独请求；
+- 结果交给唯一的写入协程，按批在一个事务中保存，避免多个连接争抢 SQLite 写锁。
+
+数据库操作都通过 sync_to_async(thread_sensitive=True) 在同一个线程中执行；
+CompletionCache 的读写在另一个专用线程中执行，不阻塞事件循环。
+"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.db import connections, transaction
+
+from .descriptions import (
+    API_URL, build_packed_request, build_request, clean_and_format_content, estimate_tokens,
+    extract_keyword_mappings, parse_completion, parse_packed_completion,
+)
+from .models import ContentKeywordMapping, Exercise
+from .ratelimit import RateLimiter
+
+# 写入协程等待新结果的最长时间，超时后先保存已有的结果
+FLUSH_INTERVAL = 2.0
+
+
+@dataclass
+class Job:
+    exercise_id: int
+    name: str
+    attempts: int = 0
+    # 打包响应未通过校验后改为单独请求
+    single: bool = False
+
+
+@dataclass
+class Result:
+    job: Job
+    description: str = None
+    tokens: int = 0
+    error: str = ''
+    cached: bool = False
+
+
+def save_descriptions(results, extract_keywords=False):
+    """在一个事务中保存一批生成结果，返回 (保存的动作数, 写入的关键词映射数)"""
+    exercises = Exercise.objects.select_related('body_part').in_bulk([result.job.exercise_id for result in results])
+    mappings = []
+    saved = 0
+    with transaction.atomic():
+        for result in results:
+            exercise = exercises.get(result.job.exercise_id)
+            if exercise is None:
+                continue
+            exercise.description = result.description
+            exercise.ai_generated = True
+            if extract_keywords:
+                extracted = extract_keyword_mappings(result.description, exercise.name, exercise.body_part.name)
+                exercise.set_generated_keywords(list(dict.fromkeys(keyword for keyword, _, _ in extracted)))
+                mappings.extend(
+                    ContentKeywordMapping(
+                        exercise=exercise, keyword=keyword, content_type=content_type, relevance_score=score,
+                    )
+                    for keyword, content_type, score in extracted
+                )
+            exercise.save()
+            saved += 1
+
+        if extract_keywords:
+            ContentKeywordMapping.objects.filter(exercise_id__in=[result.job.exercise_id for result in results]).delete()
+            ContentKeywordMapping.objects.bulk_create(mappings)
+    return saved, len(mappings)
+
+
+class DescriptionPipeline:
+    """生产者 -> 工作协程 -> 单一写入协程"""
+
+    def __init__(self, queryset, model, api_key, concurrency=8, batch_size=20, limit=None, total=None,
+                 extract_keywords=False, limiter=None, cache=None, pack=1, max_retries=5, timeout=60, log=print,
+                 transport=None):
+        self.queryset = queryset
+        self.model = model
+        self.api_key = api_key
+        self.concurrency = max(concurrency, 1)
+        self.batch_size = max(batch_size, 1)
+        self.limit = limit
+        self.total = total
+        self.extract_keywords = extract_keywords
+        self.limiter = limiter or RateLimiter()
+        self.cache = cache
+        self.pack = max(pack, 1)
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.log = log
+        # 测试时可传入 httpx.MockTransport
+        self.transport = transport
+        self.stats = {
+            'success': 0, 'failed': 0, 'keywords': 0, 'tokens': 0, 'done': 0, 'retries': 0,
+            'packed_requests': 0, 'fallbacks': 0,
+        }
+
+    def fetch_page(self, after_id, size):
+        page = self.queryset.filter(id__gt=after_id).order_by('id').values_list('id', 'name')[:size]
+        return [Job(exercise_id, name) for exercise_id, name in page]
+
+    def save(self, results):
+        return save_descriptions(results, self.extract_keywords)
+
+    async def run(self):
+        # 队列本身不限长度，以便失败的任务重新入队；生产者通过 slots 控制未完成任务的数量
+        jobs = asyncio.Queue()
+        results = asyncio.Queue()
+        self.slots = asyncio.Semaphore(self.concurrency * self.pack * 2)
+        self.outstanding = 0
+        self.produced = False
+        self.cache_thread = None
+        if self.cache:
+            self.cache_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix='completion-cache')
+        started = time.perf_counter()
+
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        headers = {'Authorization': f'Bearer {self.api_key}', 'Content-Type': 'application/json'}
+        async with httpx.AsyncClient(
+            headers=headers, limits=limits, timeout=self.timeout, transport=self.transport,
+        ) as client:
+            writer = asyncio.create_task(self.write(results))
+            workers = [asyncio.create_task(self.work(client, jobs, results)) for _ in range(self.concurrency)]
+            try:
+                await self.produce(jobs)
+                await asyncio.gather(*workers)
+            finally:
+                for worker in workers:
+                    worker.cancel()
+                await results.put(None)
+                await writer
+                await sync_to_async(connections.close_all)()
+                if self.cache_thread:
+                    self.cache_thread.shutdown()
+
+        self.stats['elapsed'] = time.perf_counter() - started
+        self.stats['throttled'] = self.limiter.stats['throttled']
+        return self.stats
+
+    async def produce(self, jobs):
+        """按主键分页读取，保存后不再满足条件的动作不会影响分页"""
+        after_id = 0
+        queued = 0
+        while self.limit is None or queued < self.limit:
+            size = 200 if self.limit is None else min(200, self.limit - queued)
+            page = await sync_to_async(self.fetch_page)(after_id, size)
+            if not page:
+                break
+            for job in page:
+                await self.slots.acquire()
+                self.outstanding += 1
+                jobs.put_nowait(job)
+            queued += len(page)
+            after_id = page[-1].exercise_id
+        self.produced = True
+        self.finish_if_idle(jobs)
+
+    def finish_if_idle(self, jobs):
+        """全部任务读取完毕且没有未完成（含等待重试）的任务时，通知工作协程退出"""
+        if self.produced and self.outstanding == 0:
+            for _ in range(self.concurrency):
+                jobs.put_nowait(None)
+
+    async def work(self, client, jobs, results):
+        while True:
+            job = await jobs.get()
+            if job is None:
+                return
+            batch = self.gather(job, jobs)
+            if len(batch) == 1:
+                outcomes = [(job, *await self.generate(client, job))]
+            else:
+                outcomes = await self.generate_packed(client, jobs, batch)
+            for job, result, retryable in outcomes:
+                await self.settle(jobs, results, job, result, retryable)
+
+    def gather(self, job, jobs):
+        """打包模式下从队列中再取出最多 pack - 1 个可以打包的任务，不等待"""
+        batch = [job]
+        if job.single:
+            return batch
+        while len(batch) < self.pack:
+            try:
+                extra = jobs.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            if extra is None or extra.single:
+                jobs.put_nowait(extra)
+                break
+            batch.append(extra)
+        return batch
+
+    async def settle(self, jobs, results, job, result, retryable):
+        """可以重试的任务重新入队，否则交给写入协程"""
+        if retryable and job.attempts < self.max_retries:
+            job.attempts += 1
+            self.stats['retries'] += 1
+            self.log(f'  {job.name}: {result.error}，重新排队（第 {job.attempts} 次重试）')
+            jobs.put_nowait(job)
+            return
+        await results.put(result)
+        self.outstanding -= 1
+        self.slots.release()
+        self.finish_if_idle(jobs)
+
+    async def cache_call(self, method, *args):
+        """在缓存专用线程中执行 CompletionCache 的方法"""
+        return await asyncio.get_running_loop().run_in_executor(self.cache_thread, method, *args)
+
+    async def cached_result(self, job):
+        if not self.cache:
+            return None
+        cached = await self.cache_call(self.cache.get, build_request(job.name, self.model))
+        if cached is None:
+            return None
+        content, tokens = cached
+        return Result(job, description=clean_and_format_content(content, job.name), tokens=tokens, cached=True)
+
+    async def complete(self, client, payload):
+        """按限速发送一次请求，返回 (内容, token 数, 错误信息, 是否可以重试)"""
+        estimated = estimate_tokens(payload)
+        wait = self.limiter.reserve(estimated)
+        if wait:
+            await asyncio.sleep(wait)
+
+        try:
+            response = await client.post(API_URL, json=payload)
+        except httpx.TimeoutException:
+            return None, 0, f'请求超时，暂停 {self.limiter.backoff():.1f} 秒', True
+        except httpx.HTTPError as e:
+            return None, 0, f'网络错误: {e}，暂停 {self.limiter.backoff():.1f} 秒', True
+
+        if response.status_code == 429:
+            retry_after = self.limiter.throttle(response.headers)
+            return None, 0, f'API配额限制，暂停 {retry_after:.1f} 秒', True
+        if response.status_code != 200:
+            if response.status_code == 401:
+                return None, 0, 'API密钥无效或已过期', False
+            error = f'API错误 {response.status_code}: {response.text[:200]}'
+            if response.status_code >= 500:
+                return None, 0, f'{error}，暂停 {self.limiter.backoff():.1f} 秒', True
+            return None, 0, error, False
+
+        try:
+            content, tokens = parse_completion(response.json())
+        except (ValueError, KeyError, IndexError, TypeError):
+            content, tokens = None, None
+        self.limiter.record(estimated, tokens, response.headers)
+        if content is None:
+            return None, 0, 'API响应格式错误', False
+        return content, tokens or 0, '', False
+
+    async def generate(self, client, job):
+        """生成一个动作的描述，返回 (结果, 是否可以重试)"""
+        cached = await self.cached_result(job)
+        if cached:
+            return cached, False
+        return await self.request(client, job)
+
+    async def request(self, client, job):
+        payload = build_request(job.name, self.model)
+        content, tokens, error, retryable = await self.complete(client, payload)
+        if error:
+            return Result(job, error=error), retryable
+        if self.cache:
+            await self.cache_call(self.cache.put, payload, content, tokens)
+        return Result(job, description=clean_and_format_content(content, job.name), tokens=tokens), False
+
+    async def generate_packed(self, client, jobs, batch):
+        """
+        一次请求生成多个动作，返回 [(任务, 结果, 是否可以重试)]
+        响应中缺失或未通过校验的动作标记为单独处理并直接重新入队，不出现在返回值中
+        打包响应以打包请求体为键缓存，与单独请求的缓存互不混用
+        """
+        outcomes = []
+        pending = []
+        for job in batch:
+            cached = await self.cached_result(job)
+            if cached:
+                outcomes.append((job, cached, False))
+            else:
+                pending.append(job)
+        if len(pending) == 1:
+            outcomes.append((pending[0], *await self.request(client, pending[0])))
+        if len(pending) <= 1:
+            return outcomes
+
+        names = [job.name for job in pending]
+        payload = build_packed_request(names, self.model)
+        cached = await self.cache_call(self.cache.get, payload) if self.cache else None
+        if cached:
+            (content, tokens), error = cached, ''
+        else:
+            self.stats['packed_requests'] += 1
+            content, tokens, error, retryable = await self.complete(client, payload)
+            if error and retryable:
+                outcomes.extend((job, Result(job, error=error), True) for job in pending)
+                return outcomes
+            if not error and self.cache:
+                await self.cache_call(self.cache.put, payload, content, tokens)
+
+        parsed = parse_packed_completion(content, names) if not error else [None] * len(pending)
+        valid = sum(1 for markdown in parsed if markdown)
+        for index, (job, markdown) in enumerate(zip(pending, parsed)):
+            if markdown is None:
+                job.single = True
+                self.stats['fallbacks'] += 1
+                self.log(f'  {job.name}: {error or "打包响应中缺少该动作或内容不完整"}，改为单独请求')
+                jobs.put_nowait(job)
+                continue
+            # token 按通过校验的动作平均分摊
+            share = tokens // valid + (tokens % valid if index == 0 else 0)
+            description = clean_and_format_content(markdown, job.name)
+            outcomes.append((job, Result(job, description=description, tokens=share, cached=bool(cached)), False))
+        return outcomes
+
+    async def write(self, results):
+        batch = []
+        finished = False
+        while not finished:
+            try:
+                result = await asyncio.wait_for(results.get(), FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                result = False
+            if result is None:
+                finished = True
+            elif result:
+                self.report(result)
+                if result.description:
+                    batch.append(result)
+
+            if batch and (finished or result is False or len(batch) >= self.batch_size):
+                saved, keywords = await sync_to_async(self.save)(batch)
+                self.stats['success'] += saved
+                self.stats['keywords'] += keywords
+                self.log(f'  已保存 {saved} 个动作的描述')
+                batch = []
+
+    def report(self, result):
+        self.stats['done'] += 1
+        progress = f'[{self.stats["done"]}/{self.total}]' if self.total else f'[{self.stats["done"]}]'
+        if result.cached:
+            self.log(f'{progress} ✓ {result.job.name} (命中缓存, {len(result.description)} 字符)')
+        elif result.description:
+            self.stats['tokens'] += result.tokens
+            self.log(f'{progress} ✓ {result.job.name} ({len(result.description)} 字符, {result.tokens} tokens)')
+        else:
+            self.stats['failed'] += 1
+            self.log(f'{progress} ✗ {result.job.name}: {result.error}')
@@ -0,0 +1,347 @@
+import bisect
+import http.client
+import json
+import math
+import random
+import statistics
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlencode, urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.db.models import Max, Min
+from fitness.models import BodyPart, Exercise
+from note.models import Article
+
+# 默认流量配比：接口名=权重
+DEFAULT_MIX = 'exercise_list=4,exercise_search=3,recommendations=2,exercise_detail=3,stats=1,article_detail=3,article_list=2'
+
+# 延迟直方图的分桶上限（毫秒）
+HISTOGRAM_BUCKETS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000]
+
+ENDPOINT_HEADER = 'X-Benchmark-Endpoint'
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class QueryTimer:
+    """connection.execute_wrapper 回调：累计一次请求内的 SQL 条数和耗时"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+
+class DatabaseStats:
+    """进程内模式下，按接口汇总服务端记录的 SQL 条数和耗时"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(list)
+
+    def wrap(self, app):
+        def instrumented(environ, start_response):
+            timer = QueryTimer()
+            with connection.execute_wrapper(timer):
+                response = app(environ, start_response)
+            endpoint = environ.get('HTTP_' + ENDPOINT_HEADER.upper().replace('-', '_'))
+            if endpoint:
+                with self.lock:
+                    self.samples[endpoint].append((timer.count, timer.seconds * 1000))
+            return response
+        return instrumented
+
+    def clear(self):
+        with self.lock:
+            self.samples.clear()
+
+
+class Command(BaseCommand):
+    help = '对 REST API 进行并发压测，按接口报告吞吐量、延迟分布和数据库耗时'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default=None, help='压测已运行的服务，例如 http://127.0.0.1:8000；默认在进程内启动 WSGI 服务')
+        parser.add_argument('--concurrency', type=int, default=8, help='并发连接数')
+        parser.add_argument('--requests', type=int, default=2000, help='总请求数（指定 --duration 时忽略）')
+        parser.add_argument('--duration', type=float, default=None, help='按时长压测（秒）')
+        parser.add_argument('--warmup', type=int, default=50, help='正式计时前的预热请求数')
+        parser.add_argument('--mix', default=DEFAULT_MIX, help=f'接口权重，默认 {DEFAULT_MIX}')
+        parser.add_argument('--sample-size', type=int, default=200, help='从数据库抽取用于构造 URL 的记录数量')
+        parser.add_argument('--seed', type=int, default=None, help='随机种子')
+        parser.add_argument('--json', dest='json_path', default=None, help='把结果写入 JSON 文件，便于比较不同版本')
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        mix = self.parse_mix(options['mix'])
+        self.samples = self.load_samples(options['sample_size'])
+        self.db_stats = None
+
+        server = None
+        if options['url']:
+            target = urlsplit(options['url'])
+            host, port = target.hostname, target.port or 80
+        else:
+            server, host, port = self.start_server()
+            self.stdout.write(f'已在进程内启动 WSGI 服务: http://{host}:{port}')
+
+        try:
+            if options['warmup']:
+                self.run(host, port, mix, options['concurrency'], options['warmup'], None)
+                if self.db_stats:
+                    self.db_stats.clear()
+
+            self.stdout.write(
+                f'开始压测：{options["concurrency"]} 个并发连接，'
+                + (f'持续 {options["duration"]} 秒' if options['duration'] else f'共 {options["requests"]} 个请求')
+            )
+            results, elapsed = self.run(host, port, mix, options['concurrency'], options['requests'], options['duration'])
+        finally:
+            if server:
+                server.shutdown()
+                server.server_close()
+
+        report = self.build_report(results, elapsed)
+        self.print_report(report)
+        if options['json_path']:
+            with open(options['json_path'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+            self.stdout.write(f'结果已写入 {options["json_path"]}')
+
+    def parse_mix(self, value):
+        endpoints = self.endpoints()
+        mix = {}
+        for item in value.split(','):
+            name, _, weight = item.strip().partition('=')
+            if name not in endpoints:
+                raise CommandError(f'未知接口 {name}，可选: {", ".join(endpoints)}')
+            try:
+                mix[name] = float(weight or 1)
+            except ValueError:
+                raise CommandError(f'接口 {name} 的权重无效: {weight}')
+        if not any(weight > 0 for weight in mix.values()):
+            raise CommandError('至少需要一个权重大于 0 的接口')
+        return mix
+
+    def sample_rows(self, queryset, fields, size):
+        """按主键区间随机抽样，避免在大表上 ORDER BY RANDOM()"""
+        bounds = queryset.aggregate(low=Min('id'), high=Max('id'))
+        if bounds['low'] is None:
+            return []
+        rows = {}
+        for _ in range(size):
+            start = self.random.randint(bounds['low'], bounds['high'])
+            row = queryset.filter(id__gte=start).order_by('id').values(*fields).first()
+            if row:
+                rows[row['id']] = row
+        return list(rows.values())
+
+    def load_samples(self, size):
+        exercises = self.sample_rows(
+            Exercise.objects.exclude(slug='').exclude(body_part__slug=''),
+            ['id', 'name', 'slug', 'body_part__slug'],
+            size,
+        )
+        articles = self.sample_rows(Article.objects.all(), ['id', 'slug'], size)
+        body_parts = list(BodyPart.objects.exclude(slug='').values_list('slug', flat=True))
+        if not exercises or not body_parts:
+            raise CommandError('数据库中没有动作数据，请先运行 import_exercises 或 generate_synthetic_data')
+
+        words = sorted({word for row in exercises for word in row['name'].split() if word.isalpha() and len(word) > 2})
+        return {
+            'exercises': exercises,
+            'articles': articles,
+            'body_parts': body_parts,
+            'search_terms': words or ['press'],
+            'exercise_pages': max(1, min(Exercise.objects.count() // 20, 50)),
+            'article_pages': max(1, min(Article.objects.count() // 10, 50)),
+        }
+
+    def endpoints(self):
+        """接口名 -> 根据随机数生成 URL 的函数"""
+        def exercise_list(rng):
+            return '/api/fitness/exercises/?' + urlencode({'page': rng.randint(1, self.samples['exercise_pages'])})
+
+        def exercise_search(rng):
+            return '/api/fitness/exercises/search/?' + urlencode({'search': rng.choice(self.samples['search_terms'])})
+
+        def recommendations(rng):
+            return f'/api/fitness/exercises/recommendations/{rng.choice(self.samples["body_parts"])}/'
+
+        def exercise_detail(rng):
+            row = rng.choice(self.samples['exercises'])
+            return f'/api/fitness/exercises/body-parts/{row["body_part__slug"]}/{row["slug"]}/'
+
+        def stats(rng):
+            return '/api/fitness/exercises/stats/'
+
+        def article_detail(rng):
+            if not self.samples['articles']:
+                return '/api/articles/1/'
+            row = rng.choice(self.samples['articles'])
+            return f'/api/articles/{row["slug"] or row["id"]}/'
+
+        def article_list(rng):
+            return '/api/articles/list/?' + urlencode({'page': rng.randint(1, self.samples['article_pages'])})
+
+        return {
+            'exercise_list': exercise_list,
+            'exercise_search': exercise_search,
+            'recommendations': recommendations,
+            'exercise_detail': exercise_detail,
+            'stats': stats,
+            'article_detail': article_detail,
+            'article_list': article_list,
+        }
+
+    def start_server(self):
+        """在后台线程中启动多线程 WSGI 服务，端口由系统分配"""
+        self.db_stats = DatabaseStats()
+        server = ThreadedWSGIServer(('127.0.0.1', 0), QuietRequestHandler, allow_reuse_address=False)
+        server.set_app(self.db_stats.wrap(get_wsgi_application()))
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        host, port = server.server_address[:2]
+        return server, host, port
+
+    def run(self, host, port, mix, concurrency, total, duration):
+        """启动 concurrency 个工作线程，每个线程使用一个长连接发送请求"""
+        endpoints = self.endpoints()
+        names = list(mix)
+        weights = [mix[name] for name in names]
+        results = defaultdict(list)
+        lock = threading.Lock()
+        remaining = [total]
+        deadline = time.perf_counter() + duration if duration else None
+
+        def take():
+            if deadline:
+                return time.perf_counter() < deadline
+            with lock:
+                if remaining[0] <= 0:
+                    return False
+                remaining[0] -= 1
+                return True
+
+        def worker(seed):
+            rng = random.Random(seed)
+            conn = http.client.HTTPConnection(host, port, timeout=60)
+            local = defaultdict(list)
+            while take():
+                name = rng.choices(names, weights)[0]
+                path = endpoints[name](rng)
+                started = time.perf_counter()
+                try:
+                    conn.request('GET', path, headers={ENDPOINT_HEADER: name})
+                    response = conn.getresponse()
+                    response.read()
+                    status = response.status
+                except (OSError, http.client.HTTPException):
+                    conn.close()
+                    status = 0
+                local[name].append(((time.perf_counter() - started) * 1000, status))
+            conn.close()
+            with lock:
+                for name, samples in local.items():
+                    results[name].extend(samples)
+
+        threads = [
+            threading.Thread(target=worker, args=(self.random.random(),))
+            for _ in range(max(concurrency, 1))
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, time.perf_counter() - started
+
+    def build_report(self, results, elapsed):
+        report = {'elapsed_seconds': round(elapsed, 3), 'endpoints': {}}
+        total = 0
+        for name, samples in sorted(results.items()):
+            latencies = sorted(latency for latency, status in samples)
+            errors = sum(1 for latency, status in samples if not 200 <= status < 400)
+            counts = [0] * (len(HISTOGRAM_BUCKETS) + 1)
+            for latency in latencies:
+                counts[bisect.bisect_left(HISTOGRAM_BUCKETS, latency)] += 1
+            labels = [f'<={bucket}ms' for bucket in HISTOGRAM_BUCKETS] + [f'>{HISTOGRAM_BUCKETS[-1]}ms']
+            histogram = dict(zip(labels, counts))
+
+            entry = {
+                'requests': len(samples),
+                'errors': errors,
+                'throughput_rps': round(len(samples) / elapsed, 2) if elapsed else 0,
+                'latency_ms': {
+                    'mean': round(statistics.fmean(latencies), 3),
+                    'p50': round(self.percentile(latencies, 0.50), 3),
+                    'p90': round(self.percentile(latencies, 0.90), 3),
+                    'p95': round(self.percentile(latencies, 0.95), 3),
+                    'p99': round(self.percentile(latencies, 0.99), 3),
+                    'max': round(latencies[-1], 3),
+                },
+                'histogram': histogram,
+            }
+            if self.db_stats and self.db_stats.samples.get(name):
+                db_samples = self.db_stats.samples[name]
+                entry['db'] = {
+                    'queries_per_request': round(statistics.fmean(count for count, ms in db_samples), 2),
+                    'time_ms_mean': round(statistics.fmean(ms for count, ms in db_samples), 3),
+                    'time_ms_p95': round(self.percentile(sorted(ms for count, ms in db_samples), 0.95), 3),
+                }
+            report['endpoints'][name] = entry
+            total += len(samples)
+
+        report['total_requests'] = total
+        report['throughput_rps'] = round(total / elapsed, 2) if elapsed else 0
+        return report
+
+    @staticmethod
+    def percentile(ordered, fraction):
+        """最近秩法百分位数，ordered 需已排序"""
+        if not ordered:
+            return 0.0
+        return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+    def print_report(self, report):
+        self.stdout.write('')
+        header = f'{"接口":<18}{"请求":>7}{"错误":>6}{"RPS":>9}{"p50":>9}{"p95":>9}{"p99":>9}{"max":>9}{"SQL/次":>8}{"DB ms":>9}'
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for name, entry in report['endpoints'].items():
+            latency = entry['latency_ms']
+            db = entry.get('db')
+            self.stdout.write(
+                f'{name:<18}{entry["requests"]:>7}{entry["errors"]:>6}{entry["throughput_rps"]:>9.1f}'
+                f'{latency["p50"]:>9.2f}{latency["p95"]:>9.2f}{latency["p99"]:>9.2f}{latency["max"]:>9.2f}'
+                + (f'{db["queries_per_request"]:>8.1f}{db["time_ms_mean"]:>9.2f}' if db else f'{"-":>8}{"-":>9}')
+            )
+        self.stdout.write('-' * len(header))
+        self.stdout.write(
+            f'总计 {report["total_requests"]} 个请求，耗时 {report["elapsed_seconds"]} 秒，吞吐量 {report["throughput_rps"]} 请求/秒'
+        )
+        if not self.db_stats:
+            self.stdout.write('（压测外部服务时无法统计数据库耗时）')
+
+        self.stdout.write('\n延迟分布：')
+        for name, entry in report['endpoints'].items():
+            self.stdout.write(f'  {name}')
+            peak = max(entry['histogram'].values()) or 1
+            for label, count in entry['histogram'].items():
+                if count:
+                    bar = '#' * max(1, round(40 * count / peak))
+                    self.stdout.write(f'    {label:>10} {count:>7} {bar}')
@@ -0,0 +1,203 @@
+import json
+import math
+import statistics
+import time
+import tracemalloc
+import warnings
+
+from bs4 import MarkupResemblesLocatorWarning
+from django.core.management.base import BaseCommand, CommandError
+from fitness.descriptions import clean_and_format_content, extract_keyword_mappings
+from fitness.models import BodyPart, Exercise
+from fitness.rendering import format_markdown_content, render_description_html, render_description_markdown
+from note.models import Article, build_excerpt
+
+# 每个基准测试最多统计内存分配的输入数量（tracemalloc 会显著拖慢执行）
+ALLOCATION_SAMPLES = 50
+
+
+def pathological_inputs():
+    """构造容易触发正则回溯、深层递归或超线性行为的输入"""
+    descriptions = {
+        'empty': '',
+        'single-line-bullets': ' '.join(f'- Keep the elbow tucked on rep {i}.' for i in range(2000)),
+        'single-line-numbered': ' '.join(f'{i}. Lower the bar slowly {i}.' for i in range(2000)),
+        'many-headings': '\n'.join(f'## Heading {i}\n\nText.' for i in range(1000)),
+        'long-line-no-markers': 'word ' * 20000,
+        'deep-nesting': '<div>' * 400 + 'text' + '</div>' * 400,
+        'unclosed-tags': '<p><b><i>text ' * 1000,
+        'cjk-no-spaces': '保持核心收紧控制离心阶段' * 5000,
+    }
+    articles = {
+        'empty': '',
+        'deep-nesting': '<div>' * 400 + '<p>正文</p>' + '</div>' * 400,
+        'unclosed-tags': '<p><b><i>心率 ' * 1000,
+        'huge-table': '<table>' + '<tr><td>训练</td><td>恢复</td></tr>' * 5000 + '</table>',
+        'entities': '&nbsp;&amp;&lt;' * 20000,
+    }
+    return {
+        'description': [
+            {'label': label, 'text': text, 'name': 'bench press', 'body_part': 'chest'}
+            for label, text in descriptions.items()
+        ],
+        'article': [{'label': label, 'text': text, 'title': label} for label, text in articles.items()],
+    }
+
+
+def extract_model_keywords(item):
+    exercise = Exercise(name=item['name'], description=item['text'], body_part=BodyPart(name=item['body_part']))
+    return exercise.extract_keywords_from_description()
+
+
+# 基准测试名 -> (语料类型, 被测函数)
+BENCHMARKS = {
+    'build_excerpt': ('article', lambda item: build_excerpt(item['text'])),
+    'format_markdown_content': ('description', lambda item: format_markdown_content(item['text'])),
+    'render_description_markdown': ('description', lambda item: render_description_markdown(item['text'])),
+    'render_description_html': ('description', lambda item: render_description_html(item['text'])),
+    'clean_and_format_content': ('description', lambda item: clean_and_format_content(item['text'], item['name'])),
+    'extract_keyword_mappings': (
+        'description', lambda item: extract_keyword_mappings(item['text'], item['name'], item['body_part']),
+    ),
+    'extract_keywords_from_description': ('description', extract_model_keywords),
+}
+
+
+class Command(BaseCommand):
+    help = '对描述转换、摘要和关键词提取等文本处理函数进行基准测试，报告每秒操作数和内存分配'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--corpus', default=None, help='从 JSON 文件读取语料（由 --export 生成），默认直接读取数据库')
+        parser.add_argument('--export', default=None, help='把数据库中的语料导出为 JSON 文件后退出')
+        parser.add_argument('--limit', type=int, default=200, help='每类语料从数据库读取的记录数量（0 表示全部）')
+        parser.add_argument('--min-time', type=float, default=1.0, help='每个基准测试至少运行的秒数')
+        parser.add_argument('--only', default=None, help='只运行指定的基准测试，逗号分隔')
+        parser.add_argument('--skip-pathological', action='store_true', help='不运行病态输入')
+        parser.add_argument('--json', dest='json_path', default=None, help='把结果写入 JSON 文件，便于比较不同版本')
+
+    def handle(self, *args, **options):
+        names = list(BENCHMARKS)
+        if options['only']:
+            names = [name.strip() for name in options['only'].split(',') if name.strip()]
+            unknown = [name for name in names if name not in BENCHMARKS]
+            if unknown:
+                raise CommandError(f'未知基准测试 {", ".join(unknown)}，可选: {", ".join(BENCHMARKS)}')
+
+        if options['corpus']:
+            with open(options['corpus'], encoding='utf-8') as file:
+                corpus = json.load(file)
+        else:
+            corpus = self.load_corpus(options['limit'])
+
+        if options['export']:
+            with open(options['export'], 'w', encoding='utf-8') as file:
+                json.dump(corpus, file, ensure_ascii=False)
+            self.stdout.write(self.style.SUCCESS(
+                f'已导出 {len(corpus["description"])} 条动作描述、{len(corpus["article"])} 篇文章到 {options["export"]}'
+            ))
+            return
+
+        # 很短的输入会被 BeautifulSoup 当作文件名并发出警告，与测试无关
+        warnings.simplefilter('ignore', MarkupResemblesLocatorWarning)
+        self.stdout.write(f'语料：{len(corpus["description"])} 条动作描述，{len(corpus["article"])} 篇文章')
+        suites = [('corpus', corpus)]
+        if not options['skip_pathological']:
+            suites.append(('pathological', pathological_inputs()))
+
+        report = {}
+        for suite, inputs in suites:
+            report[suite] = {}
+            for name in names:
+                kind, function = BENCHMARKS[name]
+                items = inputs.get(kind) or []
+                if items:
+                    report[suite][name] = self.measure(function, items, options['min_time'])
+
+        self.print_report(report)
+        if options['json_path']:
+            with open(options['json_path'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+            self.stdout.write(f'结果已写入 {options["json_path"]}')
+
+    def load_corpus(self, limit):
+        exercises = Exercise.objects.exclude(description='').select_related('body_part').order_by('id')
+        articles = Article.objects.only('title', 'content').order_by('id')
+        if limit:
+            exercises, articles = exercises[:limit], articles[:limit]
+        return {
+            'description': [
+                {
+                    'label': exercise.slug or str(exercise.id),
+                    'text': exercise.description,
+                    'name': exercise.name,
+                    'body_part': exercise.body_part.name,
+                }
+                for exercise in exercises.iterator()
+            ],
+            'article': [
+                {'label': article.slug or str(article.id), 'text': article.content, 'title': article.title}
+                for article in articles.iterator()
+            ],
+        }
+
+    def measure(self, function, items, min_time):
+        """循环处理全部输入直到累计耗时超过 min_time，再单独统计一轮内存分配"""
+        timings = [[] for _ in items]
+        total = 0.0
+        while total < min_time:
+            for index, item in enumerate(items):
+                started = time.perf_counter()
+                function(item)
+                elapsed = time.perf_counter() - started
+                timings[index].append(elapsed)
+                total += elapsed
+
+        calls = [elapsed for per_item in timings for elapsed in per_item]
+        calls.sort()
+        slowest = max(range(len(items)), key=lambda index: statistics.fmean(timings[index]))
+
+        peaks = []
+        tracemalloc.start()
+        try:
+            for item in items[:ALLOCATION_SAMPLES]:
+                tracemalloc.reset_peak()
+                baseline = tracemalloc.get_traced_memory()[0]
+                function(item)
+                peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'inputs': len(items),
+            'calls': len(calls),
+            'ops_per_sec': round(len(calls) / total, 1),
+            'mean_us': round(statistics.fmean(calls) * 1e6, 1),
+            'p50_us': round(self.percentile(calls, 0.50) * 1e6, 1),
+            'p99_us': round(self.percentile(calls, 0.99) * 1e6, 1),
+            'max_us': round(calls[-1] * 1e6, 1),
+            'slowest_input': items[slowest]['label'],
+            'slowest_input_chars': len(items[slowest]['text']),
+            'peak_kib_mean': round(statistics.fmean(peaks) / 1024, 1),
+            'peak_kib_max': round(max(peaks) / 1024, 1),
+        }
+
+    @staticmethod
+    def percentile(ordered, fraction):
+        """最近秩法百分位数，ordered 需已排序"""
+        return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+    def print_report(self, report):
+        header = (
+            f'{"基准测试":<36}{"ops/s":>10}{"mean µs":>11}{"p50 µs":>11}{"p99 µs":>12}'
+            f'{"峰值KiB":>10}{"最大KiB":>10}  最慢输入'
+        )
+        for suite, results in report.items():
+            self.stdout.write(f'\n[{suite}]')
+            self.stdout.write(header)
+            self.stdout.write('-' * 110)
+            for name, result in results.items():
+                self.stdout.write(
+                    f'{name:<36}{result["ops_per_sec"]:>10.1f}{result["mean_us"]:>11.1f}{result["p50_us"]:>11.1f}'
+                    f'{result["p99_us"]:>12.1f}{result["peak_kib_mean"]:>10.1f}{result["peak_kib_max"]:>10.1f}'
+                    f'  {result["slowest_input"]} ({result["slowest_input_chars"]} 字符)'
+                )
@@ -1,9 +1,16 @@
 from django.core.management.base import BaseCommand
 from django.conf import settings
+from fitness.batch import batch_status, download_batch_output, ingest_results, submit_batch, write_request_file
+from fitness.completion_cache import CompletionCache
+from fitness.descriptions import (
+    API_URL, build_request, clean_and_format_content, estimate_tokens, extract_keyword_mappings, parse_completion,
+)
+from fitness.generation import DescriptionPipeline
 from fitness.models import Exercise, ContentKeywordMapping
+from fitness.ratelimit import RateLimiter
+import asyncio
 import requests
 import time
-import re
 
 
 class Command(BaseCommand):
@@ -43,8 +50,85 @@ class Command(BaseCommand):
             action='store_true',
             help='同时提取关键词并创建映射关系',
         )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=None,
+            help='并发请求数；指定后使用异步连接池并发调用API，忽略 --delay',
+        )
+        parser.add_argument(
+            '--rpm',
+            type=int,
+            default=None,
+            help='每分钟请求数上限；不指定时根据API返回的 x-ratelimit-* 头自动确定',
+        )
+        parser.add_argument(
+            '--tpm',
+            type=int,
+            default=None,
+            help='每分钟token数上限；不指定时根据API返回的 x-ratelimit-* 头自动确定',
+        )
+        parser.add_argument(
+            '--max-retries',
+            type=int,
+            default=5,
+            help='限流、超时或服务端错误时的最大重试次数',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=20,
+            help='并发模式和批处理导入时每批写入数据库的动作数量',
+        )
+        parser.add_argument(
+            '--pack',
+            type=int,
+            default=1,
+            help='每次请求打包的动作数量（返回JSON后逐个拆分校验，失败的动作改为单独请求）；大于1时使用并发模式',
+        )
+        parser.add_argument(
+            '--no-cache',
+            action='store_true',
+            help='不读写本地响应缓存，总是调用API',
+        )
+        parser.add_argument(
+            '--batch-export',
+            metavar='FILE',
+            default=None,
+            help='不调用API，把待处理的动作写成 Batch API 请求文件（JSONL）',
+        )
+        parser.add_argument(
+            '--batch-submit',
+            metavar='FILE',
+            default=None,
+            help='上传请求文件并创建 Batch API 任务',
+        )
+        parser.add_argument(
+            '--batch-fetch',
+            metavar='BATCH_ID',
+            default=None,
+            help='查询 Batch API 任务状态，完成后下载结果文件并导入',
+        )
+        parser.add_argument(
+            '--batch-import',
+            metavar='FILE',
+            default=None,
+            help='导入本地的 Batch API 结果文件（不访问网络）',
+        )
 
     def handle(self, *args, **options):
+        model = options['model'] or settings.OPENAI_MODEL
+
+        # 批处理的导出和导入不需要API密钥
+        if options['batch_export']:
+            exercises = self.get_exercises(options['force'])
+            count = write_request_file(exercises, options['batch_export'], model, options['limit'])
+            self.stdout.write(self.style.SUCCESS(f'已写入 {count} 个请求到 {options["batch_export"]}（模型: {model}）'))
+            self.stdout.write(f'提交: python manage.py generate_descriptions --batch-submit {options["batch_export"]}')
+            return
+        if options['batch_import']:
+            return self.import_batch_results(options['batch_import'], options)
+
         # 检查API密钥
         api_key = settings.OPENAI_API_KEY
         if not api_key:
@@ -59,7 +143,21 @@ class Command(BaseCommand):
             self.stdout.write('5. 设置环境变量: set OPENAI_API_KEY=your_api_key')
             return
 
-        model = options['model'] or settings.OPENAI_MODEL
+        if options['batch_submit']:
+            batch = submit_batch(options['batch_submit'], api_key)
+            self.stdout.write(self.style.SUCCESS(f'已创建批处理任务 {batch["id"]}（状态: {batch["status"]}）'))
+            self.stdout.write(f'完成后运行: python manage.py generate_descriptions --batch-fetch {batch["id"]}')
+            return
+        if options['batch_fetch']:
+            return self.fetch_batch(options['batch_fetch'], api_key, options)
+
+        self.limiter = RateLimiter(rpm=options['rpm'], tpm=options['tpm'])
+        self.cache = None
+        if not options['no_cache'] and not options['dry_run']:
+            self.cache = CompletionCache(
+                settings.OPENAI_COMPLETION_CACHE_PATH, settings.OPENAI_COMPLETION_CACHE_MAX_BYTES,
+            )
+        self.max_retries = max(options['max_retries'], 0)
 
         force = options['force']
         limit = options['limit']
@@ -68,12 +166,10 @@ class Command(BaseCommand):
         extract_keywords = options['extract_keywords']
 
         # 获取需要处理的动作
-        if force:
-            exercises = Exercise.objects.all()
-            self.stdout.write(f'强制模式: 将处理所有 {exercises.count()} 个动作')
-        else:
-            exercises = Exercise.objects.filter(description__isnull=True) | Exercise.objects.filter(description='')
-            self.stdout.write(f'将处理 {exercises.count()} 个没有描述的动作')
+        exercises = self.get_exercises(force)
+
+        if options['concurrency'] or options['pack'] > 1:
+            return self.handle_concurrent(exercises, model, api_key, options)
 
         if limit:
             exercises = exercises[:limit]
@@ -133,8 +229,8 @@ class Command(BaseCommand):
                         self.style.WARNING(f'  ⚠ 生成描述失败')
                     )
                 
-                # 延迟以避免超过API配额
-                if i < total:  # 最后一个请求后不需要延迟
+                # 延迟以避免超过API配额（命中缓存时没有调用API）
+                if i < total and not self.served_from_cache:  # 最后一个请求后不需要延迟
                     time.sleep(delay)
                     
             except Exception as e:
@@ -152,6 +248,9 @@ class Command(BaseCommand):
         self.stdout.write(f'生成失败: {skipped_count} 个')
         self.stdout.write(f'处理错误: {error_count} 个')
         self.stdout.write(f'总计处理: {total} 个')
+        if self.limiter.stats['throttled']:
+            self.stdout.write(f'限流: {self.limiter.stats["throttled"]} 次')
+        self.report_cache()
         
         if extract_keywords and keyword_count > 0:
             self.stdout.write(f'提取关键词: {keyword_count} 个')
@@ -159,19 +258,142 @@ class Command(BaseCommand):
         if total > 0:
             self.stdout.write(f'\n成功率: {(success_count/total)*100:.1f}%')
 
+    def report_cache(self):
+        if self.cache:
+            stats = self.cache.stats
+            self.stdout.write(
+                f'缓存命中: {stats["hits"]}/{stats["hits"] + stats["misses"]} ({self.cache.hit_rate*100:.1f}%)，'
+                f'节省tokens: {stats["tokens_saved"]}'
+            )
+            self.cache.close()
+
+    def get_exercises(self, force):
+        if force:
+            exercises = Exercise.objects.all()
+            self.stdout.write(f'强制模式: 将处理所有 {exercises.count()} 个动作')
+        else:
+            exercises = Exercise.objects.filter(description__isnull=True) | Exercise.objects.filter(description='')
+            self.stdout.write(f'将处理 {exercises.count()} 个没有描述的动作')
+        return exercises
+
+    def fetch_batch(self, batch_id, api_key, options):
+        """
+        查询批处理任务，完成后下载结果文件并导入
+        """
+        batch = batch_status(batch_id, api_key)
+        counts = batch.get('request_counts') or {}
+        self.stdout.write(
+            f'任务 {batch_id} 状态: {batch["status"]}'
+            f'（完成 {counts.get("completed", 0)}，失败 {counts.get("failed", 0)}，共 {counts.get("total", 0)}）'
+        )
+        if batch['status'] != 'completed':
+            return
+
+        path = f'description_batch_{batch_id}_output.jsonl'
+        if not download_batch_output(batch, path, api_key):
+            self.stdout.write(self.style.WARNING('任务没有结果文件'))
+            return
+        self.stdout.write(f'结果文件已保存到 {path}')
+        self.import_batch_results(path, options)
+
+    def import_batch_results(self, path, options):
+        """
+        流式导入批处理结果文件，按批保存
+        """
+        self.stdout.write(f'正在导入 {path}')
+        stats = ingest_results(
+            path,
+            extract_keywords=options['extract_keywords'],
+            batch_size=max(options['batch_size'], 1),
+            log=self.stdout.write,
+        )
+        self.stdout.write('\n' + '='*60)
+        self.stdout.write(self.style.SUCCESS('导入完成!'))
+        self.stdout.write(f'成功保存描述: {stats["success"]} 个')
+        self.stdout.write(f'请求失败: {stats["failed"]} 个（这些动作保持不变，可重新导出后再次提交）')
+        if stats['missing']:
+            self.stdout.write(f'动作已不存在: {stats["missing"]} 个')
+        self.stdout.write(f'使用tokens: {stats["tokens"]}')
+        if options['extract_keywords'] and stats['keywords'] > 0:
+            self.stdout.write(f'提取关键词: {stats["keywords"]} 个')
+
+    def handle_concurrent(self, exercises, model, api_key, options):
+        """
+        并发模式：流式读取动作，连接池并发请求，结果按批写入
+        """
+        limit = options['limit']
+        total = exercises.count()
+        if limit:
+            total = min(total, limit)
+            self.stdout.write(f'限制处理数量为 {limit} 个动作')
+
+        if options['dry_run']:
+            self.stdout.write('\n' + '='*50)
+            self.stdout.write('DRY RUN 模式 - 将要处理的动作:')
+            names = exercises.values_list('name', 'body_part__name')
+            for name, body_part in (names[:limit] if limit else names).iterator():
+                self.stdout.write(f'  - {name} (部位: {body_part})')
+            self.stdout.write(f'\n总计: {total} 个动作')
+            return
+
+        self.stdout.write(f'使用模型: {model}')
+        concurrency = options['concurrency'] or 1
+        self.stdout.write(f'并发请求数: {concurrency}，每批写入 {options["batch_size"]} 个')
+        if options['pack'] > 1:
+            self.stdout.write(f'每次请求打包 {options["pack"]} 个动作')
+        if options['extract_keywords']:
+            self.stdout.write('将提取关键词并创建映射关系')
+
+        pipeline = DescriptionPipeline(
+            exercises,
+            model,
+            api_key,
+            concurrency=concurrency,
+            batch_size=options['batch_size'],
+            limit=limit,
+            total=total,
+            extract_keywords=options['extract_keywords'],
+            limiter=self.limiter,
+            cache=self.cache,
+            pack=options['pack'],
+            max_retries=self.max_retries,
+            log=self.stdout.write,
+        )
+        stats = asyncio.run(pipeline.run())
+
+        self.stdout.write('\n' + '='*60)
+        self.stdout.write(self.style.SUCCESS('处理完成!'))
+        self.stdout.write(f'成功生成描述: {stats["success"]} 个')
+        self.stdout.write(f'生成失败: {stats["failed"]} 个')
+        self.stdout.write(f'总计处理: {stats["done"]} 个，耗时 {stats["elapsed"]:.1f} 秒')
+        self.stdout.write(f'使用tokens: {stats["tokens"]}')
+        self.stdout.write(f'重试: {stats["retries"]} 次，其中限流 {stats["throttled"]} 次')
+        if options['pack'] > 1:
+            self.stdout.write(f'打包请求: {stats["packed_requests"]} 次，改为单独请求的动作: {stats["fallbacks"]} 个')
+        self.report_cache()
+        if options['extract_keywords'] and stats['keywords'] > 0:
+            self.stdout.write(f'提取关键词: {stats["keywords"]} 个')
+        if stats['done'] > 0:
+            self.stdout.write(f'\n成功率: {(stats["success"]/stats["done"])*100:.1f}%')
+
     def generate_exercise_description(self, exercise_name, model, api_key):
         """
         使用requests直接调用OpenAI API生成健身动作描述
+        限流、超时和服务端错误时重试，最多 --max-retries 次
         """
-        # 构建提示词
-        prompt = f"""Generate {exercise_name} content, including:
-- What is {exercise_name}?
-- {exercise_name} Tutorial
-- Common Mistakes
-- Tips for Better Results
-- Muscles Worked
-Generate content directly, do not reply with other useless information."""
+        self.served_from_cache = False
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.stdout.write(f'    第 {attempt} 次重试...')
+            content, retryable = self.request_description(exercise_name, model, api_key)
+            if not retryable:
+                return content
+        return None
 
+    def request_description(self, exercise_name, model, api_key):
+        """
+        调用一次API，返回 (描述, 是否可以重试)
+        """
         try:
             self.stdout.write(f'    正在调用ChatGPT API...')
             
@@ -181,161 +403,103 @@ Generate content directly, do not reply with other useless information."""
                 'Content-Type': 'application/json'
             }
             
-            data = {
-                'model': model,
-                'messages': [
-                    {
-                        'role': 'system',
-                        'content': 'You are a professional fitness trainer and expert. Generate comprehensive, accurate, and practical fitness exercise descriptions in markdown format. Use proper markdown headers (##), lists, and emphasis. Structure the content with clear sections: What is [exercise]?, Tutorial, Common Mistakes, Tips for Better Results, and Muscles Worked.'
-                    },
-                    {
-                        'role': 'user',
-                        'content': prompt
-                    }
-                ],
-                'max_tokens': 2000,
-                'temperature': 0.7,
-                'top_p': 1.0,
-                'frequency_penalty': 0.0,
-                'presence_penalty': 0.0
-            }
+            data = build_request(exercise_name, model)
+            cached = self.cache.get(data) if self.cache else None
+            if cached:
+                self.stdout.write(f'    命中缓存，节省tokens: {cached[1]}')
+                self.served_from_cache = True
+                return self.clean_and_format_content(cached[0], exercise_name), False
+            estimated_tokens = estimate_tokens(data)
+            
+            # 按 RPM / TPM 限额等待
+            wait = self.limiter.reserve(estimated_tokens)
+            if wait:
+                self.stdout.write(f'    限速等待 {wait:.1f} 秒')
+                time.sleep(wait)
             
             response = requests.post(
-                'https://api.openai.com/v1/chat/completions',
+                API_URL,
                 headers=headers,
                 json=data,
                 timeout=60
             )
             
             if response.status_code == 200:
-                result = response.json()
+                content, tokens_used = parse_completion(response.json())
+                self.limiter.record(estimated_tokens, tokens_used, response.headers)
                 
-                if 'choices' in result and result['choices']:
-                    content = result['choices'][0]['message']['content'].strip()
+                if content is not None:
+                    if self.cache:
+                        self.cache.put(data, content, tokens_used)
                     
                     # 清理和格式化内容
                     content = self.clean_and_format_content(content, exercise_name)
                     
                     # 记录使用的tokens
-                    if 'usage' in result:
-                        tokens_used = result['usage']['total_tokens']
+                    if tokens_used is not None:
                         self.stdout.write(f'    使用tokens: {tokens_used}')
                     
-                    return content
+                    return content, False
                 else:
                     self.stdout.write(f'    API响应格式错误')
-                    return None
+                    return None, False
+            elif response.status_code == 429:
+                retry_after = self.limiter.throttle(response.headers)
+                self.stdout.write(f'    API配额限制，{retry_after:.1f} 秒后重试')
+                return None, True
             else:
-                error_info = response.json() if response.content else {}
+                # 网关返回的 5xx 可能不是 JSON
+                error_info = response.text[:200]
                 if response.status_code == 401:
                     self.stdout.write(f'    API密钥无效或已过期')
-                elif response.status_code == 429:
-                    self.stdout.write(f'    API配额限制，建议增加延迟时间')
                 else:
                     self.stdout.write(f'    API错误 {response.status_code}: {error_info}')
-                return None
+                if response.status_code >= 500:
+                    self.stdout.write(f'    {self.limiter.backoff():.1f} 秒后重试')
+                    return None, True
+                return None, False
                 
         except requests.exceptions.Timeout:
-            self.stdout.write(f'    请求超时，建议检查网络连接')
-            return None
+            self.stdout.write(f'    请求超时，建议检查网络连接，{self.limiter.backoff():.1f} 秒后重试')
+            return None, True
         except requests.exceptions.RequestException as e:
-            self.stdout.write(f'    网络错误: {str(e)}')
-            return None
+            self.stdout.write(f'    网络错误: {str(e)}，{self.limiter.backoff():.1f} 秒后重试')
+            return None, True
         except Exception as e:
             self.stdout.write(f'    未知错误: {str(e)}')
-            return None
+            return None, False
 
     def clean_and_format_content(self, content, exercise_name):
         """
         清理和格式化生成的内容
         """
-        # 移除可能的多余空行
-        content = re.sub(r'\n{3,}', '\n\n', content)
-        
-        # 确保标题格式正确（保持二级标题）
-        content = re.sub(r'^#{1,6}\s*(.+)$', r'## \1', content, flags=re.MULTILINE)
-        
-        # 如果内容没有主标题，添加一个
-        if not content.startswith('#'):
-            content = f"# {exercise_name.title()}\n\n{content}"
-        
-        # 确保列表格式正确
-        content = re.sub(r'^\s*[-•]\s*', '- ', content, flags=re.MULTILINE)
-        content = re.sub(r'^\s*\d+\.\s*', lambda m: f"{m.group().strip()} ", content, flags=re.MULTILINE)
-        
-        # 移除开头和结尾的引号或其他包装符号
-        content = content.strip('"\'`')
-        
-        return content.strip()
+        return clean_and_format_content(content, exercise_name)
 
     def extract_and_save_keywords(self, exercise, description):
         """
         从生成的描述中提取关键词并保存映射关系
         """
         try:
-            # 提取markdown标题作为关键词
-            headers = re.findall(r'^##\s*(.+)$', description, re.MULTILINE)
-            
-            # 分析不同类型的内容
-            content_mapping = {
-                'what_is': ['what is', 'definition', 'about'],
-                'tutorial': ['tutorial', 'how to', 'steps', 'technique', 'form'],
-                'mistakes': ['mistakes', 'errors', 'avoid', 'common'],
-                'tips': ['tips', 'better', 'improve', 'advice'],
-                'muscles': ['muscles', 'worked', 'target', 'primary', 'secondary']
-            }
-            
-            keywords = []
-            
-            # 清除现有的关键词映射
+            mappings = extract_keyword_mappings(
+                description, exercise.name, exercise.body_part.name if exercise.body_part else '',
+            )
+
+            # 清除现有的关键词映射后批量写入
             ContentKeywordMapping.objects.filter(exercise=exercise).delete()
-            
-            for header in headers:
-                clean_header = re.sub(r'[#*_`]', '', header).strip().lower()
-                
-                # 确定内容类型
-                content_type = 'other'
-                for type_key, type_keywords in content_mapping.items():
-                    if any(keyword in clean_header for keyword in type_keywords):
-                        content_type = type_key
-                        break
-                
-                # 创建关键词映射
-                if clean_header and len(clean_header) > 2:
-                    ContentKeywordMapping.objects.create(
-                        exercise=exercise,
-                        keyword=clean_header,
-                        content_type=content_type,
-                        relevance_score=1.0
-                    )
-                    keywords.append(clean_header)
-            
-            # 添加基础关键词
-            base_keywords = [
-                (exercise.name.lower(), 'other'),
-                (exercise.body_part.name.lower() if exercise.body_part else '', 'muscles'),
-                ('exercise', 'other'),
-                ('workout', 'other'),
-                ('fitness', 'other'),
-                ('training', 'other')
-            ]
-            
-            for keyword, content_type in base_keywords:
-                if keyword and keyword not in keywords:
-                    ContentKeywordMapping.objects.get_or_create(
-                        exercise=exercise,
-                        keyword=keyword,
-                        content_type=content_type,
-                        defaults={'relevance_score': 0.8}
-                    )
-                    keywords.append(keyword)
-            
+            ContentKeywordMapping.objects.bulk_create([
+                ContentKeywordMapping(
+                    exercise=exercise, keyword=keyword, content_type=content_type, relevance_score=score,
+                )
+                for keyword, content_type, score in mappings
+            ])
+
             # 保存关键词到Exercise模型
+            keywords = list(dict.fromkeys(keyword for keyword, _, _ in mappings))
             exercise.set_generated_keywords(keywords)
             exercise.save()
-            
+
             return keywords
-            
+
         except Exception as e:
             self.stdout.write(f'    关键词提取失败: {str(e)}')
             return []
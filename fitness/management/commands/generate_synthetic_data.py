@@ -0,0 +1,249 @@
+import random
+import secrets
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from fitness.models import BodyPart, ContentKeywordMapping, Exercise, refresh_exercise_counts
+from fitness.recommendations import invalidate_pools
+from fitness.rendering import render_description
+from fitness.search import index_exercises
+from fitness.stats import invalidate_stats
+from note.models import Article, ArticleSearchToken, build_excerpt, rebuild_keyword_aliases
+from note.search import token_weights
+
+BODY_PART_NAMES = [
+    'chest', 'back', 'shoulders', 'biceps', 'triceps', 'forearms', 'abs', 'obliques',
+    'glutes', 'quadriceps', 'hamstrings', 'calves', 'hip flexors', 'adductors', 'traps', 'lats',
+]
+EQUIPMENT = ['barbell', 'dumbbell', 'kettlebell', 'cable', 'machine', 'band', 'smith machine', 'bodyweight']
+MOVEMENTS = ['press', 'row', 'curl', 'raise', 'squat', 'lunge', 'deadlift', 'fly', 'extension', 'pulldown', 'bridge', 'twist']
+VARIANTS = ['incline', 'decline', 'seated', 'standing', 'single arm', 'alternating', 'paused', 'tempo', 'wide grip', 'close grip']
+CONTENT_TYPES = ['what_is', 'tutorial', 'mistakes', 'tips', 'muscles', 'other']
+
+MARKDOWN_SENTENCES = [
+    'Keep your core braced throughout the movement.',
+    'Control the eccentric phase for two to three seconds.',
+    'Drive through the whole foot and keep the knees tracking over the toes.',
+    'Avoid shrugging the shoulders toward the ears.',
+    'Exhale on the effort and inhale on the way back.',
+    'Start with a light load and add weight only when form is consistent.',
+    'Pause briefly at the point of peak contraction.',
+    'Keep the neck neutral and the gaze slightly ahead.',
+]
+ARTICLE_SENTENCES = [
+    '心率变异性反映了自主神经系统的调节能力，是评估恢复状态的重要指标。',
+    '静息心率越低，通常说明心肺功能越好，但也要结合个人情况判断。',
+    '规律的有氧运动可以降低血压，并改善睡眠质量和情绪状态。',
+    '高强度间歇训练可以在较短时间内提升最大摄氧量。',
+    '训练后的恢复同样重要，睡眠不足会让第二天的静息心率升高。',
+    'Heart rate variability is the variation in time between consecutive beats.',
+    'Zone two training builds an aerobic base without excessive fatigue.',
+    '补充足够的水分和电解质有助于维持长时间运动的表现。',
+]
+ARTICLE_TOPICS = ['心率', '睡眠', '恢复', '有氧训练', '力量训练', '营养', 'heart rate', 'vo2 max']
+
+# 描述和正文模板数量：每个模板只转换一次，再由所有记录复用
+TEMPLATE_COUNT = 32
+
+
+class Command(BaseCommand):
+    help = '批量生成合成的部位、动作、关键词映射和文章数据，用于压测和基准测试'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--body-parts', type=int, default=16, help='生成的部位数量')
+        parser.add_argument('--exercises', type=int, default=1000, help='生成的动作数量')
+        parser.add_argument('--mappings-per-exercise', type=int, default=3, help='每个动作的关键词映射数量（最多6）')
+        parser.add_argument('--articles', type=int, default=100, help='生成的文章数量')
+        parser.add_argument('--batch-size', type=int, default=5000, help='每次批量插入的行数')
+        parser.add_argument('--seed', type=int, default=None, help='随机种子，相同种子生成相同内容')
+        parser.add_argument(
+            '--skip-index',
+            action='store_true',
+            help='不写入动作全文索引和文章检索词元（之后可运行 rebuild_exercise_search / rebuild_search_index）',
+        )
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = max(options['batch_size'], 1)
+        self.skip_index = options['skip_index']
+        # 本次生成的 slug 统一带上批次标识，避免与已有数据冲突，无需逐个查询；
+        # 随机后缀保证重复使用同一个 --seed 时 slug 也不会冲突
+        self.run_id = secrets.token_hex(3)
+        if options['seed'] is not None:
+            self.run_id = f'{options["seed"]:x}-{self.run_id}'
+
+        started = time.perf_counter()
+        with transaction.atomic():
+            body_parts = self.generate_body_parts(options['body_parts'])
+            exercise_count, mapping_count = self.generate_exercises(
+                body_parts, options['exercises'], min(max(options['mappings_per_exercise'], 0), len(CONTENT_TYPES)),
+            )
+            article_count = self.generate_articles(options['articles'])
+            # bulk_create 不触发信号，提交后手动清除统计缓存和推荐候选池
+            transaction.on_commit(invalidate_stats)
+            transaction.on_commit(invalidate_pools)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'生成完成（批次 {self.run_id}，耗时 {elapsed:.1f} 秒）：'
+            f'{len(body_parts)} 个部位，{exercise_count} 个动作，{mapping_count} 条关键词映射，{article_count} 篇文章'
+        ))
+
+    def progress(self, label, done, total):
+        self.stdout.write(f'  {label}: {done}/{total}')
+
+    def generate_body_parts(self, count):
+        if count <= 0:
+            return list(BodyPart.objects.all()) or self.generate_body_parts(1)
+
+        body_parts = []
+        for number in range(count):
+            name = BODY_PART_NAMES[number % len(BODY_PART_NAMES)]
+            if number >= len(BODY_PART_NAMES):
+                name = f'{name} {number // len(BODY_PART_NAMES) + 1}'
+            body_parts.append(BodyPart(
+                name=name,
+                slug=f'synthetic-{self.run_id}-{number}',
+                description=f'{name}相关的健身动作',
+            ))
+        return BodyPart.objects.bulk_create(body_parts, batch_size=self.batch_size)
+
+    def description_templates(self):
+        """生成 markdown 描述模板，并预先转换出 (哈希, markdown, HTML)"""
+        templates = []
+        for _ in range(TEMPLATE_COUNT):
+            sections = []
+            for heading in ['What is it?', 'Tutorial', 'Common Mistakes', 'Tips for Better Results', 'Muscles Worked']:
+                sentences = self.random.sample(MARKDOWN_SENTENCES, 4)
+                if heading == 'Tutorial':
+                    body = '\n'.join(f'{index}. {sentence}' for index, sentence in enumerate(sentences, 1))
+                elif heading in ('Common Mistakes', 'Tips for Better Results'):
+                    body = '\n'.join(f'- {sentence}' for sentence in sentences)
+                else:
+                    body = ' '.join(sentences)
+                sections.append(f'## {heading}\n\n{body}')
+            description = '\n\n'.join(sections)
+            templates.append((description, render_description(description)))
+        return templates
+
+    def youtube_url(self):
+        alphabet = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_-'
+        video_id = ''.join(self.random.choice(alphabet) for _ in range(11))
+        return f'https://www.youtube.com/watch?v={video_id}'
+
+    def generate_exercises(self, body_parts, count, mappings_per_exercise):
+        templates = self.description_templates()
+        exercise_total = 0
+        mapping_total = 0
+
+        for start in range(0, count, self.batch_size):
+            batch = []
+            for number in range(start, min(start + self.batch_size, count)):
+                body_part = body_parts[number % len(body_parts)]
+                name = ' '.join([
+                    self.random.choice(VARIANTS), self.random.choice(EQUIPMENT), self.random.choice(MOVEMENTS), str(number),
+                ])
+                description, (digest, markdown, html) = self.random.choice(templates)
+                batch.append(Exercise(
+                    name=name,
+                    slug=f'synthetic-{self.run_id}-{number}',
+                    body_part=body_part,
+                    description=description,
+                    description_markdown=markdown,
+                    description_html=html,
+                    description_hash=digest,
+                    youtube_url=self.youtube_url() if self.random.random() < 0.7 else '',
+                    image_url=f'https://example.com/exercises/{self.run_id}/{number}.jpg',
+                    image_width=640,
+                    image_height=480,
+                    generated_keywords=[name, body_part.name, 'workout', 'strength', 'form'],
+                    ai_generated=self.random.random() < 0.5,
+                ))
+            exercises = Exercise.objects.bulk_create(batch, batch_size=self.batch_size)
+
+            mappings = [
+                ContentKeywordMapping(
+                    exercise=exercise,
+                    keyword=f'{exercise.name} {content_type}',
+                    content_type=content_type,
+                    relevance_score=round(self.random.uniform(0.5, 1.0), 2),
+                )
+                for exercise in exercises
+                for content_type in CONTENT_TYPES[:mappings_per_exercise]
+            ]
+            ContentKeywordMapping.objects.bulk_create(mappings, batch_size=self.batch_size)
+
+            if not self.skip_index:
+                # 部位已缓存在对象上，索引时不会再查询
+                index_exercises(exercises)
+
+            exercise_total += len(exercises)
+            mapping_total += len(mappings)
+            self.progress('动作', exercise_total, count)
+
+        # bulk_create 不触发信号，手动校正部位计数
+        refresh_exercise_counts([body_part.id for body_part in body_parts])
+        return exercise_total, mapping_total
+
+    def article_templates(self):
+        """生成类似 CKEditor 输出的 HTML 正文模板，并预先计算摘要和正文词元权重"""
+        templates = []
+        for number in range(TEMPLATE_COUNT):
+            parts = [f'<h2>{self.random.choice(ARTICLE_TOPICS)}</h2>']
+            for index in range(self.random.randint(20, 60)):
+                sentence = self.random.choice(ARTICLE_SENTENCES)
+                if index % 7 == 0:
+                    items = ''.join(f'<li>{item}</li>' for item in self.random.sample(ARTICLE_SENTENCES, 3))
+                    parts.append(f'<ul>{items}</ul>')
+                elif index % 11 == 0:
+                    parts.append(
+                        f'<p><img alt="" src="/media/uploads/synthetic/{number}-{index}.jpg" '
+                        'style="height:400px; width:600px" /></p>'
+                    )
+                else:
+                    parts.append(f'<p><strong>{index}.</strong> {sentence}&nbsp;<a href="/knowledge">了解更多</a></p>')
+            content = '\n'.join(parts)
+            templates.append((content, build_excerpt(content), token_weights('', [], content)))
+        return templates
+
+    def generate_articles(self, count):
+        templates = self.article_templates()
+        total = 0
+
+        for start in range(0, count, self.batch_size):
+            batch = []
+            content_weights = []
+            for number in range(start, min(start + self.batch_size, count)):
+                topic = self.random.choice(ARTICLE_TOPICS)
+                content, excerpt, weights = self.random.choice(templates)
+                batch.append(Article(
+                    title=f'{topic}知识 第{number}篇',
+                    slug=f'synthetic-{self.run_id}-{number}',
+                    content=content,
+                    excerpt=excerpt,
+                    images=[f'/media/uploads/synthetic/{number}.jpg'],
+                    keywords=[f'{topic} {self.run_id} {number}', topic],
+                ))
+                content_weights.append(weights)
+            articles = Article.objects.bulk_create(batch, batch_size=self.batch_size)
+
+            if not self.skip_index:
+                tokens = []
+                for article, weights in zip(articles, content_weights):
+                    # 各字段的权重可以相加，正文部分按模板复用
+                    merged = dict(weights)
+                    for token, weight in token_weights(article.title, article.keywords, '').items():
+                        merged[token] = round(merged.get(token, 0.0) + weight, 4)
+                    tokens.extend(
+                        ArticleSearchToken(article_id=article.id, token=token, weight=weight)
+                        for token, weight in merged.items()
+                    )
+                ArticleSearchToken.objects.bulk_create(tokens, batch_size=self.batch_size)
+
+            total += len(articles)
+            self.progress('文章', total, count)
+
+        if count:
+            rebuild_keyword_aliases()
+        return total
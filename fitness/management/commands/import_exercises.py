@@ -1,9 +1,8 @@
 from django.core.management.base import BaseCommand
 from fitness.models import BodyPart, Exercise
 from django.utils.text import slugify
-from django.db import IntegrityError
-from django.utils import timezone
-import os
+from ClipNote.slugs import SlugAllocator, save_with_unique_slug
+from ClipNote.sitemaps import write_sitemap
 
 class Command(BaseCommand):
     help = '从文本文件导入健身动作数据'
@@ -29,105 +28,102 @@ class Command(BaseCommand):
         cleaned = '-'.join(word for word in cleaned.split())
         return cleaned
 
-    def generate_unique_slug(self, name, model_class, counter=1):
-        """生成唯一的slug"""
-        base_slug = slugify(name)
-        slug = base_slug
-        while model_class.objects.filter(slug=slug).exists():
-            slug = f"{base_slug}-{counter}"
-            counter += 1
-        return slug
+    def create_with_unique_slug(self, instance, name):
+        """分配唯一slug后插入，同一模型在整个导入过程中共用一个分配器，并发冲突时重新分配并重试"""
+        allocator = self.slug_allocators.setdefault(type(instance), SlugAllocator(type(instance)))
+        save_with_unique_slug(instance, slugify(name), lambda: instance.save(force_insert=True), allocator=allocator)
+        return instance
+
+    def prefetch_slugs(self, lines, existing_body_parts, existing_exercises):
+        """为文件中所有新的部位和动作预取冲突 slug，每个模型只需一批前缀查询"""
+        body_part_bases = set()
+        exercise_bases = set()
+        for line in lines:
+            parts = line.strip().split(',')
+            if len(parts) != 2:
+                continue
+            exercise_name, body_part_name = (part.strip() for part in parts)
+            if body_part_name not in existing_body_parts:
+                body_part_bases.add(slugify(self.clean_name(body_part_name)))
+            if exercise_name not in existing_exercises:
+                exercise_bases.add(slugify(self.clean_name(exercise_name)))
+        
+        for model_class, bases in ((BodyPart, body_part_bases), (Exercise, exercise_bases)):
+            allocator = self.slug_allocators.setdefault(model_class, SlugAllocator(model_class))
+            allocator.prefetch(bases)
 
     def generate_sitemap(self):
         """生成sitemap-exercises.xml文件"""
-        current_time = timezone.now().strftime('%Y-%m-%dT%H:%M:%S.%fZ')
-        
-        # 获取所有健身动作
-        exercises = Exercise.objects.all().order_by('created_at')
-        
-        # 生成sitemap内容
-        sitemap_content = '''<?xml version="1.0" encoding="UTF-8"?>
-<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9" xmlns:news="http://www.google.com/schemas/sitemap-news/0.9" xmlns:xhtml="http://www.w3.org/1999/xhtml" xmlns:mobile="http://www.google.com/schemas/sitemap-mobile/1.0" xmlns:image="http://www.google.com/schemas/sitemap-image/1.1" xmlns:video="http://www.google.com/schemas/sitemap-video/1.1">
-<url><loc>https://heartwellness.app/exercises</loc><lastmod>{}</lastmod><changefreq>daily</changefreq><priority>0.7</priority></url>'''.format(current_time)
-        
-        # 为每个健身动作添加URL
-        for exercise in exercises:
-            exercise_url = f"https://heartwellness.app/exercises/{exercise.slug}"
-            lastmod = exercise.updated_at.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
-            sitemap_content += f'''
-<url><loc>{exercise_url}</loc><lastmod>{lastmod}</lastmod><changefreq>weekly</changefreq><priority>0.6</priority></url>'''
-        
-        sitemap_content += '''
-</urlset>'''
-        
-        # 写入sitemap文件
-        sitemap_path = 'sitemap-exercises.xml'
-        with open(sitemap_path, 'w', encoding='utf-8') as f:
-            f.write(sitemap_content)
-        
-        self.stdout.write(f'已生成sitemap文件: {sitemap_path}，包含 {exercises.count()} 个健身动作URL')
+        count = write_sitemap('sitemap-exercises.xml')
+        self.stdout.write(f'已生成sitemap文件: sitemap-exercises.xml，包含 {count} 个URL')
 
     def handle(self, *args, **options):
         # 存储已处理的部位和动作，避免重复创建
         body_parts = {}
         processed_exercises = set()
+        self.slug_allocators = {}
+        
+        # 预先读取已有的部位和动作名称，只为新记录分配 slug
+        existing_body_parts = {body_part.name: body_part for body_part in BodyPart.objects.all()}
+        existing_exercises = set(Exercise.objects.values_list('name', flat=True))
         
         # 读取文件
         with open('fitness/exercises', 'r', encoding='utf-8') as file:
-            for line in file:
-                # 分割动作名称和部位
-                parts = line.strip().split(',')
-                if len(parts) != 2:
-                    self.stdout.write(self.style.WARNING(f'跳过无效行: {line.strip()}'))
-                    continue
-                    
-                exercise_name, body_part_name = parts
-                exercise_name = exercise_name.strip()
-                body_part_name = body_part_name.strip()
+            lines = file.readlines()
+        
+        # 一次性查询所有新名称可能冲突的 slug，后续在内存中分配
+        self.prefetch_slugs(lines, existing_body_parts, existing_exercises)
+        
+        for line in lines:
+            # 分割动作名称和部位
+            parts = line.strip().split(',')
+            if len(parts) != 2:
+                self.stdout.write(self.style.WARNING(f'跳过无效行: {line.strip()}'))
+                continue
                 
-                # 跳过重复的动作
-                if exercise_name in processed_exercises:
-                    continue
-                processed_exercises.add(exercise_name)
+            exercise_name, body_part_name = parts
+            exercise_name = exercise_name.strip()
+            body_part_name = body_part_name.strip()
+            
+            # 跳过重复的动作
+            if exercise_name in processed_exercises:
+                continue
+            processed_exercises.add(exercise_name)
+            
+            # 清理名称
+            clean_exercise_name = self.clean_name(exercise_name)
+            clean_body_part_name = self.clean_name(body_part_name)
+            
+            try:
+                # 获取或创建部位
+                if clean_body_part_name not in body_parts:
+                    body_part = existing_body_parts.get(body_part_name)
+                    if body_part is None:
+                        body_part = self.create_with_unique_slug(BodyPart(
+                            name=body_part_name,
+                            description=f'{body_part_name}相关的健身动作'
+                        ), clean_body_part_name)
+                        existing_body_parts[body_part_name] = body_part
+                        self.stdout.write(f'创建新部位: {body_part_name}')
+                    body_parts[clean_body_part_name] = body_part
                 
-                # 清理名称
-                clean_exercise_name = self.clean_name(exercise_name)
-                clean_body_part_name = self.clean_name(body_part_name)
+                body_part = body_parts[clean_body_part_name]
                 
-                try:
-                    # 获取或创建部位
-                    if clean_body_part_name not in body_parts:
-                        body_part, created = BodyPart.objects.get_or_create(
-                            name=body_part_name,
-                            defaults={
-                                'slug': self.generate_unique_slug(clean_body_part_name, BodyPart),
-                                'description': f'{body_part_name}相关的健身动作'
-                            }
-                        )
-                        body_parts[clean_body_part_name] = body_part
-                        if created:
-                            self.stdout.write(f'创建新部位: {body_part_name}')
-                    
-                    body_part = body_parts[clean_body_part_name]
-                    
-                    # 创建健身动作
-                    exercise, created = Exercise.objects.get_or_create(
+                # 创建健身动作
+                if exercise_name not in existing_exercises:
+                    self.create_with_unique_slug(Exercise(
                         name=exercise_name,
-                        defaults={
-                            'slug': self.generate_unique_slug(clean_exercise_name, Exercise),
-                            'body_part': body_part,
-                            'description': f'{exercise_name} 是一个针对 {body_part_name} 的训练动作。'
-                        }
-                    )
-                    
-                    if created:
-                        self.stdout.write(f'创建新动作: {exercise_name} ({body_part_name})')
-                
-                except Exception as e:
-                    self.stdout.write(
-                        self.style.ERROR(f'处理 {exercise_name} 时出错: {str(e)}')
-                    )
-        
+                        body_part=body_part,
+                        description=f'{exercise_name} 是一个针对 {body_part_name} 的训练动作。'
+                    ), clean_exercise_name)
+                    existing_exercises.add(exercise_name)
+                    self.stdout.write(f'创建新动作: {exercise_name} ({body_part_name})')
+            
+            except Exception as e:
+                self.stdout.write(
+                    self.style.ERROR(f'处理 {exercise_name} 时出错: {str(e)}')
+                )
+    
         self.stdout.write(
             self.style.SUCCESS(
                 f'数据导入完成！\n'
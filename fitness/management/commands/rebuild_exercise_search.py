@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from fitness.search import SEARCH_TABLE, rebuild_index, search_vendor
+
+
+class Command(BaseCommand):
+    help = '重建健身动作的全文检索索引（SQLite FTS5 / Postgres tsvector）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='每批写入索引的动作数量'
+        )
+
+    def handle(self, *args, **options):
+        vendor = search_vendor()
+        if not vendor:
+            self.stdout.write(self.style.WARNING('当前数据库不支持全文检索，搜索将使用 LIKE 查询'))
+            return
+
+        total = rebuild_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'已重建 {SEARCH_TABLE}（{vendor}），共索引 {total} 个动作'))
@@ -0,0 +1,75 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from fitness.models import Exercise
+from fitness.rendering import description_hash, render_description
+
+
+def render_batch(rows):
+    """在子进程中转换一批描述，rows 为 (id, 描述) 列表"""
+    return [(pk, *render_description(description)) for pk, description in rows]
+
+
+class Command(BaseCommand):
+    help = '为健身动作生成并保存描述的 markdown / HTML 格式（多进程）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='检查所有动作（转换规则变化后使用），默认只处理尚未生成的动作',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='转换进程数量，1 表示在当前进程中执行',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='每个任务包含的动作数量，同时也是写回数据库的批次大小',
+        )
+
+    def handle(self, *args, **options):
+        exercises = Exercise.objects.order_by('id')
+        if not options['all']:
+            exercises = exercises.filter(description_hash='')
+
+        # 只把哈希已过期的描述发送给子进程
+        rows = [
+            (pk, description)
+            for pk, description, stored_hash in exercises.values_list('id', 'description', 'description_hash').iterator()
+            if stored_hash != description_hash(description)
+        ]
+        if not rows:
+            self.stdout.write(self.style.SUCCESS('所有动作的描述格式均为最新'))
+            return
+
+        batch_size = max(options['batch_size'], 1)
+        batches = [rows[start:start + batch_size] for start in range(0, len(rows), batch_size)]
+        self.stdout.write(f'开始转换 {len(rows)} 个动作的描述（{options["workers"]} 个进程）...')
+
+        if options['workers'] > 1:
+            with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+                results = executor.map(render_batch, batches)
+                updated = self.save_results(results)
+        else:
+            updated = self.save_results(map(render_batch, batches))
+
+        self.stdout.write(self.style.SUCCESS(f'已更新 {updated} 个动作的描述格式'))
+
+    def save_results(self, results):
+        """按完成顺序逐批写回，不触发 save()，避免重复转换"""
+        updated = 0
+        for rendered in results:
+            exercises = [
+                Exercise(id=pk, description_hash=digest, description_markdown=markdown, description_html=html)
+                for pk, digest, markdown, html in rendered
+            ]
+            Exercise.objects.bulk_update(exercises, Exercise.RENDERED_FIELDS)
+            updated += len(exercises)
+            self.stdout.write(f'  已写入 {updated} 个')
+        return updated
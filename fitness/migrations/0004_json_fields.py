@@ -0,0 +1,44 @@
+# Generated by Django 5.2.2 on 2026-10-18 03:11
+
+import json
+
+from django.db import migrations, models
+
+
+def repair_json_list(value):
+    """无法解析或不是列表的 JSON 文本重置为空列表，数据合法时原样返回"""
+    try:
+        parsed = json.loads(value)
+    except (TypeError, ValueError):
+        return '[]'
+    return value if isinstance(parsed, list) else '[]'
+
+
+def repair_generated_keywords(apps, schema_editor):
+    Exercise = apps.get_model('fitness', 'Exercise')
+
+    to_update = []
+    for exercise in Exercise.objects.only('id', 'generated_keywords').iterator():
+        generated_keywords = repair_json_list(exercise.generated_keywords)
+        if generated_keywords != exercise.generated_keywords:
+            exercise.generated_keywords = generated_keywords
+            to_update.append(exercise)
+
+    Exercise.objects.bulk_update(to_update, ['generated_keywords'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fitness', '0003_change_image_to_url'),
+    ]
+
+    operations = [
+        # 先修复格式错误的数据，否则转换为 JSONField 时会违反 JSON_VALID 约束
+        migrations.RunPython(repair_generated_keywords, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='exercise',
+            name='generated_keywords',
+            field=models.JSONField(blank=True, default=list, help_text='JSON格式存储生成内容的关键词', verbose_name='生成内容关键词'),
+        ),
+    ]
@@ -0,0 +1,80 @@
+import re
+
+from django.db import migrations
+from django.utils.html import strip_tags
+
+# 以下 DDL 和索引文档规则复制自迁移编写时的 fitness.search，之后修改该模块不影响本迁移
+SEARCH_TABLE = 'fitness_exercise_fts'
+
+
+def build_document(name, keywords, body_part, description):
+    if isinstance(keywords, list):
+        keywords = ' '.join(str(keyword) for keyword in keywords)
+    text = strip_tags(description or '')
+    return (
+        name or '',
+        keywords or '',
+        body_part or '',
+        re.sub(r'\s+', ' ', text).strip(),
+    )
+
+
+def create_index(apps, schema_editor):
+    """创建全文索引表并写入已有动作"""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+            "name, keywords, body_part, description, "
+            "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            f"CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} ("
+            "exercise_id bigint PRIMARY KEY, document tsvector NOT NULL)"
+        )
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {SEARCH_TABLE}_document ON {SEARCH_TABLE} USING GIN (document)"
+        )
+    else:
+        return
+
+    Exercise = apps.get_model('fitness', 'Exercise')
+    queryset = Exercise.objects.using(schema_editor.connection.alias).select_related('body_part')
+    rows = [
+        (exercise.pk, *build_document(exercise.name, exercise.generated_keywords, exercise.body_part.name, exercise.description))
+        for exercise in queryset.iterator()
+    ]
+    if not rows:
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        if vendor == 'sqlite':
+            cursor.executemany(
+                f'INSERT INTO {SEARCH_TABLE} (rowid, name, keywords, body_part, description) '
+                'VALUES (%s, %s, %s, %s, %s)',
+                rows,
+            )
+        else:
+            vector = ' || '.join(f"setweight(to_tsvector('english', %s), '{label}')" for label in 'ABCD')
+            cursor.executemany(
+                f'INSERT INTO {SEARCH_TABLE} (exercise_id, document) VALUES (%s, {vector}) '
+                'ON CONFLICT (exercise_id) DO UPDATE SET document = EXCLUDED.document',
+                rows,
+            )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fitness', '0004_json_fields'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
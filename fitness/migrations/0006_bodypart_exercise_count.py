@@ -0,0 +1,34 @@
+# Generated by Django 5.2.2 on 2026-10-18 03:23
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_exercise_counts(apps, schema_editor):
+    BodyPart = apps.get_model('fitness', 'BodyPart')
+    Exercise = apps.get_model('fitness', 'Exercise')
+    counts = (
+        Exercise.objects.filter(body_part=OuterRef('pk'))
+        .order_by()
+        .values('body_part')
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    BodyPart.objects.update(exercise_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fitness', '0005_exercise_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bodypart',
+            name='exercise_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='由信号维护的动作计数，批量写入后调用 refresh_exercise_counts 校正', verbose_name='动作数量'),
+        ),
+        migrations.RunPython(backfill_exercise_counts, migrations.RunPython.noop),
+    ]
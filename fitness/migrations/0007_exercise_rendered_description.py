@@ -0,0 +1,132 @@
+# Generated by Django 5.2.2 on 2026-10-18 03:24
+
+import hashlib
+import re
+
+import markdown
+from django.db import migrations, models
+from markdownify import markdownify
+
+# 以下转换规则复制自迁移编写时的 fitness.rendering（RENDER_VERSION = 1），之后修改该模块不影响本迁移；
+# 规则版本变化后 render_descriptions 会按哈希重新生成
+RENDER_VERSION = 1
+
+
+def description_hash(description):
+    return hashlib.sha256(f'{RENDER_VERSION}:{description or ""}'.encode('utf-8')).hexdigest()
+
+
+def format_markdown_content(content):
+    """格式化markdown内容，确保换行和列表格式正确"""
+    if not content:
+        return ""
+
+    # 步骤1：分离标题和后面的内容
+    content = re.sub(r'(##\s+[^#\n]+?)\s+(\d+\.)', r'\1\n\n\2', content)
+    content = re.sub(r'(##\s+[^#\n]+?)\s*(-\s)', r'\1\n\n\2', content)
+
+    # 步骤2：确保标题在独立的行上
+    content = re.sub(r'(##\s+[^#\n]+?)\s*(?=##|\n|$)', r'\n\1\n', content)
+
+    # 步骤3：处理数字列表项 - 每个列表项独立一行
+    content = re.sub(r'(\d+)\.\s*([^.]+?\.)\s*(?=\d+\.)', r'\1. \2\n', content)
+
+    # 步骤4：处理无序列表项 - 更精确地分离每个列表项
+    # 匹配 "- 内容." 模式，后面跟着空格和 "- " 的情况
+    content = re.sub(r'(-\s[^-]+?\.)\s*(-\s)', r'\1\n\2', content)
+
+    # 步骤5：在标题后添加空行
+    content = re.sub(r'(##[^\n]+)\n(?!\n)', r'\1\n\n', content)
+
+    # 步骤6：处理剩余的无序列表项格式
+    content = re.sub(r'(^|\n)([^-\n]*?)(-\s)', r'\1\2\n\3', content)
+
+    # 步骤7：清理多余的空行，但保留段落分隔
+    content = re.sub(r'\n{3,}', '\n\n', content)
+
+    # 步骤8：移除开头和结尾的空行
+    content = content.strip()
+
+    return content
+
+
+def render_description_markdown(description):
+    """返回标准markdown格式"""
+    if description:
+        try:
+            # 将HTML转换为markdown格式
+            markdown_content = markdownify(
+                description,
+                heading_style='ATX',  # 使用 # 格式的标题
+                bullets='-',          # 使用 - 作为列表符号
+                strong_mark='**',     # 使用 ** 作为粗体标记
+                em_mark='*',          # 使用 * 作为斜体标记
+                strip=['script', 'style', 'div']  # 移除script、style和div标签
+            )
+
+            # 应用自定义格式化
+            return format_markdown_content(markdown_content)
+        except Exception:
+            # 如果转换失败，返回原始HTML内容
+            return description
+    return ""
+
+
+def render_description_html(description):
+    """返回转换后的HTML格式"""
+    if description:
+        try:
+            # 配置markdown扩展
+            return markdown.markdown(
+                description,
+                extensions=[
+                    'markdown.extensions.extra',
+                    'markdown.extensions.codehilite',
+                    'markdown.extensions.toc'
+                ]
+            )
+        except Exception:
+            # 如果转换失败，返回原始文本
+            return description
+    return ""
+
+
+def backfill_rendered_descriptions(apps, schema_editor):
+    Exercise = apps.get_model('fitness', 'Exercise')
+
+    batch = []
+    for exercise in Exercise.objects.only('id', 'description').order_by('id').iterator(chunk_size=200):
+        exercise.description_hash = description_hash(exercise.description)
+        exercise.description_markdown = render_description_markdown(exercise.description)
+        exercise.description_html = render_description_html(exercise.description)
+        batch.append(exercise)
+        if len(batch) >= 200:
+            Exercise.objects.bulk_update(batch, ['description_hash', 'description_markdown', 'description_html'])
+            batch = []
+    Exercise.objects.bulk_update(batch, ['description_hash', 'description_markdown', 'description_html'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fitness', '0006_bodypart_exercise_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exercise',
+            name='description_hash',
+            field=models.CharField(blank=True, default='', editable=False, help_text='生成上面两列时描述内容的哈希，用于判断是否需要重新生成', max_length=64, verbose_name='描述哈希'),
+        ),
+        migrations.AddField(
+            model_name='exercise',
+            name='description_html',
+            field=models.TextField(blank=True, default='', editable=False, help_text='保存时根据描述生成', verbose_name='描述HTML'),
+        ),
+        migrations.AddField(
+            model_name='exercise',
+            name='description_markdown',
+            field=models.TextField(blank=True, default='', editable=False, help_text='保存时根据描述生成', verbose_name='描述Markdown'),
+        ),
+        migrations.RunPython(backfill_rendered_descriptions, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,12 @@
 from django.db import models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.utils.text import slugify
 from ckeditor.fields import RichTextField
 import re
-import json
+import ClipNote.lookups  # noqa: F401 注册 JSONField 的 has_element 查询
+from ClipNote.slugs import save_with_unique_slug
+from .rendering import description_hash, render_description
 
 # Create your models here.
 
@@ -11,14 +15,23 @@ class BodyPart(models.Model):
     name = models.CharField('部位名称', max_length=100)
     slug = models.SlugField('URL别名', max_length=100, unique=True, blank=True)
     description = models.TextField('描述', blank=True)
+    exercise_count = models.PositiveIntegerField('动作数量', default=0, editable=False, help_text='由信号维护的动作计数，批量写入后调用 refresh_exercise_counts 校正')
     
     def __str__(self):
         return self.name
     
     def save(self, *args, **kwargs):
+        if not self._state.adding:
+            # 动作计数只通过 queryset.update() 和 refresh_exercise_counts() 修改，
+            # 普通保存（后台改名、脚本）不能用内存中的旧值覆盖信号累加的结果
+            update_fields = kwargs.get('update_fields')
+            if update_fields is None:
+                update_fields = [field.name for field in self._meta.concrete_fields if not field.primary_key]
+            kwargs['update_fields'] = [name for name in update_fields if name != 'exercise_count']
         if not self.slug:
-            self.slug = slugify(self.name)
-        super().save(*args, **kwargs)
+            save_with_unique_slug(self, slugify(self.name), lambda: super(BodyPart, self).save(*args, **kwargs))
+        else:
+            super().save(*args, **kwargs)
     
     class Meta:
         verbose_name = '健身部位'
@@ -30,11 +43,14 @@ class Exercise(models.Model):
     slug = models.SlugField('URL别名', max_length=200, unique=True, blank=True)
     body_part = models.ForeignKey(BodyPart, on_delete=models.CASCADE, related_name='exercises', verbose_name='锻炼部位')
     description = RichTextField('动作描述')
+    description_markdown = models.TextField('描述Markdown', blank=True, default='', editable=False, help_text='保存时根据描述生成')
+    description_html = models.TextField('描述HTML', blank=True, default='', editable=False, help_text='保存时根据描述生成')
+    description_hash = models.CharField('描述哈希', max_length=64, blank=True, default='', editable=False, help_text='生成上面两列时描述内容的哈希，用于判断是否需要重新生成')
     youtube_url = models.URLField('YouTube视频链接', blank=True)
     image_url = models.URLField('动作图片URL', blank=True, help_text='图片的网络链接地址')
     image_width = models.PositiveIntegerField('图片宽度', null=True, blank=True)
     image_height = models.PositiveIntegerField('图片高度', null=True, blank=True)
-    generated_keywords = models.TextField('生成内容关键词', blank=True, default='[]', help_text='JSON格式存储生成内容的关键词')
+    generated_keywords = models.JSONField('生成内容关键词', blank=True, default=list, help_text='JSON格式存储生成内容的关键词')
     ai_generated = models.BooleanField('AI生成内容', default=False, help_text='标记是否由AI生成描述')
     created_at = models.DateTimeField('创建时间', auto_now_add=True)
     updated_at = models.DateTimeField('更新时间', auto_now=True)
@@ -42,10 +58,34 @@ class Exercise(models.Model):
     def __str__(self):
         return self.name
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # 记录加载时的部位，更换部位时据此维护两个部位的动作计数
+        instance._loaded_body_part_id = instance.__dict__.get('body_part_id')
+        return instance
+    
     def save(self, *args, **kwargs):
+        # 描述变化时重新生成 markdown / HTML（描述被 defer 或未在 update_fields 中时跳过）
+        update_fields = kwargs.get('update_fields')
+        if (update_fields is None or 'description' in update_fields) and 'description' not in self.get_deferred_fields():
+            if self.render_description() and update_fields is not None:
+                extra = [field for field in self.RENDERED_FIELDS if field not in update_fields]
+                kwargs['update_fields'] = list(update_fields) + extra
+        
         if not self.slug:
-            self.slug = slugify(self.name)
-        super().save(*args, **kwargs)
+            save_with_unique_slug(self, slugify(self.name), lambda: super(Exercise, self).save(*args, **kwargs))
+        else:
+            super().save(*args, **kwargs)
+    
+    RENDERED_FIELDS = ('description_markdown', 'description_html', 'description_hash')
+    
+    def render_description(self):
+        """描述哈希变化时重新生成 markdown / HTML，返回是否有更新"""
+        if self.description_hash == description_hash(self.description):
+            return False
+        self.description_hash, self.description_markdown, self.description_html = render_description(self.description)
+        return True
     
     def get_youtube_embed_url(self):
         """
@@ -92,17 +132,11 @@ class Exercise(models.Model):
     
     def get_generated_keywords(self):
         """返回生成内容的关键词列表"""
-        try:
-            return json.loads(self.generated_keywords)
-        except:
-            return []
+        return self.generated_keywords if isinstance(self.generated_keywords, list) else []
     
     def set_generated_keywords(self, keywords):
         """设置生成内容的关键词列表"""
-        if isinstance(keywords, list):
-            self.generated_keywords = json.dumps(keywords, ensure_ascii=False)
-        else:
-            self.generated_keywords = json.dumps([], ensure_ascii=False)
+        self.generated_keywords = keywords if isinstance(keywords, list) else []
     
     def extract_keywords_from_description(self):
         """从描述中提取关键词"""
@@ -158,3 +192,21 @@ class ContentKeywordMapping(models.Model):
         verbose_name = '内容关键词映射'
         verbose_name_plural = '内容关键词映射管理'
         unique_together = ['exercise', 'keyword', 'content_type']
+
+
+def refresh_exercise_counts(body_part_ids=None):
+    """
+    根据动作表重新统计部位的动作数量，用于 bulk_create 等不触发信号的批量操作之后
+    body_part_ids 为 None 时校正全部部位
+    """
+    counts = (
+        Exercise.objects.filter(body_part=OuterRef('pk'))
+        .order_by()
+        .values('body_part')
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    queryset = BodyPart.objects.all()
+    if body_part_ids is not None:
+        queryset = queryset.filter(id__in=body_part_ids)
+    return queryset.update(exercise_count=Coalesce(Subquery(counts), 0))
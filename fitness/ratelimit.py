@@ -0,0 +1,185 @@
+"""
+LLM 调用的自适应限速
+
+RateLimiter 同时维护每分钟请求数（RPM）和每分钟 token 数（TPM）两个令牌桶：
+- 请求前 reserve() 按预估 token 数扣减两个桶，返回需要等待的秒数（允许欠账，调用方自行 sleep）；
+- 成功后 record() 用响应中的 usage.total_tokens 校正预估值，并按加法增大速率系数；
+- 遇到 429 时 throttle() 把速率系数减半，并在 Retry-After 指定的时间内暂停所有请求；
+- 超时、网络错误和 5xx 时 backoff() 按连续失败次数指数退避，暂停所有请求，避免服务故障时很快耗尽重试次数。
+响应中的 x-ratelimit-limit-* / remaining-* / reset-* 头用于发现服务端限额和校正桶内余量，
+未配置 --rpm / --tpm 时以服务端返回的限额为准。
+"""
+import re
+import time
+from email.utils import parsedate_to_datetime
+
+# 令牌桶容量：允许的突发量相当于几秒的配额
+BURST_SECONDS = 5.0
+# 非 429 失败的退避：第 n 次连续失败暂停 BACKOFF_BASE * 2^(n-1) 秒，最多 BACKOFF_MAX 秒
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+
+DURATION_PATTERN = re.compile(r'(\d+(?:\.\d+)?)(ms|s|m|h)')
+DURATION_UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+
+
+def parse_duration(value):
+    """解析 x-ratelimit-reset-* 的时长，例如 '1s'、'6m0s'、'20ms'；无法解析时返回 None"""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = DURATION_PATTERN.findall(value)
+    if not parts:
+        return None
+    return sum(float(number) * DURATION_UNITS[unit] for number, unit in parts)
+
+
+def parse_retry_after(headers, now=None):
+    """从 retry-after-ms / Retry-After 头中取出需要等待的秒数"""
+    if not headers:
+        return None
+    milliseconds = headers.get('retry-after-ms')
+    if milliseconds is not None:
+        try:
+            return max(float(milliseconds) / 1000, 0.0)
+        except ValueError:
+            pass
+    value = headers.get('retry-after')
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(moment.timestamp() - (now if now is not None else time.time()), 0.0)
+
+
+class TokenBucket:
+    """按每分钟限额匀速补充的令牌桶"""
+
+    def __init__(self, per_minute, now):
+        self.per_minute = per_minute
+        self.capacity = per_minute * BURST_SECONDS / 60
+        self.level = self.capacity
+        self.updated = now
+
+    def refill(self, now, factor):
+        elapsed = max(now - self.updated, 0.0)
+        self.level = min(self.capacity, self.level + elapsed * self.per_minute * factor / 60)
+        self.updated = now
+
+    def reserve(self, amount, now, factor):
+        """扣减 amount，返回余量补足前需要等待的秒数"""
+        self.refill(now, factor)
+        self.level -= amount
+        if self.level >= 0:
+            return 0.0
+        return -self.level / (self.per_minute * factor / 60)
+
+    def refund(self, amount):
+        self.level = min(self.capacity, self.level + amount)
+
+    def clamp(self, remaining):
+        """服务端报告的剩余额度少于本地记录时，以服务端为准"""
+        self.level = min(self.level, remaining)
+
+
+class RateLimiter:
+    """RPM / TPM 令牌桶 + AIMD 速率系数"""
+
+    def __init__(self, rpm=None, tpm=None, increase=0.05, decrease=0.5, min_factor=0.05, clock=time.monotonic):
+        self.clock = clock
+        now = clock()
+        self.requests = TokenBucket(rpm, now) if rpm else None
+        self.tokens = TokenBucket(tpm, now) if tpm else None
+        self.increase = increase
+        self.decrease = decrease
+        self.min_factor = min_factor
+        self.factor = 1.0
+        self.blocked_until = now
+        self.consecutive_throttles = 0
+        self.consecutive_failures = 0
+        self.stats = {'throttled': 0, 'waited': 0.0}
+
+    def reserve(self, tokens=0):
+        """为一次请求预留额度，返回需要等待的秒数"""
+        now = self.clock()
+        wait = max(self.blocked_until - now, 0.0)
+        if self.requests:
+            wait = max(wait, self.requests.reserve(1, now, self.factor))
+        if self.tokens and tokens:
+            wait = max(wait, self.tokens.reserve(tokens, now, self.factor))
+        self.stats['waited'] += wait
+        return wait
+
+    def record(self, estimated_tokens=0, used_tokens=None, headers=None):
+        """请求成功：校正 token 用量，加法增大速率系数"""
+        if self.tokens and used_tokens is not None:
+            self.tokens.refund(estimated_tokens - used_tokens)
+        self.consecutive_throttles = 0
+        self.consecutive_failures = 0
+        self.factor = min(1.0, self.factor + self.increase)
+        self.observe(headers)
+
+    def throttle(self, headers=None):
+        """遇到 429：速率系数减半，并按 Retry-After（缺省时指数退避）暂停所有请求"""
+        now = self.clock()
+        self.stats['throttled'] += 1
+        self.consecutive_throttles += 1
+        self.factor = max(self.min_factor, self.factor * self.decrease)
+        retry_after = parse_retry_after(headers)
+        if retry_after is None:
+            retry_after = min(2.0 ** self.consecutive_throttles, 60.0)
+        self.blocked_until = max(self.blocked_until, now + retry_after)
+        self.observe(headers)
+        return retry_after
+
+    def backoff(self):
+        """
+        超时、网络错误或 5xx：按连续失败次数指数退避并暂停所有请求，返回距离恢复的秒数
+        暂停期间返回的失败来自同一批已发出的请求，不再增加退避次数
+        """
+        now = self.clock()
+        if now >= self.blocked_until:
+            self.consecutive_failures += 1
+            delay = min(BACKOFF_BASE * 2.0 ** (self.consecutive_failures - 1), BACKOFF_MAX)
+            self.blocked_until = now + delay
+        return self.blocked_until - now
+
+    def observe(self, headers):
+        """根据 x-ratelimit-* 头发现限额、校正余量，额度用尽时暂停到重置时间"""
+        if not headers:
+            return
+        now = self.clock()
+        for kind in ('requests', 'tokens'):
+            bucket = getattr(self, kind)
+            limit = self.header_number(headers, f'x-ratelimit-limit-{kind}')
+            if bucket is None and limit:
+                bucket = TokenBucket(limit, now)
+                setattr(self, kind, bucket)
+            if bucket is None:
+                continue
+            remaining = self.header_number(headers, f'x-ratelimit-remaining-{kind}')
+            if remaining is None:
+                continue
+            bucket.refill(now, self.factor)
+            bucket.clamp(remaining)
+            if remaining <= 0:
+                reset = parse_duration(headers.get(f'x-ratelimit-reset-{kind}'))
+                if reset:
+                    self.blocked_until = max(self.blocked_until, now + reset)
+
+    @staticmethod
+    def header_number(headers, name):
+        try:
+            return float(headers.get(name))
+        except (TypeError, ValueError):
+            return None
@@ -0,0 +1,81 @@
+"""
+按部位随机推荐动作
+
+每个部位的动作 ID 列表（候选池）缓存在 django.core.cache 中，推荐时在内存里随机抽样，
+再用一次 id__in 查询取出动作，不再对整个部位执行 ORDER BY RANDOM()。
+动作或部位有写入时由 fitness.signals 递增版本号，使所有候选池失效；
+使用进程内缓存时，其他进程的候选池最迟在 RECOMMENDATION_POOL_TIMEOUT 秒后刷新。
+"""
+import random
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import BodyPart
+
+POOL_VERSION_KEY = 'fitness:recommendation-pool-version'
+
+
+def get_pool_timeout():
+    return getattr(settings, 'RECOMMENDATION_POOL_TIMEOUT', 300)
+
+
+def _pool_version():
+    version = cache.get(POOL_VERSION_KEY)
+    if version is None:
+        version = 1
+        cache.add(POOL_VERSION_KEY, version, None)
+    return version
+
+
+def invalidate_pools():
+    """使所有部位的候选池失效"""
+    try:
+        cache.incr(POOL_VERSION_KEY)
+    except ValueError:
+        cache.set(POOL_VERSION_KEY, 2, None)
+
+
+def get_pool(body_part_slug):
+    """
+    返回某个部位的动作 ID 列表（按 ID 排序）；部位不存在时返回 None
+    缓存未命中时只需一次 LEFT JOIN 查询，同时完成部位存在性校验
+    """
+    key = f'fitness:recommendation-pool:{_pool_version()}:{body_part_slug}'
+    pool = cache.get(key)
+    if pool is not None:
+        return pool.get('ids')
+
+    rows = list(
+        BodyPart.objects.filter(slug=body_part_slug)
+        .values_list('exercises__id', flat=True)
+        .order_by('exercises__id')
+    )
+    ids = [exercise_id for exercise_id in rows if exercise_id is not None] if rows else None
+    # 不存在的部位也缓存，避免重复查询
+    cache.set(key, {'ids': ids}, get_pool_timeout())
+    return ids
+
+
+def daily_seed(body_part_slug):
+    """按站点时区的日期生成种子，同一天内推荐结果固定"""
+    return f'{timezone.localdate().isoformat()}:{body_part_slug}'
+
+
+def seconds_until_tomorrow():
+    """距离站点时区下一个零点的秒数，用于每日推荐的 HTTP 缓存时间"""
+    now = timezone.localtime()
+    tomorrow = datetime.combine(now.date() + timedelta(days=1), time.min, tzinfo=now.tzinfo)
+    return max(int((tomorrow - now).total_seconds()), 1)
+
+
+def sample_ids(pool, count, seed=None):
+    """从候选池中无放回抽取 count 个 ID；给定 seed 时结果可复现"""
+    rng = random.Random(seed) if seed is not None else random
+    if len(pool) <= count:
+        ids = list(pool)
+        rng.shuffle(ids)
+        return ids
+    return rng.sample(pool, count)
@@ -0,0 +1,103 @@
+"""
+动作描述的格式转换
+
+description 可能是 AI 生成的 markdown 或后台编辑的 HTML，接口需要同时返回 markdown 与 HTML 两种格式。
+转换只在描述变化时执行一次，结果保存在 Exercise.description_markdown / description_html，
+以 description_hash 判断是否需要重新生成；修改转换规则后请递增 RENDER_VERSION 并运行 render_descriptions --all。
+"""
+import hashlib
+import re
+
+import markdown
+from markdownify import markdownify
+
+RENDER_VERSION = 1
+
+
+def description_hash(description):
+    """描述内容与转换规则版本的哈希"""
+    return hashlib.sha256(f'{RENDER_VERSION}:{description or ""}'.encode('utf-8')).hexdigest()
+
+
+def format_markdown_content(content):
+    """格式化markdown内容，确保换行和列表格式正确"""
+    if not content:
+        return ""
+
+    # 步骤1：分离标题和后面的内容
+    content = re.sub(r'(##\s+[^#\n]+?)\s+(\d+\.)', r'\1\n\n\2', content)
+    content = re.sub(r'(##\s+[^#\n]+?)\s*(-\s)', r'\1\n\n\2', content)
+
+    # 步骤2：确保标题在独立的行上
+    content = re.sub(r'(##\s+[^#\n]+?)\s*(?=##|\n|$)', r'\n\1\n', content)
+
+    # 步骤3：处理数字列表项 - 每个列表项独立一行
+    content = re.sub(r'(\d+)\.\s*([^.]+?\.)\s*(?=\d+\.)', r'\1. \2\n', content)
+
+    # 步骤4：处理无序列表项 - 更精确地分离每个列表项
+    # 匹配 "- 内容." 模式，后面跟着空格和 "- " 的情况
+    content = re.sub(r'(-\s[^-]+?\.)\s*(-\s)', r'\1\n\2', content)
+
+    # 步骤5：在标题后添加空行
+    content = re.sub(r'(##[^\n]+)\n(?!\n)', r'\1\n\n', content)
+
+    # 步骤6：处理剩余的无序列表项格式
+    content = re.sub(r'(^|\n)([^-\n]*?)(-\s)', r'\1\2\n\3', content)
+
+    # 步骤7：清理多余的空行，但保留段落分隔
+    content = re.sub(r'\n{3,}', '\n\n', content)
+
+    # 步骤8：移除开头和结尾的空行
+    content = content.strip()
+
+    return content
+
+
+def render_description_markdown(description):
+    """返回标准markdown格式"""
+    if description:
+        try:
+            # 将HTML转换为markdown格式
+            markdown_content = markdownify(
+                description,
+                heading_style='ATX',  # 使用 # 格式的标题
+                bullets='-',          # 使用 - 作为列表符号
+                strong_mark='**',     # 使用 ** 作为粗体标记
+                em_mark='*',          # 使用 * 作为斜体标记
+                strip=['script', 'style', 'div']  # 移除script、style和div标签
+            )
+
+            # 应用自定义格式化
+            return format_markdown_content(markdown_content)
+        except Exception:
+            # 如果转换失败，返回原始HTML内容
+            return description
+    return ""
+
+
+def render_description_html(description):
+    """返回转换后的HTML格式"""
+    if description:
+        try:
+            # 配置markdown扩展
+            return markdown.markdown(
+                description,
+                extensions=[
+                    'markdown.extensions.extra',
+                    'markdown.extensions.codehilite',
+                    'markdown.extensions.toc'
+                ]
+            )
+        except Exception:
+            # 如果转换失败，返回原始文本
+            return description
+    return ""
+
+
+def render_description(description):
+    """返回 (哈希, markdown, HTML)"""
+    return (
+        description_hash(description),
+        render_description_markdown(description),
+        render_description_html(description),
+    )
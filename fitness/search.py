@@ -0,0 +1,230 @@
+"""
+健身动作全文检索
+
+SQLite 使用 FTS5 虚拟表，Postgres 使用 tsvector + GIN 索引，按 rowid / exercise_id 与动作一一对应。
+索引内容分为 名称 / 关键词 / 部位 / 描述 四个字段，排序时按这个顺序加权；
+Exercise 保存和删除时由 fitness.signals 同步，批量修复可运行 rebuild_exercise_search。
+其他数据库回退到 DRF 默认的 LIKE 搜索。
+"""
+import re
+
+from django.db import connection, transaction
+from django.db.models.expressions import RawSQL
+from django.utils.html import strip_tags
+from rest_framework import filters
+
+SEARCH_TABLE = 'fitness_exercise_fts'
+
+# 字段权重：名称 > 关键词 > 部位 > 描述
+SEARCH_WEIGHTS = {
+    'name': 10.0,
+    'keywords': 5.0,
+    'body_part': 3.0,
+    'description': 1.0,
+}
+
+# Postgres setweight 只有 A-D 四档，与上面的字段顺序对应
+POSTGRES_LABELS = ('A', 'B', 'C', 'D')
+
+
+def search_vendor(conn=None):
+    """返回当前数据库可用的全文检索实现：'fts5'、'tsvector' 或 None"""
+    conn = conn or connection
+    if conn.vendor == 'sqlite':
+        return 'fts5'
+    if conn.vendor == 'postgresql':
+        return 'tsvector'
+    return None
+
+
+def build_document(name, keywords, body_part, description):
+    """生成索引文档 (名称, 关键词, 部位, 描述)，描述去掉 HTML 标签"""
+    if isinstance(keywords, list):
+        keywords = ' '.join(str(keyword) for keyword in keywords)
+    text = strip_tags(description or '')
+    return (
+        name or '',
+        keywords or '',
+        body_part or '',
+        re.sub(r'\s+', ' ', text).strip(),
+    )
+
+
+def exercise_document(exercise):
+    body_part = exercise.body_part.name if exercise.body_part_id else ''
+    return build_document(exercise.name, exercise.generated_keywords, body_part, exercise.description)
+
+
+def create_search_table(schema_editor):
+    """创建索引表，供迁移调用"""
+    vendor = search_vendor(schema_editor.connection)
+    if vendor == 'fts5':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+            "name, keywords, body_part, description, "
+            "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+    elif vendor == 'tsvector':
+        schema_editor.execute(
+            f"CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} ("
+            "exercise_id bigint PRIMARY KEY, document tsvector NOT NULL)"
+        )
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {SEARCH_TABLE}_document ON {SEARCH_TABLE} USING GIN (document)"
+        )
+
+
+def drop_search_table(schema_editor):
+    if search_vendor(schema_editor.connection):
+        schema_editor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+
+def write_documents(rows, conn=None):
+    """写入或替换索引，rows 为 (exercise_id, 文档) 列表"""
+    conn = conn or connection
+    vendor = search_vendor(conn)
+    rows = list(rows)
+    if not vendor or not rows:
+        return
+
+    with conn.cursor() as cursor:
+        if vendor == 'fts5':
+            # FTS5 不支持 UPSERT，先删后插
+            cursor.executemany(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [(pk,) for pk, document in rows])
+            cursor.executemany(
+                f'INSERT INTO {SEARCH_TABLE} (rowid, name, keywords, body_part, description) '
+                'VALUES (%s, %s, %s, %s, %s)',
+                [(pk, *document) for pk, document in rows],
+            )
+        else:
+            vector = ' || '.join(
+                f"setweight(to_tsvector('english', %s), '{label}')" for label in POSTGRES_LABELS
+            )
+            cursor.executemany(
+                f'INSERT INTO {SEARCH_TABLE} (exercise_id, document) VALUES (%s, {vector}) '
+                'ON CONFLICT (exercise_id) DO UPDATE SET document = EXCLUDED.document',
+                [(pk, *document) for pk, document in rows],
+            )
+
+
+def delete_documents(pks, conn=None):
+    conn = conn or connection
+    vendor = search_vendor(conn)
+    pks = list(pks)
+    if not vendor or not pks:
+        return
+
+    column = 'rowid' if vendor == 'fts5' else 'exercise_id'
+    with conn.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {SEARCH_TABLE} WHERE {column} = %s', [(pk,) for pk in pks])
+
+
+def index_exercises(exercises):
+    """同步一批动作的索引（需已 select_related('body_part')）"""
+    write_documents((exercise.pk, exercise_document(exercise)) for exercise in exercises)
+
+
+def rebuild_index(batch_size=500):
+    """清空并重建全部索引，返回写入的动作数量；在一个事务中完成，搜索不会看到半成品"""
+    from .models import Exercise
+
+    if not search_vendor():
+        return 0
+
+    total = 0
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+
+        batch = []
+        queryset = Exercise.objects.select_related('body_part').order_by('pk')
+        for exercise in queryset.iterator(chunk_size=batch_size):
+            batch.append(exercise)
+            if len(batch) >= batch_size:
+                index_exercises(batch)
+                total += len(batch)
+                batch = []
+        index_exercises(batch)
+        total += len(batch)
+
+    if search_vendor() == 'fts5':
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')")
+    return total
+
+
+def build_match_query(search):
+    """
+    把用户输入转换为 FTS5 查询：每个词加引号防止语法注入，词之间为 AND，
+    最后一个词做前缀匹配，适配边输入边搜索
+    """
+    terms = re.findall(r'\w+', search)
+    if not terms:
+        return None
+    quoted = ['"{}"'.format(term.replace('"', '""')) for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def search_expressions(search, conn=None):
+    """
+    返回 (匹配条件, 排序表达式)，两者都是基于 fitness_exercise.id 的子查询
+    排序表达式越小越相关；无法检索时返回 (None, None)
+    """
+    vendor = search_vendor(conn)
+    if vendor == 'fts5':
+        match = build_match_query(search)
+        if not match:
+            return None, None
+        weights = ', '.join(str(weight) for weight in SEARCH_WEIGHTS.values())
+        condition = RawSQL(f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s', (match,))
+        # bm25 越小越相关
+        rank = RawSQL(
+            f'SELECT bm25({SEARCH_TABLE}, {weights}) FROM {SEARCH_TABLE} '
+            f'WHERE {SEARCH_TABLE} MATCH %s AND rowid = fitness_exercise.id',
+            (match,),
+        )
+        return condition, rank
+
+    if vendor == 'tsvector':
+        if not search.strip():
+            return None, None
+        # ts_rank 的权重数组顺序为 {D, C, B, A}
+        weights = ', '.join(str(weight / SEARCH_WEIGHTS['name']) for weight in reversed(SEARCH_WEIGHTS.values()))
+        condition = RawSQL(
+            f"SELECT exercise_id FROM {SEARCH_TABLE} WHERE document @@ websearch_to_tsquery('english', %s)",
+            (search,),
+        )
+        rank = RawSQL(
+            f"SELECT -ts_rank('{{{weights}}}'::float4[], document, websearch_to_tsquery('english', %s)) "
+            f'FROM {SEARCH_TABLE} WHERE exercise_id = fitness_exercise.id',
+            (search,),
+        )
+        return condition, rank
+
+    return None, None
+
+
+class ExerciseSearchFilter(filters.SearchFilter):
+    """
+    基于全文索引的搜索过滤，按字段加权的相关度排序
+
+    需要放在 OrderingFilter 之后：请求未指定 ?ordering= 时用相关度覆盖默认排序；
+    数据库不支持全文检索时回退到 SearchFilter 的 LIKE 查询
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        search = request.query_params.get(self.search_param, '')
+        if not search.strip():
+            return queryset
+
+        condition, rank = search_expressions(search)
+        if condition is None:
+            if search_vendor():
+                return queryset.none()
+            return super().filter_queryset(request, queryset, view)
+
+        queryset = queryset.filter(id__in=condition)
+        if not request.query_params.get(filters.OrderingFilter.ordering_param):
+            queryset = queryset.annotate(search_rank=rank).order_by('search_rank', '-created_at')
+        return queryset
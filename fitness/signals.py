@@ -0,0 +1,76 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.db import transaction
+from django.db.models import F
+from .models import BodyPart, Exercise
+from .recommendations import invalidate_pools
+from .stats import invalidate_stats
+from .search import delete_documents, index_exercises
+
+@receiver(post_save, sender=Exercise)
+def update_search_index(sender, instance, raw=False, **kwargs):
+    """
+    保存动作时同步全文索引，与保存处于同一事务中
+    """
+    if raw:
+        return
+    index_exercises([instance])
+
+@receiver(post_delete, sender=Exercise)
+def remove_search_index(sender, instance, **kwargs):
+    """
+    删除动作时移除对应的全文索引
+    """
+    delete_documents([instance.pk])
+
+@receiver(post_save, sender=BodyPart)
+def update_body_part_search_index(sender, instance, created=False, raw=False, **kwargs):
+    """
+    部位改名后，其下所有动作的部位字段需要重新索引
+    """
+    if raw or created:
+        return
+    index_exercises(instance.exercises.select_related('body_part'))
+
+@receiver(post_save, sender=Exercise)
+@receiver(post_delete, sender=Exercise)
+@receiver(post_save, sender=BodyPart)
+@receiver(post_delete, sender=BodyPart)
+def refresh_recommendation_pools(sender, **kwargs):
+    """
+    动作或部位变化后，事务提交时让推荐候选池失效
+    """
+    transaction.on_commit(invalidate_pools)
+
+@receiver(post_save, sender=Exercise)
+def count_saved_exercise(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    """
+    新建动作或更换部位时更新部位的动作计数，使用 F 表达式避免并发覆盖
+    """
+    if raw:
+        return
+    if created:
+        BodyPart.objects.filter(id=instance.body_part_id).update(exercise_count=F('exercise_count') + 1)
+    elif update_fields is None or 'body_part' in update_fields:
+        previous = getattr(instance, '_loaded_body_part_id', None)
+        if previous is not None and previous != instance.body_part_id:
+            BodyPart.objects.filter(id=previous).update(exercise_count=F('exercise_count') - 1)
+            BodyPart.objects.filter(id=instance.body_part_id).update(exercise_count=F('exercise_count') + 1)
+    instance._loaded_body_part_id = instance.body_part_id
+
+@receiver(post_delete, sender=Exercise)
+def count_deleted_exercise(sender, instance, **kwargs):
+    """
+    删除动作时减少部位的动作计数
+    """
+    BodyPart.objects.filter(id=instance.body_part_id, exercise_count__gt=0).update(exercise_count=F('exercise_count') - 1)
+
+@receiver(post_save, sender=Exercise)
+@receiver(post_delete, sender=Exercise)
+@receiver(post_save, sender=BodyPart)
+@receiver(post_delete, sender=BodyPart)
+def refresh_stats(sender, **kwargs):
+    """
+    动作或部位变化后，事务提交时清除统计缓存
+    """
+    transaction.on_commit(invalidate_stats)
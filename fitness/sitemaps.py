@@ -0,0 +1,72 @@
+from ClipNote.sitemaps import SitemapSource, register
+from django.conf import settings
+from django.db.models import Count, Max
+from .models import BodyPart, Exercise
+
+
+@register
+class ExerciseIndexSitemap(SitemapSource):
+    """健身动作列表页"""
+    filename = 'sitemap-exercises.xml'
+
+    def items(self):
+        return ['/exercises']
+
+    def location(self, path):
+        return f"{settings.SITE_URL}{path}"
+
+    def lastmod(self, path):
+        # 使用动作的最近更新时间，内容没有变化时分片文件保持不变
+        return Exercise.objects.aggregate(latest=Max('updated_at'))['latest']
+
+    def version(self):
+        # lastmod 随动作变化，已由 ExerciseSitemap 的版本覆盖
+        return None, None
+
+    def count(self):
+        return 1
+
+
+@register
+class BodyPartSitemap(SitemapSource):
+    """按身体部位分类的动作列表页"""
+    filename = 'sitemap-exercises.xml'
+    changefreq = 'weekly'
+    priority = '0.6'
+
+    def items(self):
+        return BodyPart.objects.only('slug').order_by('id').iterator()
+
+    def location(self, body_part):
+        return f"{settings.SITE_URL}/exercises/body-parts/{body_part.slug}"
+
+    def version(self):
+        # 部位没有时间戳字段，直接以全部 slug 作为版本，新增、删除和改名都会改变版本（部位数量很少）
+        return None, tuple(BodyPart.objects.order_by('id').values_list('slug', flat=True))
+
+    def count(self):
+        return BodyPart.objects.count()
+
+
+@register
+class ExerciseSitemap(SitemapSource):
+    """健身动作详情页"""
+    filename = 'sitemap-exercises.xml'
+    changefreq = 'weekly'
+    priority = '0.6'
+
+    def items(self):
+        return Exercise.objects.only('slug', 'updated_at').order_by('created_at').iterator()
+
+    def location(self, exercise):
+        return f"{settings.SITE_URL}/exercises/{exercise.slug}"
+
+    def lastmod(self, exercise):
+        return exercise.updated_at
+
+    def version(self):
+        result = Exercise.objects.aggregate(latest=Max('updated_at'), total=Count('id'))
+        return result['latest'], (result['total'], result['latest'])
+
+    def count(self):
+        return Exercise.objects.count()
@@ -0,0 +1,44 @@
+"""
+动作统计
+
+全部计数在一次条件聚合查询中完成，部位分布直接读取 BodyPart.exercise_count；
+结果缓存在 django.core.cache 中，动作或部位写入时由 fitness.signals 清除。
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from .models import BodyPart, Exercise
+
+STATS_CACHE_KEY = 'fitness:stats'
+
+
+def compute_stats():
+    counters = Exercise.objects.aggregate(
+        total=Count('id'),
+        with_youtube=Count('id', filter=~Q(youtube_url='')),
+        ai_generated=Count('id', filter=Q(ai_generated=True)),
+    )
+    body_part_stats = BodyPart.objects.values('name', 'slug', 'exercise_count').order_by('-exercise_count')
+
+    return {
+        'total_exercises': counters['total'],
+        'exercises_with_youtube': counters['with_youtube'],
+        'exercises_without_youtube': counters['total'] - counters['with_youtube'],
+        'ai_generated_descriptions': counters['ai_generated'],
+        'manual_descriptions': counters['total'] - counters['ai_generated'],
+        'body_part_distribution': list(body_part_stats),
+    }
+
+
+def get_stats():
+    """返回统计信息，优先读取缓存"""
+    stats = cache.get(STATS_CACHE_KEY)
+    if stats is None:
+        stats = compute_stats()
+        cache.set(STATS_CACHE_KEY, stats, getattr(settings, 'STATS_CACHE_TIMEOUT', 600))
+    return stats
+
+
+def invalidate_stats():
+    cache.delete(STATS_CACHE_KEY)
@@ -1,3 +1,552 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import tempfile
+
+import httpx
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+
+from ClipNote.slugs import SlugAllocator, save_with_unique_slug
+from ClipNote.testing import EndpointBudgetMixin
+from .batch import ingest_results, write_request_file
+from .completion_cache import CompletionCache
+from .descriptions import build_request
+from .generation import DescriptionPipeline
+from .models import BodyPart, ContentKeywordMapping, Exercise, refresh_exercise_counts
+from .ratelimit import RateLimiter, parse_duration
+from .rendering import render_description
+from .search import rebuild_index
+
+BODY_PART_COUNT = 20
+EXERCISES_PER_BODY_PART = 150
+MAPPINGS_PER_EXERCISE = 3
+
+DESCRIPTION_TEMPLATE = """## What is it?
+
+A compound movement for the {part}. It builds strength, stability and control.
+
+## Tutorial
+
+1. Set up with a neutral spine. 2. Brace the core. 3. Move through the full range. 4. Return slowly.
+
+## Common Mistakes
+
+- Rushing the eccentric phase. - Letting the lower back round. - Holding the breath.
+
+## Tips for Better Results
+
+- Film a set from the side. - Add load gradually. - Keep a training log.
+
+## Muscles Worked
+
+The {part} do most of the work, supported by the core and stabilisers.
+"""
+
+
+def seed_catalogue():
+    """生成接近线上规模的动作库：20 个部位、3000 个动作、9000 条关键词映射"""
+    body_parts = BodyPart.objects.bulk_create([
+        BodyPart(name=f'group{number}', slug=f'group{number}', description=f'group{number} exercises')
+        for number in range(BODY_PART_COUNT)
+    ])
+
+    exercises = []
+    for body_part in body_parts:
+        # 同一部位的描述相同，只需转换一次
+        description = DESCRIPTION_TEMPLATE.format(part=body_part.name)
+        digest, markdown, html = render_description(description)
+        for number in range(EXERCISES_PER_BODY_PART):
+            name = f'{body_part.name} press variation {number}'
+            exercises.append(Exercise(
+                name=name,
+                slug=f'{body_part.slug}-press-variation-{number}',
+                body_part=body_part,
+                description=description,
+                description_markdown=markdown,
+                description_html=html,
+                description_hash=digest,
+                youtube_url='https://www.youtube.com/watch?v=dQw4w9WgXcQ' if number % 2 else '',
+                image_url=f'https://example.com/images/{body_part.slug}/{number}.jpg',
+                generated_keywords=[name, body_part.name, 'strength', 'form', 'workout'],
+                ai_generated=number % 3 == 0,
+            ))
+    exercises = Exercise.objects.bulk_create(exercises, batch_size=500)
+
+    content_types = ['what_is', 'tutorial', 'mistakes']
+    ContentKeywordMapping.objects.bulk_create([
+        ContentKeywordMapping(exercise=exercise, keyword=f'{exercise.name} {content_type}', content_type=content_type)
+        for exercise in exercises
+        for content_type in content_types[:MAPPINGS_PER_EXERCISE]
+    ], batch_size=1000)
+
+    # bulk_create 不触发信号，手动同步计数和全文索引
+    refresh_exercise_counts()
+    rebuild_index()
+    return body_parts, exercises
+
+
+@override_settings(SITEMAP_AUTO_REBUILD=False)
+class FitnessEndpointTests(EndpointBudgetMixin, TestCase):
+    """fitness/urls.py 中每个路由的查询数预算与耗时基线"""
+
+    @classmethod
+    def setUpTestData(cls):
+        body_parts, exercises = seed_catalogue()
+        cls.body_part = body_parts[3]
+        cls.exercise = next(exercise for exercise in exercises if exercise.body_part_id == cls.body_part.id)
+
+    def test_api_root(self):
+        self.assertEndpoint('fitness:api-root', '/api/fitness/', 0)
+
+    def test_body_part_list(self):
+        response = self.assertEndpoint('fitness:bodypart-list', '/api/fitness/body-parts/', 1)
+        self.assertEqual(len(response.json()), BODY_PART_COUNT)
+        self.assertEqual(response.json()[0]['exercise_count'], EXERCISES_PER_BODY_PART)
+
+    def test_body_part_detail(self):
+        self.assertEndpoint('fitness:bodypart-detail', f'/api/fitness/body-parts/{self.body_part.slug}/', 1)
+
+    def test_exercise_list(self):
+        response = self.assertEndpoint('fitness:exercise-list', '/api/fitness/exercises/', 2)
+        self.assertEqual(response.json()['count'], BODY_PART_COUNT * EXERCISES_PER_BODY_PART)
+
+    def test_exercise_list_large_page(self):
+        # 查询数与每页数量无关
+        self.assertEndpoint('fitness:exercise-list-page-100', '/api/fitness/exercises/', 2, data={'page_size': 100})
+
+    def test_exercise_list_sparse_fields(self):
+        response = self.assertEndpoint(
+            'fitness:exercise-list-fields', '/api/fitness/exercises/', 2, data={'fields': 'id,name,image_url'},
+        )
+        self.assertEqual(set(response.json()['results'][0]), {'id', 'name', 'image_url'})
+
+    def test_exercise_list_search(self):
+        response = self.assertEndpoint(
+            'fitness:exercise-list-search', '/api/fitness/exercises/', 2, data={'search': 'group3 press'},
+        )
+        self.assertEqual(response.json()['count'], EXERCISES_PER_BODY_PART)
+
+    def test_exercise_list_keyword(self):
+        response = self.assertEndpoint(
+            'fitness:exercise-list-keyword', '/api/fitness/exercises/', 2, data={'keyword': self.exercise.name},
+        )
+        self.assertEqual(response.json()['count'], 1)
+
+    def test_exercise_list_ordering(self):
+        self.assertEndpoint('fitness:exercise-list-ordering', '/api/fitness/exercises/', 2, data={'ordering': 'name'})
+
+    def test_exercise_detail(self):
+        response = self.assertEndpoint('fitness:exercise-detail', f'/api/fitness/exercises/{self.exercise.id}/', 2)
+        self.assertEqual(len(response.json()['keyword_mappings']), MAPPINGS_PER_EXERCISE)
+        self.assertTrue(response.json()['description_html'].startswith('<h2'))
+
+    def test_exercise_detail_without_mappings(self):
+        self.assertEndpoint(
+            'fitness:exercise-detail-exclude', f'/api/fitness/exercises/{self.exercise.id}/', 1,
+            data={'exclude': 'keyword_mappings'},
+        )
+
+    def test_recommendations(self):
+        url = f'/api/fitness/exercises/recommendations/{self.body_part.slug}/'
+        response = self.assertEndpoint('fitness:exercise-recommendations', url, 2)
+        self.assertEqual(response.json()['count'], 8)
+
+    def test_recommendations_cached_pool(self):
+        url = f'/api/fitness/exercises/recommendations/{self.body_part.slug}/'
+        self.client.get(url)
+        self.assertEndpoint('fitness:exercise-recommendations-warm', url, 1)
+
+    def test_recommendations_daily_seed(self):
+        url = f'/api/fitness/exercises/recommendations/{self.body_part.slug}/'
+        first = self.assertEndpoint('fitness:exercise-recommendations-daily', url, 2, data={'seed': 'daily'})
+        second = self.client.get(url, {'seed': 'daily'})
+        self.assertEqual(first.json(), second.json())
+        self.assertIn('max-age', first['Cache-Control'])
+
+    def test_recommendations_unknown_body_part(self):
+        self.assertEndpoint('fitness:exercise-recommendations-404', '/api/fitness/exercises/recommendations/nope/', 1, status=404)
+
+    def test_by_body_part_and_exercise(self):
+        url = f'/api/fitness/exercises/body-parts/{self.body_part.slug}/{self.exercise.slug}/'
+        self.assertEndpoint('fitness:exercise-by-body-part-and-exercise', url, 2)
+
+    def test_by_body_part(self):
+        url = f'/api/fitness/exercises/body-parts/{self.body_part.slug}/'
+        response = self.assertEndpoint('fitness:exercise-by-body-part', url, 3)
+        self.assertEqual(response.json()['count'], EXERCISES_PER_BODY_PART)
+
+    def test_search(self):
+        # search 动作返回详情序列化器，包含预取的关键词映射
+        response = self.assertEndpoint(
+            'fitness:exercise-search', '/api/fitness/exercises/search/', 3, data={'search': 'variation 42'},
+        )
+        self.assertEqual(response.json()['count'], BODY_PART_COUNT)
+        self.assertEqual(response.json()['search_query'], 'variation 42')
+
+    def test_search_requires_query(self):
+        self.assertEndpoint('fitness:exercise-search-empty', '/api/fitness/exercises/search/', 0, status=400)
+
+    def test_stats(self):
+        response = self.assertEndpoint('fitness:exercise-stats', '/api/fitness/exercises/stats/', 2)
+        data = response.json()
+        self.assertEqual(data['total_exercises'], BODY_PART_COUNT * EXERCISES_PER_BODY_PART)
+        self.assertEqual(len(data['body_part_distribution']), BODY_PART_COUNT)
+
+    def test_stats_cached(self):
+        self.client.get('/api/fitness/exercises/stats/')
+        self.assertEndpoint('fitness:exercise-stats-warm', '/api/fitness/exercises/stats/', 0)
+
+
+@override_settings(SITEMAP_AUTO_REBUILD=False)
+class ExerciseWriteTests(TestCase):
+    """保存和删除动作时维护反范式计数、全文索引和渲染列"""
+
+    def setUp(self):
+        self.body_part = BodyPart.objects.create(name='chest')
+        self.other = BodyPart.objects.create(name='back')
+
+    def test_counters_follow_writes(self):
+        exercise = Exercise.objects.create(name='push up', body_part=self.body_part, description='## Push up')
+        self.body_part.refresh_from_db()
+        self.assertEqual(self.body_part.exercise_count, 1)
+
+        exercise = Exercise.objects.get(pk=exercise.pk)
+        exercise.body_part = self.other
+        exercise.save()
+        self.body_part.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual((self.body_part.exercise_count, self.other.exercise_count), (0, 1))
+
+        exercise.delete()
+        self.other.refresh_from_db()
+        self.assertEqual(self.other.exercise_count, 0)
+
+    def test_rename_keeps_counter(self):
+        Exercise.objects.create(name='push up', body_part=self.body_part, description='## Push up')
+        # self.body_part 是计数更新前加载的实例，完整保存不能覆盖计数
+        self.body_part.name = 'pecs'
+        self.body_part.save()
+        self.body_part.refresh_from_db()
+        self.assertEqual((self.body_part.name, self.body_part.exercise_count), ('pecs', 1))
+
+    def test_shared_allocator_retries_after_race(self):
+        allocator = SlugAllocator(BodyPart)
+        allocator.prefetch(['legs'])
+        # 预取之后另一个写入者抢先占用了同一个 slug
+        BodyPart.objects.create(name='legs', slug='legs')
+        body_part = BodyPart(name='legs')
+        save_with_unique_slug(body_part, 'legs', lambda: body_part.save(force_insert=True), allocator=allocator)
+        self.assertEqual(body_part.slug, 'legs-1')
+
+    def test_description_rendered_on_save(self):
+        exercise = Exercise.objects.create(name='row', body_part=self.other, description='## Row')
+        self.assertEqual(exercise.description_html, '<h2 id="row">Row</h2>')
+
+        exercise.description = '## Bent over row'
+        exercise.save(update_fields=['description'])
+        exercise.refresh_from_db()
+        self.assertIn('Bent over row', exercise.description_html)
+
+    def test_search_index_follows_writes(self):
+        exercise = Exercise.objects.create(name='zercher squat', body_part=self.body_part, description='')
+        response = self.client.get('/api/fitness/exercises/', {'search': 'zerch'})
+        self.assertEqual(response.json()['count'], 1)
+
+        exercise.delete()
+        response = self.client.get('/api/fitness/exercises/', {'search': 'zerch'})
+        self.assertEqual(response.json()['count'], 0)
+
+
+@override_settings(SITEMAP_AUTO_REBUILD=False)
+class SitemapViewTests(TestCase):
+    """数据库渲染的站点地图：版本随 URL 变化，分片数由各来源的数量算出"""
+
+    def setUp(self):
+        cache.clear()
+        self.body_part = BodyPart.objects.create(name='chest')
+        Exercise.objects.create(name='push up', body_part=self.body_part, description='')
+
+    def test_body_part_rename_changes_etag(self):
+        etag = self.client.get('/sitemap-exercises-1.xml')['ETag']
+        self.assertEqual(self.client.get('/sitemap-exercises-1.xml', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.body_part.slug = 'pecs'
+        self.body_part.save()
+        response = self.client.get('/sitemap-exercises-1.xml', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'/exercises/body-parts/pecs</loc>', response.content)
+
+    @override_settings(SITEMAP_SHARD_MAX_URLS=2)
+    def test_index_counts_shards(self):
+        Exercise.objects.create(name='dip', body_part=self.body_part, description='')
+        # 列表页 + 1 个部位 + 2 个动作 = 4 个 URL，分为 2 个分片
+        content = self.client.get('/sitemap.xml').content.decode()
+        self.assertIn('/sitemap-exercises-2.xml</loc>', content)
+        self.assertNotIn('/sitemap-exercises-3.xml</loc>', content)
+        self.assertEqual(self.client.get('/sitemap-exercises-2.xml').content.count(b'<url>'), 2)
+        self.assertEqual(self.client.get('/sitemap-exercises-3.xml').status_code, 404)
+
+
+def fake_completions():
+    """模拟 chat/completions：名称为 broken 的动作返回 400，名称为 busy 的动作第一次返回 429"""
+    throttled = set()
+
+    def handler(request):
+        name = json.loads(request.content)['messages'][1]['content'].split(' content')[0].removeprefix('Generate ')
+        if name == 'broken':
+            return httpx.Response(400, json={'error': 'boom'})
+        if name == 'busy' and name not in throttled:
+            throttled.add(name)
+            return httpx.Response(429, headers={'retry-after-ms': '10'}, json={'error': 'slow down'})
+        content = f'## What is {name}?\n\nA movement.\n\n## Tutorial\n\n1. Step one.\n\n## Muscles Worked\n\nChest.'
+        return httpx.Response(
+            200, json={'choices': [{'message': {'content': content}}], 'usage': {'total_tokens': 10}},
+        )
+    return handler
+
+
+def fake_packed_completions(packed_sizes):
+    """模拟打包请求：记录每次打包的动作数，名称为 kickback 的动作缺少一个部分；未打包的请求交给 fake_completions"""
+    single = fake_completions()
+
+    def handler(request):
+        payload = json.loads(request.content)
+        if 'response_format' not in payload:
+            return single(request)
+        names = [line.split('. ', 1)[1] for line in payload['messages'][1]['content'].splitlines()[1:]]
+        packed_sizes.append(len(names))
+        sections = {'what_is': 'A movement.', 'tutorial': ['Curl up.', 'Lower.'], 'common_mistakes': 'Swinging.',
+                    'tips': 'Go slow.', 'muscles_worked': 'Biceps.'}
+        exercises = [{'name': name, **sections, **({'tips': ''} if name == 'kickback' else {})} for name in names]
+        content = json.dumps({'exercises': exercises})
+        return httpx.Response(200, json={'choices': [{'message': {'content': content}}], 'usage': {'total_tokens': 30}})
+    return handler
+
+
+@override_settings(SITEMAP_AUTO_REBUILD=False)
+class DescriptionPipelineTests(TransactionTestCase):
+    """并发生成：写入在独立的数据库线程中提交，因此使用 TransactionTestCase"""
+
+    def test_generates_and_saves_in_batches(self):
+        body_part = BodyPart.objects.create(name='chest')
+        for name in ['push up', 'dip', 'fly', 'busy', 'broken']:
+            Exercise.objects.create(name=name, body_part=body_part, description='')
+
+        pipeline = DescriptionPipeline(
+            Exercise.objects.filter(description=''), 'test-model', 'key',
+            concurrency=3, batch_size=2, extract_keywords=True,
+            log=lambda message: None, transport=httpx.MockTransport(fake_completions()),
+        )
+        stats = asyncio.run(pipeline.run())
+
+        self.assertEqual((stats['done'], stats['success'], stats['failed'], stats['tokens']), (5, 4, 1, 40))
+        self.assertEqual((stats['retries'], stats['throttled']), (1, 1))
+        self.assertEqual(Exercise.objects.filter(ai_generated=True).count(), 4)
+        exercise = Exercise.objects.get(name='dip')
+        self.assertIn('<h2 id="what-is-dip">What is dip?</h2>', exercise.description_html)
+        self.assertIn('what is dip?', exercise.generated_keywords)
+        self.assertTrue(ContentKeywordMapping.objects.filter(exercise=exercise, content_type='tutorial').exists())
+        self.assertEqual(Exercise.objects.get(name='broken').description, '')
+
+    def test_packed_requests_fall_back_per_exercise(self):
+        body_part = BodyPart.objects.create(name='arms')
+        for name in ['curl', 'kickback', 'hammer curl', 'skullcrusher']:
+            Exercise.objects.create(name=name, body_part=body_part, description='')
+        packed_sizes = []
+        pipeline = DescriptionPipeline(
+            Exercise.objects.filter(description=''), 'test-model', 'key', concurrency=1, pack=4,
+            log=lambda message: None, transport=httpx.MockTransport(fake_packed_completions(packed_sizes)),
+        )
+        stats = asyncio.run(pipeline.run())
+
+        self.assertEqual(packed_sizes, [4])
+        self.assertEqual((stats['success'], stats['packed_requests'], stats['fallbacks']), (4, 1, 1))
+        self.assertEqual(stats['tokens'], 40)
+        curl = Exercise.objects.get(name='curl')
+        self.assertIn('## curl Tutorial', curl.description)
+        self.assertIn('- Curl up.', curl.description)
+        self.assertIn('What is kickback?', Exercise.objects.get(name='kickback').description)
+
+    def test_packed_cache_is_separate_from_single_requests(self):
+        body_part = BodyPart.objects.create(name='shoulders')
+        for name in ['press', 'raise']:
+            Exercise.objects.create(name=name, body_part=body_part, description='')
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        cache = CompletionCache(os.path.join(directory.name, 'cache.sqlite3'))
+        self.addCleanup(cache.close)
+        packed_sizes = []
+
+        def run(pack, handler):
+            pipeline = DescriptionPipeline(
+                Exercise.objects.all(), 'test-model', 'key', concurrency=1, pack=pack, cache=cache,
+                log=lambda message: None, transport=httpx.MockTransport(handler),
+            )
+            return asyncio.run(pipeline.run())
+
+        self.assertEqual(run(2, fake_packed_completions(packed_sizes))['packed_requests'], 1)
+        # 同样的分组再次打包运行时复用打包响应
+        stats = run(2, lambda request: httpx.Response(500))
+        self.assertEqual((stats['success'], stats['packed_requests'], stats['tokens']), (2, 0, 0))
+        # 不打包运行时不会把打包内容当作单独请求的结果
+        stats = run(1, fake_completions())
+        self.assertEqual((stats['success'], stats['tokens']), (2, 20))
+        self.assertEqual(packed_sizes, [2])
+        self.assertNotIn('press Tutorial', Exercise.objects.get(name='press').description)
+
+    def test_cache_replays_completions(self):
+        body_part = BodyPart.objects.create(name='legs')
+        for name in ['squat', 'lunge']:
+            Exercise.objects.create(name=name, body_part=body_part, description='')
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        cache = CompletionCache(os.path.join(directory.name, 'cache.sqlite3'))
+        self.addCleanup(cache.close)
+
+        def run(transport):
+            pipeline = DescriptionPipeline(
+                Exercise.objects.all(), 'test-model', 'key', concurrency=2, cache=cache,
+                log=lambda message: None, transport=httpx.MockTransport(transport),
+            )
+            return asyncio.run(pipeline.run())
+
+        self.assertEqual(run(fake_completions())['tokens'], 20)
+        # 第二次运行不会调用API
+        stats = run(lambda request: httpx.Response(500))
+        self.assertEqual((stats['success'], stats['tokens']), (2, 0))
+        self.assertEqual(cache.stats, {'hits': 2, 'misses': 2, 'tokens_saved': 20})
+        self.assertIn('What is squat?', Exercise.objects.get(name='squat').description)
+
+
+class RateLimiterTests(SimpleTestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.limiter = RateLimiter(rpm=60, tpm=6000, clock=lambda: self.now)
+
+    def test_buckets_pace_requests_and_tokens(self):
+        # 容量为 5 秒的配额：5 个请求、500 个 token
+        self.assertEqual([self.limiter.reserve(10) for _ in range(5)], [0.0] * 5)
+        self.assertAlmostEqual(self.limiter.reserve(10), 1.0)
+        self.assertAlmostEqual(self.limiter.reserve(1000), 5.6)
+
+    def test_usage_refunds_overestimate(self):
+        self.limiter.reserve(500)
+        self.limiter.record(estimated_tokens=500, used_tokens=100)
+        self.assertEqual(self.limiter.reserve(400), 0.0)
+
+    def test_throttle_halves_rate_and_honours_retry_after(self):
+        self.assertEqual(self.limiter.throttle({'retry-after': '3'}), 3.0)
+        self.assertEqual(self.limiter.factor, 0.5)
+        self.assertAlmostEqual(self.limiter.reserve(), 3.0)
+        self.limiter.record()
+        self.assertAlmostEqual(self.limiter.factor, 0.55)
+
+    def test_backoff_doubles_until_success(self):
+        self.assertEqual(self.limiter.backoff(), 1.0)
+        # 暂停期间返回的失败不增加退避次数
+        self.now = 0.5
+        self.assertEqual(self.limiter.backoff(), 0.5)
+        self.now = 1.0
+        self.assertEqual(self.limiter.backoff(), 2.0)
+        self.assertAlmostEqual(self.limiter.reserve(), 2.0)
+        self.now = 3.0
+        self.limiter.record()
+        self.assertEqual(self.limiter.backoff(), 1.0)
+
+    def test_headers_set_limits_and_block_until_reset(self):
+        limiter = RateLimiter(clock=lambda: self.now)
+        limiter.observe({
+            'x-ratelimit-limit-requests': '120',
+            'x-ratelimit-remaining-requests': '0',
+            'x-ratelimit-reset-requests': '1m30s',
+        })
+        self.assertEqual(limiter.requests.per_minute, 120)
+        self.assertAlmostEqual(limiter.reserve(), 90.0)
+        self.assertEqual(parse_duration('20ms'), 0.02)
+
+
+@override_settings(SITEMAP_AUTO_REBUILD=False)
+class BatchFileTests(TestCase):
+    """Batch API 请求文件导出与结果文件导入，不访问网络"""
+
+    def setUp(self):
+        body_part = BodyPart.objects.create(name='back')
+        self.exercises = [
+            Exercise.objects.create(name=name, body_part=body_part, description='') for name in ['row', 'pull up', 'shrug']
+        ]
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def test_export_and_ingest_round_trip(self):
+        count = write_request_file(Exercise.objects.filter(description=''), self.path('requests.jsonl'), 'test-model')
+        self.assertEqual(count, 3)
+        with open(self.path('requests.jsonl'), encoding='utf-8') as file:
+            requests = [json.loads(line) for line in file]
+        self.assertEqual(requests[0]['custom_id'], f'exercise-{self.exercises[0].id}')
+        self.assertEqual(requests[0]['body']['model'], 'test-model')
+
+        with open(self.path('results.jsonl'), 'w', encoding='utf-8') as file:
+            for index, request in enumerate(requests):
+                if index == 1:
+                    record = {'custom_id': request['custom_id'], 'response': None, 'error': {'message': 'failed'}}
+                else:
+                    body = {'choices': [{'message': {'content': '## Tutorial\n\n1. Pull.'}}], 'usage': {'total_tokens': 7}}
+                    record = {'custom_id': request['custom_id'], 'response': {'status_code': 200, 'body': body}}
+                file.write(json.dumps(record) + '\n')
+            file.write(json.dumps({'custom_id': 'exercise-0', 'response': {'status_code': 200, 'body': body}}) + '\n')
+
+        stats = ingest_results(self.path('results.jsonl'), extract_keywords=True, batch_size=2, log=lambda message: None)
+        self.assertEqual((stats['success'], stats['failed'], stats['missing'], stats['tokens']), (2, 1, 1, 14))
+        row = Exercise.objects.get(name='row')
+        self.assertEqual(row.description, '## Tutorial\n1. Pull.')
+        self.assertTrue(row.ai_generated)
+        self.assertTrue(ContentKeywordMapping.objects.filter(exercise=row, keyword='tutorial').exists())
+        self.assertEqual(Exercise.objects.get(name='pull up').description, '')
+
+    def test_non_object_lines_are_reported(self):
+        row = self.exercises[0]
+        with open(self.path('results.jsonl'), 'w', encoding='utf-8') as file:
+            for record in ([1], 'x', 3, None, {'custom_id': f'exercise-{row.id}', 'response': [200]}):
+                file.write(json.dumps(record) + '\n')
+
+        stats = ingest_results(self.path('results.jsonl'), log=lambda message: None)
+        self.assertEqual((stats['success'], stats['failed']), (0, 5))
+        self.assertEqual(Exercise.objects.get(pk=row.pk).description, '')
+
+
+class CompletionCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'cache.sqlite3')
+
+    def test_key_covers_whole_request(self):
+        cache = CompletionCache(self.path)
+        self.addCleanup(cache.close)
+        payload = build_request('squat', 'model-a')
+        cache.put(payload, 'content', 12)
+
+        self.assertEqual(cache.get(dict(reversed(list(payload.items())))), ('content', 12))
+        self.assertIsNone(cache.get(build_request('squat', 'model-b')))
+        self.assertIsNone(cache.get({**payload, 'temperature': 0.2}))
+        self.assertEqual(cache.stats, {'hits': 1, 'misses': 2, 'tokens_saved': 12})
+
+    def test_evicts_least_recently_used(self):
+        cache = CompletionCache(self.path, max_bytes=250)
+        self.addCleanup(cache.close)
+        first, second, third = (build_request(name, 'model') for name in ['a', 'b', 'c'])
+        cache.put(first, 'x' * 100, 1)
+        cache.put(second, 'y' * 100, 1)
+        cache.get(first)
+        cache.put(third, 'z' * 100, 1)
+
+        self.assertIsNotNone(cache.get(first))
+        self.assertIsNone(cache.get(second))
+        reopened = CompletionCache(self.path)
+        self.addCleanup(reopened.close)
+        self.assertLessEqual(reopened.size, 250)
 
-# Create your tests here.
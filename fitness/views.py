@@ -3,8 +3,15 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
 from django.shortcuts import get_object_or_404
-from .models import BodyPart, Exercise
-from .serializers import BodyPartSerializer, ExerciseListSerializer, ExerciseDetailSerializer
+from django.http import Http404
+from django.utils.cache import patch_cache_control
+from django.db.models import Prefetch
+from .models import BodyPart, ContentKeywordMapping, Exercise
+from .serializers import BodyPartListSerializer, ExerciseListSerializer, ExerciseDetailSerializer
+from .search import ExerciseSearchFilter
+from .recommendations import daily_seed, get_pool, sample_ids, seconds_until_tomorrow
+from .stats import get_stats
+from ClipNote.fieldsets import sparse_queryset
 
 
 class StandardResultsSetPagination(PageNumberPagination):
@@ -18,7 +25,7 @@ class StandardResultsSetPagination(PageNumberPagination):
 class BodyPartViewSet(viewsets.ReadOnlyModelViewSet):
     """身体部位ViewSet"""
     queryset = BodyPart.objects.all()
-    serializer_class = BodyPartSerializer
+    serializer_class = BodyPartListSerializer
     lookup_field = 'slug'
     pagination_class = None  # 身体部位通常不多，不需要分页
 
@@ -27,8 +34,9 @@ class ExerciseViewSet(viewsets.ReadOnlyModelViewSet):
     """健身动作ViewSet"""
     queryset = Exercise.objects.all().select_related('body_part')
     pagination_class = StandardResultsSetPagination
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
-    search_fields = ['name', 'description', 'body_part__name']
+    # 全文检索需要在排序之后执行，未指定 ordering 时按相关度排序
+    filter_backends = [filters.OrderingFilter, ExerciseSearchFilter]
+    search_fields = ['name', 'description', 'body_part__name']  # 不支持全文检索的数据库使用 LIKE 查询
     ordering_fields = ['name', 'created_at', 'updated_at', 'body_part__name']
     ordering = ['-created_at']  # 默认按创建时间倒序
     
@@ -38,18 +46,35 @@ class ExerciseViewSet(viewsets.ReadOnlyModelViewSet):
         return ExerciseDetailSerializer
     
     def get_queryset(self):
-        """优化查询集"""
-        return super().get_queryset()
+        """优化查询集，支持 ?keyword= 按生成关键词筛选"""
+        queryset = super().get_queryset()
+        keyword = self.request.query_params.get('keyword')
+        if keyword:
+            queryset = queryset.filter(generated_keywords__has_element=keyword)
+        # 列表接口不返回描述，不加载描述及其生成的格式
+        serializer_class = self.get_serializer_class()
+        if serializer_class is ExerciseListSerializer:
+            queryset = queryset.defer('description', *Exercise.RENDERED_FIELDS)
+        # 详情接口预取关键词映射，未请求该字段时跳过
+        elif 'keyword_mappings' not in serializer_class.unrequested_fields(self.request.query_params):
+            queryset = queryset.prefetch_related(Prefetch(
+                'keyword_mappings',
+                queryset=ContentKeywordMapping.objects.only('exercise_id', 'keyword', 'content_type', 'relevance_score'),
+            ))
+        # ?fields= / ?exclude= 未请求的字段不从数据库读取
+        return sparse_queryset(queryset, serializer_class, self.request)
     
     def list(self, request, *args, **kwargs):
         """
         获取动作列表，支持搜索、排序和分页
         
         查询参数：
-        - search: 搜索关键词（在名称、描述、部位名称中搜索）
-        - ordering: 排序字段（name, created_at, updated_at, body_part__name）
+        - search: 搜索关键词（全文检索名称、关键词、部位名称和描述，按相关度排序）
+        - keyword: 按生成内容关键词精确筛选
+        - ordering: 排序字段（name, created_at, updated_at, body_part__name），指定后替代相关度排序
         - page: 页码
         - page_size: 每页数量（最大100）
+        - fields / exclude: 逗号分隔的字段名，只返回或排除这些字段
         """
         return super().list(request, *args, **kwargs)
     
@@ -65,21 +90,34 @@ class ExerciseViewSet(viewsets.ReadOnlyModelViewSet):
     def recommendations(self, request, body_part_slug=None):
         """
         获取特定身体部位的推荐动作（随机8个）
+        
+        查询参数：
+        - seed: 随机种子，daily 表示按天固定推荐结果（可被 HTTP 缓存到当天结束），也可传入任意字符串
+        - fields / exclude: 逗号分隔的字段名，只返回或排除这些字段
         """
-        # 验证body_part是否存在
-        get_object_or_404(BodyPart, slug=body_part_slug)
+        # 从缓存的部位候选池中抽样，部位不存在时候选池为 None
+        pool = get_pool(body_part_slug)
+        if pool is None:
+            raise Http404('部位不存在')
         
-        queryset = Exercise.objects.filter(body_part__slug=body_part_slug).select_related('body_part')
+        seed = request.query_params.get('seed')
+        if seed == 'daily':
+            seed = daily_seed(body_part_slug)
         
-        # 随机选择8个动作
-        recommended_exercises = queryset.order_by('?')[:8]
+        ids = sample_ids(pool, 8, seed)
+        queryset = Exercise.objects.filter(id__in=ids).select_related('body_part').defer('description', *Exercise.RENDERED_FIELDS)
+        exercises = sparse_queryset(queryset, self.get_serializer_class(), request).in_bulk()
+        recommended_exercises = [exercises[exercise_id] for exercise_id in ids if exercise_id in exercises]
         
         serializer = self.get_serializer(recommended_exercises, many=True)
-        return Response({
+        response = Response({
             'body_part': body_part_slug,
             'count': len(recommended_exercises),
             'recommendations': serializer.data
         })
+        if request.query_params.get('seed') == 'daily':
+            patch_cache_control(response, public=True, max_age=seconds_until_tomorrow())
+        return response
     
     @action(detail=False, url_path='body-parts/(?P<body_part_slug>[^/]+)/(?P<exercise_slug>[^/]+)')
     def by_body_part_and_exercise(self, request, body_part_slug=None, exercise_slug=None):
@@ -172,23 +210,6 @@ class ExerciseViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=False, methods=['get'])
     def stats(self, request):
         """
-        获取统计信息
+        获取统计信息（一次条件聚合查询，结果缓存到下一次动作写入）
         """
-        from django.db.models import Count
-        
-        total_exercises = Exercise.objects.count()
-        exercises_with_youtube = Exercise.objects.exclude(youtube_url='').count()
-        ai_generated = Exercise.objects.filter(ai_generated=True).count()
-        
-        body_part_stats = BodyPart.objects.annotate(
-            exercise_count=Count('exercises')
-        ).values('name', 'slug', 'exercise_count').order_by('-exercise_count')
-        
-        return Response({
-            'total_exercises': total_exercises,
-            'exercises_with_youtube': exercises_with_youtube,
-            'exercises_without_youtube': total_exercises - exercises_with_youtube,
-            'ai_generated_descriptions': ai_generated,
-            'manual_descriptions': total_exercises - ai_generated,
-            'body_part_distribution': list(body_part_stats)
-        })
+        return Response(get_stats())
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from note.models import Article, build_excerpt
+
+class Command(BaseCommand):
+    help = '为文章生成纯文本摘要'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='重新生成所有文章的摘要，而不是仅处理缺少摘要的文章',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='每批写入数据库的文章数量',
+        )
+
+    def handle(self, *args, **options):
+        articles = Article.objects.only('id', 'content', 'excerpt').order_by('id')
+        if not options['all']:
+            articles = articles.filter(excerpt='')
+        
+        count = articles.count()
+        self.stdout.write(self.style.SUCCESS(f'开始为 {count} 篇文章生成摘要...'))
+        
+        batch_size = options['batch_size']
+        batch = []
+        updated = 0
+        for article in articles.iterator(chunk_size=batch_size):
+            excerpt = build_excerpt(article.content)
+            if excerpt == article.excerpt:
+                continue
+            article.excerpt = excerpt
+            batch.append(article)
+            if len(batch) >= batch_size:
+                Article.objects.bulk_update(batch, ['excerpt'])
+                updated += len(batch)
+                batch = []
+        
+        if batch:
+            Article.objects.bulk_update(batch, ['excerpt'])
+            updated += len(batch)
+        
+        self.stdout.write(self.style.SUCCESS(f'成功更新 {updated} 篇文章的摘要'))
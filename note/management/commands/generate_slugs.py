@@ -1,29 +1,24 @@
 from django.core.management.base import BaseCommand
 from note.models import Article
 from django.utils.text import slugify
+from ClipNote.slugs import assign_unique_slugs
 
 class Command(BaseCommand):
     help = '为所有现有文章生成 slug'
 
     def handle(self, *args, **options):
-        articles = Article.objects.filter(slug__isnull=True) | Article.objects.filter(slug='')
-        count = articles.count()
+        articles = list(
+            (Article.objects.filter(slug__isnull=True) | Article.objects.filter(slug=''))
+            .only('id', 'title', 'slug')
+            .order_by('id')
+        )
+        count = len(articles)
         self.stdout.write(self.style.SUCCESS(f'开始为 {count} 篇文章生成 slug...'))
         
-        for article in articles:
-            # 生成基础 slug
-            base_slug = slugify(article.title)
-            
-            # 确保 slug 唯一
-            slug = base_slug
-            counter = 1
-            while Article.objects.filter(slug=slug).exclude(id=article.id).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            
-            article.slug = slug
-            article.save(update_fields=['slug'])
-            
+        # 整批分配：每个基础 slug 只查询一次，后缀在内存中分配后批量写回
+        slugs = assign_unique_slugs(articles, [slugify(article.title) for article in articles])
+        
+        for article, slug in zip(articles, slugs):
             self.stdout.write(f'为文章 "{article.title}" 生成 slug: {slug}')
         
-        self.stdout.write(self.style.SUCCESS(f'成功为 {count} 篇文章生成 slug')) 
\ No newline at end of file
+        self.stdout.write(self.style.SUCCESS(f'成功为 {count} 篇文章生成 slug')) 
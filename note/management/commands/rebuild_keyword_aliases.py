@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from note.models import rebuild_keyword_aliases
+
+class Command(BaseCommand):
+    help = '根据现有文章的关键词重建关键词别名索引'
+
+    def handle(self, *args, **options):
+        self.stdout.write('开始重建关键词别名索引...')
+        count = rebuild_keyword_aliases()
+        self.stdout.write(self.style.SUCCESS(f'成功写入 {count} 个关键词别名'))
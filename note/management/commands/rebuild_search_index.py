@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from note.models import rebuild_search_tokens
+
+class Command(BaseCommand):
+    help = '根据现有文章的标题、关键词和内容重建 n-gram 检索倒排表'
+
+    def handle(self, *args, **options):
+        self.stdout.write('开始重建文章检索索引...')
+        count = rebuild_search_tokens()
+        self.stdout.write(self.style.SUCCESS(f'成功写入 {count} 个检索词元'))
@@ -1,30 +1,34 @@
-from django.core.management.base import BaseCommand
-import os
-from django.conf import settings
-import xml.etree.ElementTree as ET
-from datetime import datetime
-import pytz
-from note.models import Article
-from note.signals import check_and_update_sitemap
+from django.core.management.base import BaseCommand, CommandError
+from ClipNote.sitemaps import write_all, write_sitemap
 
 class Command(BaseCommand):
-    help = '更新站点地图，添加所有文章的 URL'
+    help = '重新生成站点地图（文章、健身动作、身体部位和固定页面）以及索引文件'
 
     def add_arguments(self, parser):
         parser.add_argument(
             '--rebuild',
             action='store_true',
-            help='完全重建站点地图，而不是增量更新',
+            help='保留以兼容旧的调用方式，站点地图总是完整重建',
+        )
+        parser.add_argument(
+            '--only',
+            type=str,
+            default=None,
+            help='只生成指定的站点地图（及其分片），例如 sitemap-knowledge.xml',
         )
 
     def handle(self, *args, **options):
-        # 获取rebuild参数
-        rebuild = options.get('rebuild', False)
+        only = options.get('only')
         
-        # 调用signals.py中的函数
-        check_and_update_sitemap(rebuild=rebuild)
+        if only:
+            try:
+                count = write_sitemap(only)
+            except KeyError as e:
+                raise CommandError(str(e))
+            self.stdout.write(self.style.SUCCESS(f'{only} 已生成，共 {count} 个URL'))
+            return
         
-        if rebuild:
-            self.stdout.write(self.style.SUCCESS('站点地图已完全重建'))
-        else:
-            self.stdout.write(self.style.SUCCESS('站点地图已增量更新')) 
\ No newline at end of file
+        counts = write_all()
+        for filename, count in counts.items():
+            self.stdout.write(f'{filename}: {count} 个URL')
+        self.stdout.write(self.style.SUCCESS('站点地图已完全重建')) 
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.2 on 2026-10-18 03:10
+
+import json
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_keyword_aliases(apps, schema_editor):
+    Article = apps.get_model('note', 'Article')
+    ArticleKeywordAlias = apps.get_model('note', 'ArticleKeywordAlias')
+
+    aliases = {}
+    for article in Article.objects.only('id', 'keywords').order_by('id').iterator():
+        try:
+            keywords = json.loads(article.keywords)
+        except (TypeError, ValueError):
+            continue
+        if not isinstance(keywords, list):
+            continue
+        for keyword in keywords:
+            if not isinstance(keyword, str):
+                continue
+            keyword_slug = keyword.strip().replace(' ', '-').lower()
+            if keyword_slug and len(keyword_slug) <= 255 and keyword_slug not in aliases:
+                aliases[keyword_slug] = ArticleKeywordAlias(article_id=article.id, slug=keyword_slug, keyword=keyword)
+
+    ArticleKeywordAlias.objects.bulk_create(aliases.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('note', '0003_article_slug'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArticleKeywordAlias',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slug', models.CharField(max_length=255, unique=True, verbose_name='关键词URL')),
+                ('keyword', models.CharField(max_length=255, verbose_name='关键词')),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='keyword_aliases', to='note.article', verbose_name='文章')),
+            ],
+            options={
+                'verbose_name': '文章关键词别名',
+                'verbose_name_plural': '文章关键词别名管理',
+            },
+        ),
+        migrations.RunPython(backfill_keyword_aliases, migrations.RunPython.noop),
+    ]
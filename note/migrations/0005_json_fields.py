@@ -0,0 +1,51 @@
+# Generated by Django 5.2.2 on 2026-10-18 03:11
+
+import json
+
+from django.db import migrations, models
+
+
+def repair_json_list(value):
+    """无法解析或不是列表的 JSON 文本重置为空列表，数据合法时原样返回"""
+    try:
+        parsed = json.loads(value)
+    except (TypeError, ValueError):
+        return '[]'
+    return value if isinstance(parsed, list) else '[]'
+
+
+def repair_article_json(apps, schema_editor):
+    Article = apps.get_model('note', 'Article')
+
+    to_update = []
+    for article in Article.objects.only('id', 'images', 'keywords').iterator():
+        images = repair_json_list(article.images)
+        keywords = repair_json_list(article.keywords)
+        if images != article.images or keywords != article.keywords:
+            article.images = images
+            article.keywords = keywords
+            to_update.append(article)
+
+    Article.objects.bulk_update(to_update, ['images', 'keywords'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('note', '0004_articlekeywordalias'),
+    ]
+
+    operations = [
+        # 先修复格式错误的数据，否则转换为 JSONField 时会违反 JSON_VALID 约束
+        migrations.RunPython(repair_article_json, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='article',
+            name='images',
+            field=models.JSONField(blank=True, default=list, verbose_name='预览图'),
+        ),
+        migrations.AlterField(
+            model_name='article',
+            name='keywords',
+            field=models.JSONField(blank=True, default=list, verbose_name='关键词'),
+        ),
+    ]
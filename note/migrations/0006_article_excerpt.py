@@ -0,0 +1,39 @@
+# Generated by Django 5.2.2 on 2026-10-18 03:12
+
+from bs4 import BeautifulSoup
+from django.db import migrations, models
+
+
+def build_excerpt(html, length=100):
+    """迁移时的摘要规则（复制自 note.models.build_excerpt，之后修改该函数不影响本迁移）"""
+    text = BeautifulSoup(html or '', 'html.parser').get_text()
+    return text[:length] + '...' if len(text) > length else text
+
+
+def backfill_excerpts(apps, schema_editor):
+    Article = apps.get_model('note', 'Article')
+
+    batch = []
+    for article in Article.objects.only('id', 'content').order_by('id').iterator(chunk_size=200):
+        article.excerpt = build_excerpt(article.content)
+        batch.append(article)
+        if len(batch) >= 200:
+            Article.objects.bulk_update(batch, ['excerpt'])
+            batch = []
+    Article.objects.bulk_update(batch, ['excerpt'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('note', '0005_json_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='excerpt',
+            field=models.TextField(blank=True, default='', editable=False, help_text='保存时根据内容自动生成的纯文本摘要', verbose_name='摘要'),
+        ),
+        migrations.RunPython(backfill_excerpts, migrations.RunPython.noop),
+    ]
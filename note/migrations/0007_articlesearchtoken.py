@@ -0,0 +1,93 @@
+# Generated by Django 5.2.2 on 2026-10-18 03:22
+
+import re
+import unicodedata
+from collections import Counter
+
+import django.db.models.deletion
+from bs4 import BeautifulSoup
+from django.db import migrations, models
+
+# 以下分词和权重规则复制自迁移编写时的 note.search，之后修改该模块不影响本迁移
+FIELD_WEIGHTS = {
+    'title': 5.0,
+    'keywords': 3.0,
+    'content': 1.0,
+}
+TF_SATURATION = 1.2
+TOKEN_MAX_LENGTH = 64
+CJK_CHARS = '\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af'
+TOKEN_RE = re.compile(rf'([{CJK_CHARS}]+)|([^\W_{CJK_CHARS}]+)')
+
+
+def tokenize(text):
+    text = unicodedata.normalize('NFKC', text or '').lower()
+    tokens = []
+    for match in TOKEN_RE.finditer(text):
+        cjk, word = match.groups()
+        if cjk:
+            if len(cjk) == 1:
+                tokens.append(cjk)
+            else:
+                tokens.extend(cjk[i:i + 2] for i in range(len(cjk) - 1))
+                tokens.append(cjk[-1])
+        else:
+            tokens.append(word[:TOKEN_MAX_LENGTH])
+    return tokens
+
+
+def token_weights(title, keywords, content):
+    if isinstance(keywords, list):
+        keywords = ' '.join(keyword for keyword in keywords if isinstance(keyword, str))
+    fields = {
+        'title': title,
+        'keywords': keywords,
+        'content': BeautifulSoup(content or '', 'html.parser').get_text(' '),
+    }
+
+    weights = {}
+    for field, text in fields.items():
+        for token, tf in Counter(tokenize(text)).items():
+            saturated = tf * (TF_SATURATION + 1) / (tf + TF_SATURATION)
+            weights[token] = weights.get(token, 0.0) + saturated * FIELD_WEIGHTS[field]
+    return {token: round(weight, 4) for token, weight in weights.items()}
+
+
+def backfill_search_tokens(apps, schema_editor):
+    Article = apps.get_model('note', 'Article')
+    ArticleSearchToken = apps.get_model('note', 'ArticleSearchToken')
+
+    batch = []
+    for article in Article.objects.only('id', 'title', 'keywords', 'content').order_by('id').iterator():
+        keywords = article.keywords if isinstance(article.keywords, list) else []
+        for token, weight in token_weights(article.title, keywords, article.content).items():
+            batch.append(ArticleSearchToken(article_id=article.id, token=token, weight=weight))
+        if len(batch) >= 2000:
+            ArticleSearchToken.objects.bulk_create(batch, batch_size=500)
+            batch = []
+    ArticleSearchToken.objects.bulk_create(batch, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('note', '0006_article_excerpt'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArticleSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=64, verbose_name='词元')),
+                ('weight', models.FloatField(verbose_name='权重')),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='note.article', verbose_name='文章')),
+            ],
+            options={
+                'verbose_name': '文章检索词元',
+                'verbose_name_plural': '文章检索词元管理',
+                'constraints': [models.UniqueConstraint(fields=('token', 'article'), name='note_search_token_article_unique')],
+            },
+        ),
+        migrations.RunPython(backfill_search_tokens, migrations.RunPython.noop),
+    ]
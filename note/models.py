@@ -1,14 +1,18 @@
-from django.db import models
+from django.db import models, transaction
 from ckeditor.fields import RichTextField
-import json
 from django.utils.text import slugify
+from bs4 import BeautifulSoup
+import ClipNote.lookups  # noqa: F401 注册 JSONField 的 has_element 查询
+from ClipNote.slugs import save_with_unique_slug
+from .search import TOKEN_MAX_LENGTH, token_weights
 
 class Article(models.Model):
     title = models.CharField('标题', max_length=200)
     content = RichTextField('内容')
     slug = models.SlugField('URL别名', max_length=255, unique=True, blank=True, null=True)
-    images = models.TextField('预览图', blank=True, default='[]')
-    keywords = models.TextField('关键词', blank=True, default='[]')
+    images = models.JSONField('预览图', blank=True, default=list)
+    keywords = models.JSONField('关键词', blank=True, default=list)
+    excerpt = models.TextField('摘要', blank=True, default='', editable=False, help_text='保存时根据内容自动生成的纯文本摘要')
     created_at = models.DateTimeField('创建时间', auto_now_add=True)
     updated_at = models.DateTimeField('更新时间', auto_now=True)
 
@@ -16,49 +20,228 @@ class Article(models.Model):
         return self.title
 
     def save(self, *args, **kwargs):
-        # 如果没有提供 slug，则根据标题自动生成
+        # 内容变化时重新生成纯文本摘要（内容被 defer 或未在 update_fields 中时跳过）
+        update_fields = kwargs.get('update_fields')
+        if (update_fields is None or 'content' in update_fields) and 'content' not in self.get_deferred_fields():
+            self.excerpt = build_excerpt(self.content)
+            if update_fields is not None and 'excerpt' not in update_fields:
+                kwargs['update_fields'] = list(update_fields) + ['excerpt']
+        
+        # 如果没有提供 slug，则根据标题自动生成唯一 slug
         if not self.slug:
-            self.slug = slugify(self.title)
-            
-            # 确保 slug 唯一
-            original_slug = self.slug
-            counter = 1
-            while Article.objects.filter(slug=self.slug).exclude(id=self.id).exists():
-                self.slug = f"{original_slug}-{counter}"
-                counter += 1
-                
-        super().save(*args, **kwargs)
+            save_with_unique_slug(self, slugify(self.title), lambda: super(Article, self).save(*args, **kwargs))
+        else:
+            super().save(*args, **kwargs)
+
+        # 同步关键词别名索引（仅更新 slug 等其他字段时跳过）
+        if update_fields is None or 'keywords' in update_fields:
+            self.sync_keyword_aliases()
+
+        # 同步全文检索倒排表（标题、关键词、内容均未更新时跳过）
+        if update_fields is None or {'title', 'keywords', 'content'} & set(update_fields):
+            self.sync_search_tokens()
 
     def get_images(self):
         """返回图片URL列表"""
-        try:
-            return json.loads(self.images)
-        except:
-            return []
+        return self.images if isinstance(self.images, list) else []
     
     def set_images(self, value):
         """设置图片URL列表"""
-        if isinstance(value, list):
-            self.images = json.dumps(value)
-        else:
-            self.images = json.dumps([])
+        self.images = value if isinstance(value, list) else []
     
     def get_keywords(self):
         """返回关键词列表"""
-        try:
-            return json.loads(self.keywords)
-        except:
-            return []
+        return self.keywords if isinstance(self.keywords, list) else []
     
     def set_keywords(self, value):
         """设置关键词列表"""
-        if isinstance(value, list):
-            self.keywords = json.dumps(value)
+        self.keywords = value if isinstance(value, list) else []
+
+    def get_keyword_slugs(self):
+        """返回关键词对应的 URL 形式（空格替换为连字符并转为小写），保持原有顺序"""
+        slugs = {}
+        for keyword in self.get_keywords():
+            if not isinstance(keyword, str):
+                continue
+            keyword_slug = keyword_to_slug(keyword)
+            if keyword_slug and len(keyword_slug) <= ArticleKeywordAlias.SLUG_MAX_LENGTH:
+                slugs.setdefault(keyword_slug, keyword)
+        return slugs
+
+    def sync_keyword_aliases(self):
+        """
+        将文章关键词同步到别名索引表
+        同一个关键词被多篇文章使用时，由 ID 最小的文章占用（与原先全表扫描的匹配顺序一致）
+        """
+        wanted = self.get_keyword_slugs()
+        existing = {
+            alias.slug: alias
+            for alias in ArticleKeywordAlias.objects.filter(slug__in=list(wanted))
+        }
+
+        # 移除本文章已不再使用的别名，并让其他仍使用该关键词的文章接管
+        stale = ArticleKeywordAlias.objects.filter(article=self).exclude(slug__in=list(wanted))
+        released = list(stale.values_list('slug', flat=True))
+        if released:
+            stale.delete()
+            reassign_keyword_aliases(released, exclude_id=self.id)
+
+        to_create = []
+        for keyword_slug, keyword in wanted.items():
+            alias = existing.get(keyword_slug)
+            if alias is None:
+                to_create.append(ArticleKeywordAlias(article=self, slug=keyword_slug, keyword=keyword))
+            elif alias.article_id == self.id:
+                if alias.keyword != keyword:
+                    alias.keyword = keyword
+                    alias.save(update_fields=['keyword'])
+            elif alias.article_id > self.id:
+                alias.article = self
+                alias.keyword = keyword
+                alias.save(update_fields=['article', 'keyword'])
+
+        if to_create:
+            # 并发保存时别名可能已被其他文章抢先写入，忽略唯一索引冲突
+            ArticleKeywordAlias.objects.bulk_create(to_create, ignore_conflicts=True)
+
+    def sync_search_tokens(self):
+        """
+        增量更新本文章在检索倒排表中的词元：只删除、新增或修改有变化的行
+        """
+        if 'content' in self.get_deferred_fields():
+            content = Article.objects.values_list('content', flat=True).get(pk=self.pk)
         else:
-            self.keywords = json.dumps([])
+            content = self.content
+        wanted = token_weights(self.title, self.get_keywords(), content)
+        existing = {
+            token.token: token
+            for token in ArticleSearchToken.objects.filter(article=self).only('id', 'token', 'weight')
+        }
+
+        stale = [token.id for key, token in existing.items() if key not in wanted]
+        to_create = [
+            ArticleSearchToken(article=self, token=key, weight=weight)
+            for key, weight in wanted.items() if key not in existing
+        ]
+        to_update = []
+        for key, weight in wanted.items():
+            token = existing.get(key)
+            if token is not None and token.weight != weight:
+                token.weight = weight
+                to_update.append(token)
+
+        with transaction.atomic():
+            if stale:
+                ArticleSearchToken.objects.filter(id__in=stale).delete()
+            ArticleSearchToken.objects.bulk_create(to_create, batch_size=500)
+            ArticleSearchToken.objects.bulk_update(to_update, ['weight'], batch_size=500)
 
     class Meta:
         verbose_name = '文章'
         verbose_name_plural = '文章管理'
 
+
+class ArticleKeywordAlias(models.Model):
+    """文章关键词别名索引：关键词 URL -> 文章，用于按关键词路由时的索引查询"""
+    SLUG_MAX_LENGTH = 255
+
+    article = models.ForeignKey(Article, on_delete=models.CASCADE, related_name='keyword_aliases', verbose_name='文章')
+    slug = models.CharField('关键词URL', max_length=SLUG_MAX_LENGTH, unique=True)
+    keyword = models.CharField('关键词', max_length=SLUG_MAX_LENGTH)
+
+    def __str__(self):
+        return f"{self.slug} -> {self.article_id}"
+
+    class Meta:
+        verbose_name = '文章关键词别名'
+        verbose_name_plural = '文章关键词别名管理'
+
+
+class ArticleSearchToken(models.Model):
+    """文章检索倒排表：词元 -> 文章及权重，由 Article.save 增量维护"""
+    article = models.ForeignKey(Article, on_delete=models.CASCADE, related_name='search_tokens', verbose_name='文章')
+    token = models.CharField('词元', max_length=TOKEN_MAX_LENGTH)
+    weight = models.FloatField('权重')
+
+    def __str__(self):
+        return f"{self.token} -> {self.article_id}"
+
+    class Meta:
+        verbose_name = '文章检索词元'
+        verbose_name_plural = '文章检索词元管理'
+        constraints = [
+            # 同时作为按词元查询的索引
+            models.UniqueConstraint(fields=['token', 'article'], name='note_search_token_article_unique'),
+        ]
+
+
+def build_excerpt(html, length=100):
+    """从富文本内容中提取纯文本摘要"""
+    text = BeautifulSoup(html or '', 'html.parser').get_text()
+    return text[:length] + '...' if len(text) > length else text
+
+
+def keyword_to_slug(keyword):
+    """将关键词转换为 URL 友好的格式（用连字符替换空格）"""
+    return keyword.strip().replace(' ', '-').lower()
+
+
+def reassign_keyword_aliases(slugs, exclude_id=None):
+    """
+    为被释放的关键词别名重新选择归属文章（ID 最小且仍包含该关键词的文章）
+    仅在文章删除或修改关键词时调用
+    """
+    pending = set(slugs)
+    # 已有归属的别名无需处理
+    pending -= set(ArticleKeywordAlias.objects.filter(slug__in=list(pending)).values_list('slug', flat=True))
+    if not pending:
+        return
+
+    articles = Article.objects.only('id', 'keywords').order_by('id')
+    if exclude_id is not None:
+        articles = articles.exclude(id=exclude_id)
+
+    to_create = []
+    for article in articles.iterator():
+        for keyword_slug, keyword in article.get_keyword_slugs().items():
+            if keyword_slug in pending:
+                pending.discard(keyword_slug)
+                to_create.append(ArticleKeywordAlias(article=article, slug=keyword_slug, keyword=keyword))
+        if not pending:
+            break
+
+    if to_create:
+        ArticleKeywordAlias.objects.bulk_create(to_create, ignore_conflicts=True)
+
+
+def rebuild_keyword_aliases():
+    """根据所有文章的关键词完全重建别名索引，返回写入的别名数量"""
+    aliases = {}
+    for article in Article.objects.only('id', 'keywords').order_by('id').iterator():
+        for keyword_slug, keyword in article.get_keyword_slugs().items():
+            if keyword_slug not in aliases:
+                aliases[keyword_slug] = ArticleKeywordAlias(article_id=article.id, slug=keyword_slug, keyword=keyword)
+
+    with transaction.atomic():
+        ArticleKeywordAlias.objects.all().delete()
+        ArticleKeywordAlias.objects.bulk_create(aliases.values(), batch_size=500)
+    return len(aliases)
+
+def rebuild_search_tokens(batch_size=2000):
+    """根据所有文章完全重建检索倒排表，返回写入的词元行数"""
+    count = 0
+    with transaction.atomic():
+        ArticleSearchToken.objects.all().delete()
+        batch = []
+        for article in Article.objects.only('id', 'title', 'keywords', 'content').order_by('id').iterator():
+            for token, weight in token_weights(article.title, article.get_keywords(), article.content).items():
+                batch.append(ArticleSearchToken(article_id=article.id, token=token, weight=weight))
+            if len(batch) >= batch_size:
+                ArticleSearchToken.objects.bulk_create(batch, batch_size=500)
+                count += len(batch)
+                batch = []
+        ArticleSearchToken.objects.bulk_create(batch, batch_size=500)
+        count += len(batch)
+    return count
+
 # Create your models here.
@@ -0,0 +1,142 @@
+"""
+文章 n-gram 全文检索
+
+中日韩文字没有空格分词，按字符二元组（bigram）切分，单独出现的一个汉字保留为单字；
+建索引时每段连续汉字的最后一个字也保留为单字，这样每个汉字都是某个词元的开头，单字查询可以按前缀匹配；
+其他文字按单词切分并转为小写。每篇文章的 标题 / 关键词 / 正文 切分后写入
+ArticleSearchToken 倒排表，(词元, 文章) 唯一并按词元建索引，保存文章时增量更新。
+
+查询同样切分为词元，要求全部命中，按简化的 BM25 打分（词频饱和 × 字段权重 × IDF）排序。
+"""
+import math
+import re
+import unicodedata
+from collections import Counter
+
+from bs4 import BeautifulSoup
+
+# 字段权重：标题 > 关键词 > 正文
+FIELD_WEIGHTS = {
+    'title': 5.0,
+    'keywords': 3.0,
+    'content': 1.0,
+}
+
+# BM25 词频饱和参数
+TF_SATURATION = 1.2
+
+TOKEN_MAX_LENGTH = 64
+
+CJK_CHARS = (
+    '\u3040-\u30ff'  # 日文假名
+    '\u3400-\u4dbf'  # 扩展 A
+    '\u4e00-\u9fff'  # 基本汉字
+    '\uf900-\ufaff'  # 兼容汉字
+    '\uac00-\ud7af'  # 韩文音节
+)
+TOKEN_RE = re.compile(rf'([{CJK_CHARS}]+)|([^\W_{CJK_CHARS}]+)')
+
+
+def tokenize(text, run_ends=False):
+    """
+    把文本切分为词元列表（保留重复，用于统计词频）
+    run_ends=True 时额外输出每段连续汉字的最后一个字，用于建索引；查询时不输出
+    """
+    text = unicodedata.normalize('NFKC', text or '').lower()
+    tokens = []
+    for match in TOKEN_RE.finditer(text):
+        cjk, word = match.groups()
+        if cjk:
+            if len(cjk) == 1:
+                tokens.append(cjk)
+            else:
+                tokens.extend(cjk[i:i + 2] for i in range(len(cjk) - 1))
+                if run_ends:
+                    tokens.append(cjk[-1])
+        else:
+            tokens.append(word[:TOKEN_MAX_LENGTH])
+    return tokens
+
+
+def html_to_text(html):
+    return BeautifulSoup(html or '', 'html.parser').get_text(' ')
+
+
+def token_weights(title, keywords, content):
+    """
+    计算一篇文章每个词元的权重：各字段 tf * (k + 1) / (tf + k) * 字段权重 之和
+    content 为富文本 HTML
+    """
+    if isinstance(keywords, list):
+        keywords = ' '.join(keyword for keyword in keywords if isinstance(keyword, str))
+    fields = {
+        'title': title,
+        'keywords': keywords,
+        'content': html_to_text(content),
+    }
+
+    weights = {}
+    for field, text in fields.items():
+        for token, tf in Counter(tokenize(text, run_ends=True)).items():
+            saturated = tf * (TF_SATURATION + 1) / (tf + TF_SATURATION)
+            weights[token] = weights.get(token, 0.0) + saturated * FIELD_WEIGHTS[field]
+    return {token: round(weight, 4) for token, weight in weights.items()}
+
+
+def query_tokens(query):
+    """查询中的词元（去重并保持顺序）"""
+    return list(dict.fromkeys(tokenize(query)))
+
+
+def search_article_ids(query):
+    """
+    返回按相关度排序的 values 查询集，每行包含 article_id 与 score；没有结果时返回 None
+
+    全部查询词元都必须命中。只输入一个汉字时按前缀匹配以该字开头的二元组。
+    调用方对结果分页后再按 ID 取出当前页的文章
+    """
+    from django.db.models import Case, Count, F, FloatField, Max, Sum, Value, When
+
+    from .models import Article, ArticleSearchToken
+
+    tokens = query_tokens(query)
+    if not tokens:
+        return None
+
+    total = Article.objects.count()
+
+    def idf(df):
+        return math.log(1 + (total - df + 0.5) / (df + 0.5))
+
+    if len(tokens) == 1 and len(tokens[0]) == 1 and TOKEN_RE.fullmatch(tokens[0]).group(1):
+        # 单个汉字：按词元范围查询，可以使用词元索引；以该字开头的二元组和段尾单字都会命中
+        matches = ArticleSearchToken.objects.filter(token__gte=tokens[0], token__lt=tokens[0] + '\uffff')
+        df = matches.values('article_id').distinct().count()
+        if not df:
+            return None
+        return (
+            matches.values('article_id')
+            .annotate(score=Max('weight') * Value(idf(df)))
+            .order_by('-score', '-article_id')
+        )
+
+    document_frequency = dict(
+        ArticleSearchToken.objects.filter(token__in=tokens)
+        .values_list('token')
+        .annotate(total=Count('id'))
+        .order_by()
+    )
+    if len(document_frequency) < len(tokens):
+        return None
+
+    score = Sum(Case(
+        *[When(token=token, then=F('weight') * Value(idf(df))) for token, df in document_frequency.items()],
+        output_field=FloatField(),
+    ))
+    return (
+        ArticleSearchToken.objects.filter(token__in=tokens)
+        .values('article_id')
+        .annotate(matched=Count('id'), score=score)
+        .filter(matched=len(tokens))
+        .order_by('-score', '-article_id')
+    )
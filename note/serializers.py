@@ -1,8 +1,9 @@
 from rest_framework import serializers
-from bs4 import BeautifulSoup
+from django.conf import settings
+from ClipNote.fieldsets import SparseFieldsetsMixin
 from .models import Article
 
-class ArticleListSerializer(serializers.ModelSerializer):
+class ArticleListSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     description = serializers.SerializerMethodField()
     images = serializers.SerializerMethodField()
     keywords = serializers.SerializerMethodField()
@@ -11,11 +12,15 @@ class ArticleListSerializer(serializers.ModelSerializer):
     class Meta:
         model = Article
         fields = ['id', 'title', 'slug', 'description', 'images', 'keywords', 'url', 'created_at']
+        # 方法字段依赖的模型字段，用于 ?fields= 时 defer 其余字段
+        field_sources = {
+            'description': ('excerpt',),
+            'url': ('keywords', 'slug'),
+        }
 
-    def get_description(self, obj, bs4=None):
-        soup = BeautifulSoup(obj.content, 'html.parser')
-        text = soup.get_text()
-        return text[:100] + '...' if len(text) > 100 else text
+    def get_description(self, obj):
+        # 摘要在保存时预先生成，见 Article.save
+        return obj.excerpt
     
     def get_images(self, obj):
         return obj.get_images()
@@ -36,7 +41,30 @@ class ArticleListSerializer(serializers.ModelSerializer):
             # 如果没有关键词和 slug，则使用 ID
             return f"/api/articles/{obj.id}"
 
-class ArticleDetailSerializer(serializers.ModelSerializer):
+class ArticleLinkListSerializer(ArticleListSerializer):
+    """带站点完整 URL 的文章列表，URL 优先使用 slug 以与 retrieve 方法保持一致"""
+    slug_keyword = serializers.SerializerMethodField()
+
+    class Meta(ArticleListSerializer.Meta):
+        fields = ArticleListSerializer.Meta.fields + ['slug_keyword']
+        field_sources = {
+            **ArticleListSerializer.Meta.field_sources,
+            'slug_keyword': ('slug', 'keywords'),
+        }
+
+    def get_slug_keyword(self, obj):
+        # 优先使用 slug，其次是第一个关键词，最后才使用 ID
+        if obj.slug:
+            return obj.slug
+        keywords = obj.get_keywords()
+        if keywords:
+            return keywords[0].replace(' ', '-').lower()
+        return str(obj.id)
+
+    def get_url(self, obj):
+        return f"{settings.SITE_URL}/api/articles/{self.get_slug_keyword(obj)}"
+
+class ArticleDetailSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     description = serializers.SerializerMethodField()
     images = serializers.SerializerMethodField()
     keywords = serializers.SerializerMethodField()
@@ -45,11 +73,14 @@ class ArticleDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = Article
         fields = ['id', 'title', 'slug', 'content', 'description', 'images', 'keywords', 'url', 'created_at', 'updated_at']
+        field_sources = {
+            'description': ('excerpt',),
+            'url': ('keywords', 'slug'),
+        }
     
-    def get_description(self, obj, bs4=None):
-        soup = BeautifulSoup(obj.content, 'html.parser')
-        text = soup.get_text()
-        return text[:100] + '...' if len(text) > 100 else text
+    def get_description(self, obj):
+        # 摘要在保存时预先生成，见 Article.save
+        return obj.excerpt
     
     def get_images(self, obj):
         return obj.get_images()
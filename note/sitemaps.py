@@ -0,0 +1,55 @@
+from ClipNote.sitemaps import SitemapSource, StaticSitemap, register
+from django.conf import settings
+from django.db.models import Count, Max
+from .models import Article
+
+
+@register
+class KnowledgePagesSitemap(StaticSitemap):
+    """知识库固定页面"""
+    filename = 'sitemap-knowledge.xml'
+    paths = [
+        '/knowledge/basics',
+        '/knowledge/basics/normal-ranges',
+        '/knowledge/health/exercise-stress',
+        '/knowledge/lifestyle/exercise',
+        '/knowledge/health/stress-heart',
+        '/knowledge/lifestyle/nutrition',
+        '/knowledge/health/meditation-benefits',
+        '/knowledge/lifestyle/sleep',
+        '/knowledge/basics/heart-rate-101',
+        '/knowledge/basics/high-heart-rate',
+        '/knowledge',
+    ]
+    lastmod_value = '2025-05-21T14:40:54.550Z'
+
+
+@register
+class ArticleSitemap(SitemapSource):
+    """文章页面，URL 优先使用关键词，然后是 slug，最后是 ID"""
+    filename = 'sitemap-knowledge.xml'
+    priority = '0.9'
+
+    def items(self):
+        return Article.objects.only('id', 'slug', 'keywords', 'updated_at').order_by('id').iterator()
+
+    def location(self, article):
+        keywords = article.get_keywords()
+        if keywords:
+            article_identifier = keywords[0].replace(' ', '-').lower()
+        elif article.slug:
+            article_identifier = article.slug
+        else:
+            article_identifier = article.id
+        return f"{settings.SITE_URL}/knowledge/{article_identifier}"
+
+    def lastmod(self, article):
+        return article.updated_at
+
+    def version(self):
+        # 数量用于发现删除，最近更新时间用于发现新增和修改
+        result = Article.objects.aggregate(latest=Max('updated_at'), total=Count('id'))
+        return result['latest'], (result['total'], result['latest'])
+
+    def count(self):
+        return Article.objects.count()
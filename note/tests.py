@@ -1,3 +1,186 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from io import StringIO
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from ClipNote.testing import EndpointBudgetMixin
+from .models import Article, ArticleSearchToken, build_excerpt, rebuild_keyword_aliases, rebuild_search_tokens
+
+ARTICLE_COUNT = 200
+
+SENTENCES = [
+    '心率变异性反映了自主神经系统的调节能力。',
+    '静息心率越低，通常说明心肺功能越好。',
+    '规律的有氧运动可以降低血压并改善睡眠质量。',
+    '高强度间歇训练在短时间内显著提升最大摄氧量。',
+    '训练后的恢复同样重要，睡眠不足会让第二天的心率升高。',
+    'Heart rate variability is measured as the variation between beats.',
+    'Zone two training builds aerobic base without excessive fatigue.',
+    '补充足够的水分和电解质有助于维持运动表现。',
+]
+
+
+def article_html(number):
+    """生成约 20KB 的富文本正文"""
+    paragraphs = []
+    for index in range(120):
+        sentence = SENTENCES[(number + index) % len(SENTENCES)]
+        paragraphs.append(f'<p><strong>第{index}节</strong> {sentence} <a href="/api/articles/{number}">详情</a></p>')
+    return '<h2>概述</h2>' + ''.join(paragraphs)
+
+
+def seed_articles():
+    """生成 200 篇带大段 HTML 正文的文章，并重建关键词别名和检索索引"""
+    articles = []
+    for number in range(ARTICLE_COUNT):
+        content = article_html(number)
+        articles.append(Article(
+            title=f'心率训练指南 第{number}篇' if number % 2 else f'Heart rate guide {number}',
+            slug=f'heart-rate-guide-{number}',
+            content=content,
+            excerpt=build_excerpt(content),
+            images=[f'/media/uploads/2025/05/{number}.jpg'],
+            keywords=[f'heart rate topic {number}', '心率'],
+        ))
+    articles = Article.objects.bulk_create(articles, batch_size=100)
+
+    # bulk_create 不触发 save()，手动重建派生数据
+    rebuild_keyword_aliases()
+    rebuild_search_tokens()
+    return articles
+
+
+@override_settings(SITEMAP_AUTO_REBUILD=False)
+class NoteEndpointTests(EndpointBudgetMixin, TestCase):
+    """note/urls.py 中每个路由的查询数预算与耗时基线"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.articles = seed_articles()
+        cls.article = cls.articles[7]
+
+    def test_api_root(self):
+        self.assertEndpoint('note:api-root', '/api/', 0)
+
+    def test_article_list(self):
+        response = self.assertEndpoint('note:article-list', '/api/articles/', 2)
+        self.assertEqual(response.json()['count'], ARTICLE_COUNT)
+        self.assertNotIn('content', response.json()['results'][0])
+
+    def test_article_list_large_page(self):
+        self.assertEndpoint('note:article-list-page-100', '/api/articles/', 2, data={'page_size': 100})
+
+    def test_article_list_keyword(self):
+        response = self.assertEndpoint(
+            'note:article-list-keyword', '/api/articles/', 2, data={'keyword': 'heart rate topic 7'},
+        )
+        self.assertEqual(response.json()['count'], 1)
+
+    def test_article_list_sparse_fields(self):
+        response = self.assertEndpoint(
+            'note:article-list-fields', '/api/articles/', 2, data={'fields': 'title,description'},
+        )
+        self.assertEqual(set(response.json()['results'][0]), {'title', 'description'})
+
+    def test_article_list_with_urls(self):
+        response = self.assertEndpoint('note:article-list-with-urls', '/api/articles/list/', 2)
+        self.assertEqual(response.json()['count'], ARTICLE_COUNT)
+        self.assertIn('slug_keyword', response.json()['results'][0])
+
+    def test_article_list_with_urls_action(self):
+        self.assertEndpoint('note:article-list-with-urls-action', '/api/articles/list_with_urls/', 2)
+
+    def test_article_detail_by_slug(self):
+        response = self.assertEndpoint('note:article-detail-slug', f'/api/articles/{self.article.slug}/', 1)
+        self.assertEqual(response.json()['id'], self.article.id)
+
+    def test_article_detail_by_id(self):
+        response = self.assertEndpoint('note:article-detail-id', f'/api/articles/{self.article.id}/', 1)
+        self.assertEqual(response.json()['id'], self.article.id)
+
+    def test_article_detail_by_keyword(self):
+        response = self.assertEndpoint('note:article-detail-keyword', '/api/articles/heart-rate-topic-7/', 1)
+        self.assertEqual(response.json()['id'], self.article.id)
+
+    def test_article_detail_missing(self):
+        self.assertEndpoint('note:article-detail-404', '/api/articles/no-such-article/', 1, status=404)
+
+    def test_article_detail_unicode_digits(self):
+        self.assertEndpoint('note:article-detail-unicode-digits', '/api/articles/²/', 1, status=404, timed=False)
+
+    def test_article_search_cjk(self):
+        response = self.assertEndpoint('note:article-search-cjk', '/api/articles/search/', 5, data={'search': '心率训练'})
+        self.assertEqual(response.json()['count'], ARTICLE_COUNT // 2)
+        self.assertTrue(response.json()['results'][0]['title'].startswith('心率训练指南'))
+
+    def test_article_search_single_character(self):
+        response = self.assertEndpoint('note:article-search-char', '/api/articles/search/', 5, data={'search': '睡'})
+        self.assertEqual(response.json()['count'], ARTICLE_COUNT)
+
+    def test_article_search_latin(self):
+        response = self.assertEndpoint('note:article-search-latin', '/api/articles/search/', 5, data={'search': 'guide 42'})
+        # 标题命中的权重高于正文中的“第42节”
+        self.assertEqual(response.json()['results'][0]['id'], self.articles[42].id)
+
+    def test_article_search_requires_query(self):
+        self.assertEndpoint('note:article-search-empty', '/api/articles/search/', 0, status=400)
+
+    def test_upload_images(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        image = SimpleUploadedFile('pixel.png', b'\x89PNG\r\n\x1a\n', content_type='image/png')
+        with self.settings(MEDIA_ROOT=media_root):
+            response = self.assertEndpoint(
+                'note:upload-images', '/api/upload-images/', 0, method='post',
+                data={'images': [image]}, status=201, timed=False,
+            )
+        self.assertEqual(len(response.json()['urls']), 1)
+
+
+@override_settings(SITEMAP_AUTO_REBUILD=False)
+class ArticleWriteTests(TestCase):
+    """保存文章时增量维护摘要、关键词别名和检索索引"""
+
+    def test_search_tokens_follow_saves(self):
+        article = Article.objects.create(title='静息心率', content='<p>越低越好</p>', keywords=['静息心率'])
+        self.assertTrue(ArticleSearchToken.objects.filter(article=article, token='静息').exists())
+
+        article.title = '睡眠质量'
+        article.save(update_fields=['title'])
+        tokens = set(ArticleSearchToken.objects.filter(article=article).values_list('token', flat=True))
+        self.assertIn('睡眠', tokens)
+        self.assertIn('静息', tokens)  # 仍在关键词中
+
+        article.delete()
+        self.assertFalse(ArticleSearchToken.objects.exists())
+
+    def test_single_character_matches_end_of_run(self):
+        body = Article.objects.create(title='身体', content='<p>身体素质</p>')
+        gym = Article.objects.create(title='健身', content='<p>我爱健身</p>')
+        response = self.client.get('/api/articles/search/', {'search': '身'})
+        self.assertEqual({article['id'] for article in response.json()['results']}, {body.id, gym.id})
+
+    def test_generate_slugs_changes_sitemap_etag(self):
+        cache.clear()
+        article = Article.objects.create(title='Zone Two', content='')
+        Article.objects.filter(pk=article.pk).update(slug='')
+        etag = self.client.get('/sitemap-knowledge-1.xml')['ETag']
+
+        call_command('generate_slugs', stdout=StringIO())
+        response = self.client.get('/sitemap-knowledge-1.xml', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'/knowledge/zone-two</loc>', response.content)
+
+    def test_keyword_alias_routes_to_lowest_id(self):
+        first = Article.objects.create(title='a', content='', keywords=['Zone Two'])
+        Article.objects.create(title='b', content='', keywords=['Zone Two'])
+        response = self.client.get('/api/articles/zone-two/')
+        self.assertEqual(response.json()['id'], first.id)
+
+        first.delete()
+        response = self.client.get('/api/articles/zone-two/')
+        self.assertEqual(response.json()['title'], 'b')
@@ -1,6 +1,8 @@
 from rest_framework import viewsets
-from .models import Article
-from .serializers import ArticleListSerializer, ArticleDetailSerializer
+from .models import Article, ArticleKeywordAlias
+from .serializers import ArticleListSerializer, ArticleDetailSerializer, ArticleLinkListSerializer
+from .search import search_article_ids
+from ClipNote.fieldsets import sparse_queryset
 from django.conf import settings
 from rest_framework.views import APIView
 from rest_framework.response import Response
@@ -10,10 +12,9 @@ from rest_framework.pagination import PageNumberPagination
 import os
 import uuid
 from datetime import datetime
-from django.shortcuts import get_object_or_404
 from rest_framework.decorators import action
 from django.http import Http404
-from django.utils.text import slugify
+from django.db.models import Q, Case, When, Value, IntegerField
 
 class StandardResultsSetPagination(PageNumberPagination):
     page_size = 10
@@ -26,10 +27,26 @@ class ArticleViewSet(viewsets.ReadOnlyModelViewSet):
     lookup_field = 'slug'  # 保留 slug 作为查找字段，但 URL 将使用关键词
     
     def get_serializer_class(self):
-        if self.action == 'list':
+        if self.action in ('list', 'search'):
             return ArticleListSerializer
+        if self.action == 'list_with_urls':
+            return ArticleLinkListSerializer
         return ArticleDetailSerializer
     
+    def get_queryset(self):
+        """
+        支持 ?keyword= 按关键词筛选文章，在数据库中完成 JSON 数组匹配
+        支持 ?fields= / ?exclude= 只返回部分字段，未请求的字段不从数据库读取
+        """
+        queryset = super().get_queryset()
+        keyword = self.request.query_params.get('keyword')
+        if keyword:
+            queryset = queryset.filter(keywords__has_element=keyword)
+        # 列表接口只返回摘要，不加载完整的富文本内容
+        if self.action in ('list', 'list_with_urls', 'search'):
+            queryset = queryset.defer('content')
+        return sparse_queryset(queryset, self.get_serializer_class(), self.request)
+    
     def retrieve(self, request, *args, **kwargs):
         """
         重写 retrieve 方法，支持通过 slug、id 或关键词获取文章详情
@@ -38,103 +55,76 @@ class ArticleViewSet(viewsets.ReadOnlyModelViewSet):
         lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
         slug_or_id_or_keyword = kwargs.get(lookup_url_kwarg)
         
-        try:
-            # 1. 首先尝试通过 slug 字段获取文章
-            try:
-                article = Article.objects.get(slug=slug_or_id_or_keyword)
-                serializer = self.get_serializer(article)
-                return Response(serializer.data)
-            except Article.DoesNotExist:
-                pass
-            
-            # 2. 尝试通过 ID 获取文章（如果是数字）
-            if slug_or_id_or_keyword.isdigit():
-                article = get_object_or_404(Article, id=int(slug_or_id_or_keyword))
-                serializer = self.get_serializer(article)
-                return Response(serializer.data)
-            
-            # 3. 最后尝试通过关键词获取文章
-            found = False
-            articles = Article.objects.all()
-            for art in articles:
-                keywords = art.get_keywords()
-                # 将关键词转换为 URL 友好的格式（用连字符替换空格）
-                url_keywords = [keyword.replace(' ', '-').lower() for keyword in keywords]
-                if slug_or_id_or_keyword.lower() in url_keywords:
-                    article = art
-                    found = True
-                    break
-            
-            if found:
-                serializer = self.get_serializer(article)
-                return Response(serializer.data)
-            else:
-                raise Http404("文章不存在")
-            
-        except (ValueError, Http404):
+        # slug、ID 和关键词别名在一次查询中完成匹配，每个条件都走索引（别名用子查询而不是 JOIN），
+        # 最多命中三行，再按优先级取第一条
+        aliases = ArticleKeywordAlias.objects.filter(slug=slug_or_id_or_keyword.lower()).values('article_id')
+        lookup = Q(slug=slug_or_id_or_keyword) | Q(id__in=aliases)
+        priority = [When(slug=slug_or_id_or_keyword, then=Value(0))]
+        # isdigit() 对 '²' 等 Unicode 数字也返回 True，int() 只接受 ASCII 数字
+        if slug_or_id_or_keyword.isascii() and slug_or_id_or_keyword.isdigit() and len(slug_or_id_or_keyword) < 19:
+            lookup |= Q(id=int(slug_or_id_or_keyword))
+            priority.append(When(id=int(slug_or_id_or_keyword), then=Value(1)))
+        
+        article = (
+            self.get_queryset()
+            .filter(lookup)
+            .annotate(route_priority=Case(*priority, default=Value(2), output_field=IntegerField()))
+            .order_by('route_priority')
+            .first()
+        )
+        if article is None:
             raise Http404("文章不存在")
+        
+        serializer = self.get_serializer(article)
+        return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
     def list_with_urls(self, request):
         """
         返回带有 URL 的文章列表，优先使用 slug 以与 retrieve 方法保持一致
+        只读取当前页；缺少 slug 的文章由 Article.save 或 generate_slugs 命令补齐
         """
         queryset = self.filter_queryset(self.get_queryset())
         
-        # 确保所有文章都有 slug
-        for article in queryset:
-            if not article.slug:
-                # 生成 slug
-                base_slug = slugify(article.title)
-                slug = base_slug
-                counter = 1
-                while Article.objects.filter(slug=slug).exclude(id=article.id).exists():
-                    slug = f"{base_slug}-{counter}"
-                    counter += 1
-                article.slug = slug
-                article.save(update_fields=['slug'])
-        
         page = self.paginate_queryset(queryset)
-        
         if page is not None:
-            serializer = ArticleListSerializer(page, many=True, context={'request': request})
-            response_data = self.get_paginated_response(serializer.data).data
-            
-            # 为每篇文章添加 URL，优先使用 slug 以与 retrieve 方法保持一致
-            for item in response_data['results']:
-                # 优先使用 slug 作为 URL 标识符
-                if item.get('slug'):
-                    item['url'] = f"{settings.SITE_URL}/api/articles/{item.get('slug')}"
-                    item['slug_keyword'] = item.get('slug')
-                # 如果没有 slug，则使用第一个关键词
-                elif item.get('keywords'):
-                    keyword = item['keywords'][0].replace(' ', '-').lower()
-                    item['url'] = f"{settings.SITE_URL}/api/articles/{keyword}"
-                    item['slug_keyword'] = keyword
-                # 最后才使用 ID
-                else:
-                    item['url'] = f"{settings.SITE_URL}/api/articles/{item.get('id')}"
-                    item['slug_keyword'] = str(item.get('id'))
-            
-            return Response(response_data)
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        按标题、关键词和正文搜索文章，结果按相关度排序并分页
+
+        查询参数：
+        - search: 搜索关键词（必需），中文按二元组匹配，其他文字按单词匹配
+        - page: 页码
+        - page_size: 每页数量（最大100）
+        """
+        search_query = request.query_params.get('search', '').strip()
+        if not search_query:
+            return Response({
+                'error': '请提供搜索关键词',
+                'detail': '使用 ?search=关键词 进行搜索'
+            }, status=400)
         
-        serializer = ArticleListSerializer(queryset, many=True, context={'request': request})
-        data = serializer.data
+        ranked = search_article_ids(search_query)
+        if ranked is None:
+            ranked = Article.objects.none().values('id')
         
-        # 为每篇文章添加 URL，优先使用 slug 以与 retrieve 方法保持一致
-        for item in data:
-            if item.get('slug'):
-                item['url'] = f"{settings.SITE_URL}/api/articles/{item.get('slug')}"
-                item['slug_keyword'] = item.get('slug')
-            elif item.get('keywords'):
-                keyword = item['keywords'][0].replace(' ', '-').lower()
-                item['url'] = f"{settings.SITE_URL}/api/articles/{keyword}"
-                item['slug_keyword'] = keyword
-            else:
-                item['url'] = f"{settings.SITE_URL}/api/articles/{item.get('id')}"
-                item['slug_keyword'] = str(item.get('id'))
+        # 先在倒排表上分页，再只取出当前页的文章
+        page = self.paginate_queryset(ranked)
+        ids = [row['article_id'] for row in page]
+        articles = self.get_queryset().in_bulk(ids)
+        results = [articles[article_id] for article_id in ids if article_id in articles]
         
-        return Response(data)
+        serializer = self.get_serializer(results, many=True)
+        response_data = self.get_paginated_response(serializer.data).data
+        response_data['search_query'] = search_query
+        return Response(response_data)
 
 class ImageUploadView(APIView):
     parser_classes = (MultiPartParser, FormParser)